@@ -0,0 +1,134 @@
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langgraph.constants import TAG_NOSTREAM
+
+from app.core.config import (
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_KEEP_TURNS,
+    CONTEXT_SUMMARY_BATCH_TURNS,
+    CONTEXT_SUMMARY_MAX_TOKENS,
+)
+
+# Rough chars-per-token for English chat text; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+SUMMARY_PROMPT = """You maintain a running summary of a chat between a Tata Capital loan officer and a customer.
+Merge the new lines into the current summary. Keep facts the customer shared
+(needs, amounts, objections, promises made). Reply with the updated summary only, under {max_words} words."""
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class ContextManager:
+    """
+    Keeps the sales prompt inside a fixed token budget.
+
+    The last K turns go to the LLM verbatim; older turns are folded into a
+    rolling summary. Folding happens in batches, so the summary is extended
+    with only the newly folded lines instead of being regenerated each turn.
+    The per-thread summary lives in the session state under "context".
+    """
+
+    def __init__(self, llm=None,
+                 token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 keep_turns: int = CONTEXT_KEEP_TURNS,
+                 batch_turns: int = CONTEXT_SUMMARY_BATCH_TURNS,
+                 summary_max_tokens: int = CONTEXT_SUMMARY_MAX_TOKENS):
+        self.llm = llm
+        self.token_budget = token_budget
+        self.keep_messages = 2 * keep_turns          # a turn = user message + reply
+        self.fold_threshold = self.keep_messages + 2 * batch_turns
+        self.summary_max_tokens = summary_max_tokens
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "summaries": 0,
+            "tokens_sent": 0,
+            "tokens_saved": 0,
+            "last_tokens_saved": 0,
+        }
+
+    # --- SUMMARY ---
+
+    def _summarize(self, summary: str, lines: Sequence[str]) -> str:
+        max_chars = self.summary_max_tokens * CHARS_PER_TOKEN
+        if self.llm is not None:
+            try:
+                response = self.llm.invoke([
+                    SystemMessage(content=SUMMARY_PROMPT.format(max_words=self.summary_max_tokens * 3 // 4)),
+                    HumanMessage(content=f"Current summary:\n{summary or '(empty)'}\n\nNew lines:\n" + "\n".join(lines))
+                ], config={"tags": [TAG_NOSTREAM]})  # never leak summary tokens to /chat/stream
+                return response.content.strip()[:max_chars]
+            except Exception as e:
+                print(f"❌ Summary LLM call failed, using extractive fallback: {e}")
+
+        # Extractive fallback: first sentence-ish of every folded line
+        folded = " | ".join(line.strip().replace("\n", " ")[:120] for line in lines)
+        merged = f"{summary} | {folded}" if summary else folded
+        return merged[-max_chars:]
+
+    # --- PROMPT ---
+
+    def build(self, system_prompt: str, history: Sequence[str], history_start: int,
+              new_messages: Sequence[str], context: Optional[dict] = None) -> Tuple[List[BaseMessage], dict]:
+        """
+        Returns the messages to send and the updated context for the session.
+        history holds messages [history_start, history_start + len(history)) of the thread.
+        """
+        context = dict(context or {})
+        summary = context.get("summary", "")
+        summarized_count = context.get("summarized_count", 0)
+        summarized_tokens = context.get("summarized_tokens", 0)
+
+        # Messages not yet folded into the summary
+        window = list(history) + list(new_messages)
+        offset = max(0, summarized_count - history_start)
+        pending = window[offset:]
+        pending_start = history_start + offset
+        pending_tokens = [estimate_tokens(m) for m in pending]
+
+        # 1. Fold a batch once the verbatim tail grows past K turns + one batch
+        fold = len(pending) - self.keep_messages if len(pending) > self.fold_threshold else 0
+
+        # 2. Fold further if the prompt still does not fit the budget
+        fixed = estimate_tokens(system_prompt) + (self.summary_max_tokens if (summary or fold) else 0)
+        while fold < len(pending) - 1 and fixed + sum(pending_tokens[fold:]) > self.token_budget:
+            fold += 1
+            fixed = estimate_tokens(system_prompt) + self.summary_max_tokens
+
+        if fold:
+            summary = self._summarize(summary, pending[:fold])
+            summarized_count = pending_start + fold
+            summarized_tokens += sum(pending_tokens[:fold])
+            context.update({
+                "summary": summary,
+                "summarized_count": summarized_count,
+                "summarized_tokens": summarized_tokens,
+            })
+
+        conversation: List[BaseMessage] = [SystemMessage(content=system_prompt)]
+        if summary:
+            conversation.append(SystemMessage(content=f"Summary of the conversation so far: {summary}"))
+        conversation.extend(HumanMessage(content=m) for m in pending[fold:])
+
+        sent = sum(estimate_tokens(m.content) for m in conversation)
+        full = estimate_tokens(system_prompt) + summarized_tokens + sum(pending_tokens[fold:])
+        saved = max(0, full - sent)
+
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["summaries"] += 1 if fold else 0
+            self._stats["tokens_sent"] += sent
+            self._stats["tokens_saved"] += saved
+            self._stats["last_tokens_saved"] = saved
+
+        return conversation, context
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
@@ -0,0 +1,129 @@
+import pickle
+import re
+import threading
+from typing import Dict, NamedTuple, Optional
+
+from app.core.config import INTENT_FAST_PATH, INTENT_MODEL_PATH, INTENT_MODEL_THRESHOLD
+
+AGREE = "AGREE"
+DECLINE = "DECLINE"
+GREETING = "GREETING"
+
+# Each rule must match the WHOLE normalized message. Anything longer or mixed
+# ("yes but what is the rate?") falls through to the LLM.
+_POLITE = r"(?: (?:please|pls|now|thanks|thank you|sure|then|lets go))*"
+RULES = [
+    (DECLINE, re.compile(
+        r"^(?:no|nope|nah|no thanks|no thank you|not now|not today|not interested|"
+        r"i am not interested|im not interested|maybe later|later|dont want|i dont want|"
+        r"i dont need (?:a |any )?loan|not required|no need)" + _POLITE + r"$"
+    )),
+    (AGREE, re.compile(
+        r"^(?:(?:ok(?:ay)?|yes|yeah|yep|yup|sure|alright|fine|k) ?)*"
+        r"(?:yes|yeah|yep|yup|sure|ok|okay|alright|fine|go ahead|proceed|lets do it|lets proceed|"
+        r"sounds good|interested|i am interested|im interested|apply|apply now|"
+        r"i want to apply|i would like to apply|id like to apply|i want the loan|i agree|agreed|done)"
+        + _POLITE + r"$"
+    )),
+    (GREETING, re.compile(
+        r"^(?:hi|hii+|hello|hey|hey there|hi there|hello there|good (?:morning|afternoon|evening)|namaste)"
+        + _POLITE + r"$"
+    )),
+]
+
+REPLIES = {
+    DECLINE: "No problem at all! If you change your mind, I'm right here to help you get a "
+             "Tata Capital Personal Loan with quick approval and flexible EMIs.",
+    GREETING: "Hello! I'm your Tata Capital Loan Officer. Our Personal Loans come with instant "
+              "approval, attractive rates and flexible tenures. Would you like to apply?",
+}
+
+
+class Intent(NamedTuple):
+    label: str
+    confidence: float
+    source: str  # "rule" or "model"
+
+
+def normalize(text: str) -> str:
+    text = text.lower().replace("'", "").replace("’", "")
+    text = re.sub(r"[^a-z0-9 ]+", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class IntentClassifier:
+    """
+    Cheap local classifier that runs before the sales LLM.
+
+    Regex rules answer short, unambiguous replies with high confidence. An
+    optional small CPU model is consulted when no rule fires. Anything below
+    threshold returns None and the caller falls back to the LLM.
+    """
+
+    def __init__(self, model_path: str = INTENT_MODEL_PATH,
+                 threshold: float = INTENT_MODEL_THRESHOLD,
+                 enabled: bool = INTENT_FAST_PATH):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.model = self._load_model(model_path) if model_path else None
+
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "rule_hits": 0, "model_hits": 0, "llm_fallbacks": 0}
+
+    @staticmethod
+    def _load_model(path: str):
+        try:
+            with open(path, "rb") as f:
+                model = pickle.load(f)
+            print(f"DEBUG: Loaded intent model from {path}")
+            return model
+        except Exception as e:
+            # The model is an optional extra; rules keep working without it
+            print(f"❌ Could not load intent model {path}, using rules only: {e}")
+            return None
+
+    def _predict(self, text: str) -> Optional[Intent]:
+        if self.model is None:
+            return None
+        try:
+            probs = self.model.predict_proba([text])[0]
+        except Exception as e:
+            print(f"❌ Intent model failed: {e}")
+            return None
+        best = max(range(len(probs)), key=lambda i: probs[i])
+        label = str(self.model.classes_[best])
+        if label not in (AGREE, DECLINE, GREETING) or probs[best] < self.threshold:
+            return None
+        return Intent(label, float(probs[best]), "model")
+
+    def classify(self, message: str) -> Optional[Intent]:
+        """
+        Returns a confident Intent, or None when the LLM should decide.
+        """
+        if not self.enabled:
+            return None
+
+        text = normalize(message)
+        intent = None
+        for label, pattern in RULES:
+            if pattern.match(text):
+                intent = Intent(label, 1.0, "rule")
+                break
+        if intent is None and text:
+            intent = self._predict(text)
+
+        with self._lock:
+            self._stats["requests"] += 1
+            if intent is None:
+                self._stats["llm_fallbacks"] += 1
+            else:
+                self._stats[f"{intent.source}_hits"] += 1
+                self._stats[intent.label] = self._stats.get(intent.label, 0) + 1
+        return intent
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+        hits = stats["rule_hits"] + stats["model_hits"]
+        stats["hit_rate"] = round(hits / stats["requests"], 4) if stats["requests"] else 0.0
+        return stats
@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage
+
+from app.core.config import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_TTL_SECONDS,
+    LLM_CACHE_PATH,
+)
+from app.core.metrics import record_llm_usage
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", str(text)).strip().lower()
+
+
+def prompt_hash(system_prompt: str) -> str:
+    return hashlib.sha256(normalize_text(system_prompt).encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    LRU + TTL map from conversation hash to reply text, optionally backed by
+    a SQLite file. Entries are tagged with the prompt they were produced under
+    so they can be invalidated when that prompt changes.
+    """
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+                 path: str = LLM_CACHE_PATH):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+
+        self._lock = threading.Lock()
+        # key -> (content, expires_at, prompt_name)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._local = threading.local()
+
+        if path:
+            self._conn().execute(
+                """CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    prompt_name TEXT NOT NULL,
+                    prompt_hash TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )"""
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._data.move_to_end(key)
+                    return entry[0]
+                del self._data[key]
+
+        if not self.path:
+            return None
+        row = self._conn().execute(
+            "SELECT content, expires_at, prompt_name FROM llm_cache WHERE key = ? AND expires_at > ?",
+            (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        self._remember(key, row[0], row[1], row[2])
+        return row[0]
+
+    def _remember(self, key: str, content: str, expires_at: float, prompt_name: str):
+        with self._lock:
+            self._data[key] = (content, expires_at, prompt_name)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def put(self, key: str, content: str, prompt_name: str, p_hash: str):
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, content, expires_at, prompt_name)
+        if self.path:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)",
+                (key, prompt_name, p_hash, content, expires_at)
+            )
+
+    def invalidate(self, prompt_name: Optional[str] = None, keep_hash: Optional[str] = None) -> int:
+        """
+        Drops entries for prompt_name (all entries if None). With keep_hash,
+        on-disk entries produced under that exact prompt version are kept.
+        """
+        with self._lock:
+            stale = [k for k, v in self._data.items() if prompt_name is None or v[2] == prompt_name]
+            for k in stale:
+                del self._data[k]
+        removed = len(stale)
+
+        if self.path:
+            if prompt_name is None:
+                cur = self._conn().execute("DELETE FROM llm_cache")
+            else:
+                cur = self._conn().execute(
+                    "DELETE FROM llm_cache WHERE prompt_name = ? AND prompt_hash != ?",
+                    (prompt_name, keep_hash or "")
+                )
+            removed += cur.rowcount
+        return removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+def _current_node(default: str) -> str:
+    # Name of the LangGraph node we are running in, if any
+    try:
+        from langgraph.config import get_config
+        return get_config().get("metadata", {}).get("langgraph_node", default)
+    except Exception:
+        return default
+
+
+class CachedChatModel:
+    """
+    Drop-in wrapper around a chat model exposing invoke / ainvoke.
+
+    Only conversations whose system prompt was registered with
+    register_prompt() are cached; everything else goes straight through.
+    The cache key is a hash of the normalized system prompt plus the
+    normalized conversation, and a cache hit returns an AIMessage.
+    """
+
+    def __init__(self, llm, cache: Optional[LLMResponseCache] = None,
+                 enabled: bool = LLM_CACHE_ENABLED):
+        self.llm = llm
+        self.enabled = enabled
+        self.cache = cache if cache is not None else LLMResponseCache()
+        self._prompts: Dict[str, str] = {}   # prompt hash -> prompt name
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def __getattr__(self, name):
+        # Anything we do not wrap (model_name, bind_tools, ...) goes to the real client
+        return getattr(self.llm, name)
+
+    def register_prompt(self, name: str, system_prompt: str) -> int:
+        """
+        Marks a system prompt as cacheable. If an older version of the prompt
+        with the same name left entries behind, they are invalidated.
+        """
+        p_hash = prompt_hash(system_prompt)
+        with self._lock:
+            for h, n in list(self._prompts.items()):
+                if n == name and h != p_hash:
+                    del self._prompts[h]
+            self._prompts[p_hash] = name
+        return self.cache.invalidate(name, keep_hash=p_hash)
+
+    # --- KEYING ---
+
+    def _key(self, messages: Sequence[BaseMessage]):
+        if not self.enabled or not messages or not isinstance(messages[0], SystemMessage):
+            return None
+        p_hash = prompt_hash(messages[0].content)
+        name = self._prompts.get(p_hash)
+        if name is None:
+            return None
+        body = [(m.type, normalize_text(m.content)) for m in messages[1:]]
+        model = getattr(self.llm, "model_name", type(self.llm).__name__)
+        raw = json.dumps([model, p_hash, body], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest(), name, p_hash
+
+    def _count(self, node: str, outcome: str):
+        with self._lock:
+            stats = self._stats.setdefault(node, {"hits": 0, "misses": 0})
+            stats[outcome] += 1
+
+    # --- CALLS ---
+
+    def _call(self, node: str, messages, config, kwargs):
+        started = time.perf_counter()
+        response = self.llm.invoke(messages, config, **kwargs)
+        record_llm_usage(node, response, time.perf_counter() - started)
+        return response
+
+    async def _acall(self, node: str, messages, config, kwargs):
+        started = time.perf_counter()
+        response = await self.llm.ainvoke(messages, config, **kwargs)
+        record_llm_usage(node, response, time.perf_counter() - started)
+        return response
+
+    def invoke(self, messages, config=None, **kwargs):
+        keyed = self._key(messages)
+        if keyed is None:
+            return self._call(_current_node("unknown"), messages, config, kwargs)
+
+        key, name, p_hash = keyed
+        node = _current_node(name)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count(node, "hits")
+            return AIMessage(content=cached)
+
+        self._count(node, "misses")
+        response = self._call(node, messages, config, kwargs)
+        self.cache.put(key, response.content, name, p_hash)
+        return response
+
+    async def ainvoke(self, messages, config=None, **kwargs):
+        keyed = self._key(messages)
+        if keyed is None:
+            return await self._acall(_current_node("unknown"), messages, config, kwargs)
+
+        key, name, p_hash = keyed
+        node = _current_node(name)
+        cached = await asyncio.to_thread(self.cache.get, key) if self.cache.path else self.cache.get(key)
+        if cached is not None:
+            self._count(node, "hits")
+            return AIMessage(content=cached)
+
+        self._count(node, "misses")
+        response = await self._acall(node, messages, config, kwargs)
+        if self.cache.path:
+            await asyncio.to_thread(self.cache.put, key, response.content, name, p_hash)
+        else:
+            self.cache.put(key, response.content, name, p_hash)
+        return response
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            per_node = {node: dict(v) for node, v in self._stats.items()}
+        return {"entries": len(self.cache), "nodes": per_node}
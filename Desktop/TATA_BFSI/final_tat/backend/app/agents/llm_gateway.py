@@ -0,0 +1,361 @@
+import asyncio
+import math
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Sequence, Tuple
+
+from app.core.config import (
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_QUEUE,
+    LLM_RPM,
+    LLM_TPM,
+    LLM_QUEUE_TIMEOUT,
+    LLM_DEADLINE_SECONDS,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BASE_SECONDS,
+    LLM_RETRY_MAX_SECONDS,
+    LLM_COMPLETION_TOKENS,
+)
+from app.core.metrics import LLM_ADMISSION, LLM_QUEUE_WAIT, LLM_RETRIES
+
+# Provider answers worth another try: rate limited, overloaded, or flaky
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"APIConnectionError", "APITimeoutError", "ConnectionError", "TimeoutError"}
+
+
+class LLMOverloadedError(Exception):
+    """
+    Raised when a call is shed: the queue is full, the rate limit cannot
+    admit it before its deadline, or the provider kept rate limiting it.
+    Retryable; retry_after is a hint in whole seconds.
+    """
+
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        super().__init__(f"The assistant is busy right now ({reason}). Please retry shortly.")
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def estimate_tokens(messages: Sequence) -> int:
+    # ~4 characters per token, plus room for the reply
+    chars = sum(len(str(getattr(m, "content", m))) for m in messages)
+    return chars // 4 + LLM_COMPLETION_TOKENS
+
+
+class TokenBucket:
+    """
+    Per-minute budget refilled continuously. reserve() books capacity ahead
+    of time (the level may go negative) and says how long the caller has to
+    wait for it, so sync and async callers share one bucket.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float, max_wait: float) -> Tuple[bool, float]:
+        """
+        (booked, wait in seconds). Nothing is booked if the wait exceeds max_wait.
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            wait = max(0.0, (amount - self._level) / self.rate)
+            if wait > max_wait:
+                return False, wait
+            self._level -= amount
+            return True, wait
+
+    def adjust(self, amount: float):
+        """
+        Books (positive) or refunds (negative) the difference once the real cost is known.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level = min(self.capacity, self._level - amount)
+
+    def pause(self, seconds: float):
+        """
+        Provider asked us to back off: nothing is admitted for `seconds`.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level = min(self._level, -seconds * self.rate)
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._level
+
+
+def _wake(waiter):
+    if isinstance(waiter, threading.Event):
+        waiter.set()
+    else:
+        waiter.get_loop().call_soon_threadsafe(lambda: waiter.done() or waiter.set_result(True))
+
+
+class _Slots:
+    """
+    Counting semaphore with a bounded FIFO queue, shared by threads and
+    event loops. A full queue refuses instantly instead of piling up.
+    """
+
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.in_use = 0
+        self._waiters: deque = deque()
+        self._mutex = threading.Lock()
+
+    def enter(self, make_waiter):
+        """
+        None if a slot was free, False if the queue is full, else a waiter to block on.
+        """
+        with self._mutex:
+            if self.in_use < self.limit and not self._waiters:
+                self.in_use += 1
+                return None
+            if len(self._waiters) >= self.max_queue:
+                return False
+            waiter = make_waiter()
+            self._waiters.append(waiter)
+            return waiter
+
+    def abandon(self, waiter) -> bool:
+        # False if the slot was handed over in the meantime
+        with self._mutex:
+            try:
+                self._waiters.remove(waiter)
+                return True
+            except ValueError:
+                return False
+
+    def release(self):
+        with self._mutex:
+            if self._waiters:
+                _wake(self._waiters.popleft())  # slot passes straight to the next caller
+            else:
+                self.in_use -= 1
+
+    def queued(self) -> int:
+        with self._mutex:
+            return len(self._waiters)
+
+
+class LLMGateway:
+    """
+    Admission control in front of the chat model (invoke / ainvoke).
+
+    Every call must get a concurrency slot and fit the provider's RPM / TPM
+    budget before its deadline. When it cannot, it is refused immediately
+    with LLMOverloadedError, before it waits. Shedding early keeps latency
+    flat for the calls that are admitted. Rate-limit and transient provider
+    errors are retried with full-jitter exponential backoff inside the same
+    deadline. A 429 also pauses the shared bucket, so other callers back
+    off too instead of hammering the provider.
+    """
+
+    def __init__(self, llm, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 max_queue: int = LLM_MAX_QUEUE, rpm: float = LLM_RPM, tpm: float = LLM_TPM,
+                 queue_timeout: float = LLM_QUEUE_TIMEOUT, deadline: float = LLM_DEADLINE_SECONDS,
+                 max_retries: int = LLM_MAX_RETRIES):
+        self.llm = llm
+        self.queue_timeout = queue_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self._slots = _Slots(max_concurrency, max_queue)
+        self._requests = TokenBucket(rpm) if rpm > 0 else None
+        self._tokens = TokenBucket(tpm) if tpm > 0 else None
+        self._lock = threading.Lock()
+        self._stats = {"admitted": 0, "shed": 0, "retries": 0, "failed": 0}
+
+    def __getattr__(self, name):
+        # model_name, bind_tools, ... come from the real client
+        return getattr(self.llm, name)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _shed(self, reason: str, retry_after: float):
+        self._count("shed")
+        LLM_ADMISSION.inc(reason)
+        raise LLMOverloadedError(reason, retry_after)
+
+    # --- ADMISSION ---
+
+    def _reserve(self, cost: int, deadline: float) -> float:
+        """
+        Books one request and `cost` tokens, or sheds the call if the budget
+        cannot cover it in time. Returns the wait before it may be sent.
+        """
+        budget = min(deadline, time.monotonic() + self.queue_timeout) - time.monotonic()
+        wait = 0.0
+        if self._requests is not None:
+            booked, wait = self._requests.reserve(1, budget)
+            if not booked:
+                self._shed("rate_limited", wait)
+        if self._tokens is not None:
+            booked, token_wait = self._tokens.reserve(cost, budget)
+            if not booked:
+                if self._requests is not None:
+                    self._requests.adjust(-1)
+                self._shed("rate_limited", token_wait)
+            wait = max(wait, token_wait)
+        return wait
+
+    def _unreserve(self, cost: int):
+        if self._requests is not None:
+            self._requests.adjust(-1)
+        if self._tokens is not None:
+            self._tokens.adjust(-cost)
+
+    def _settle(self, cost: int, response):
+        # Swap the estimate for the real token count
+        if self._tokens is None:
+            return
+        usage = getattr(response, "usage_metadata", None) or {}
+        actual = usage.get("total_tokens")
+        if actual:
+            self._tokens.adjust(actual - cost)
+
+    def _enter(self, cost: int, make_waiter):
+        waiter = self._slots.enter(make_waiter)
+        if waiter is False:
+            self._unreserve(cost)
+            self._shed("queue_full", self.queue_timeout)
+        return waiter
+
+    def _admitted(self, started: float):
+        self._count("admitted")
+        LLM_ADMISSION.inc("admitted")
+        LLM_QUEUE_WAIT.observe(time.monotonic() - started)
+
+    def _admit(self, cost: int, deadline: float):
+        """
+        Rate budget first (no slot is held while pacing), then a concurrency slot.
+        """
+        started = time.monotonic()
+        time.sleep(self._reserve(cost, deadline))
+        waiter = self._enter(cost, threading.Event)
+        if waiter is not None:
+            remaining = min(deadline, started + self.queue_timeout) - time.monotonic()
+            if not waiter.wait(max(0.0, remaining)) and self._slots.abandon(waiter):
+                self._unreserve(cost)
+                self._shed("queue_timeout", self.queue_timeout)
+        self._admitted(started)
+
+    async def _aadmit(self, cost: int, deadline: float):
+        started = time.monotonic()
+        wait = self._reserve(cost, deadline)
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            self._unreserve(cost)
+            raise
+        waiter = self._enter(cost, asyncio.get_running_loop().create_future)
+        if waiter is not None:
+            remaining = min(deadline, started + self.queue_timeout) - time.monotonic()
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), max(0.0, remaining))
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if not self._slots.abandon(waiter):
+                    self._slots.release()  # handed over as we gave up: pass it on
+                self._unreserve(cost)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                self._shed("queue_timeout", self.queue_timeout)
+        self._admitted(started)
+
+    # --- RETRIES ---
+
+    def _retry_delay(self, error: Exception, attempt: int, deadline: float) -> Optional[float]:
+        """
+        Backoff before the next attempt, or None if the error should surface now.
+        """
+        status = getattr(error, "status_code", None)
+        if status not in RETRYABLE_STATUS and type(error).__name__ not in RETRYABLE_ERRORS:
+            return None
+
+        retry_after = None
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            retry_after = float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+        if status == 429 and self._requests is not None:
+            self._requests.pause(retry_after or LLM_RETRY_BASE_SECONDS)
+
+        delay = random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+        delay = max(delay, retry_after or 0.0)
+        if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+            self._count("failed")
+            LLM_ADMISSION.inc("provider_busy")
+            # Rate limits and outages are the caller's to retry; surface them as such
+            raise LLMOverloadedError("provider busy", delay) from error
+        self._count("retries")
+        LLM_RETRIES.inc(str(status or type(error).__name__))
+        return delay
+
+    # --- CALLS ---
+
+    def invoke(self, messages, config=None, **kwargs):
+        deadline = time.monotonic() + self.deadline
+        cost = estimate_tokens(messages)
+        attempt = 0
+        while True:
+            self._admit(cost, deadline)
+            try:
+                response = self.llm.invoke(messages, config, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+            else:
+                self._settle(cost, response)
+                return response
+            finally:
+                self._slots.release()
+            attempt += 1
+            time.sleep(delay)
+
+    async def ainvoke(self, messages, config=None, **kwargs):
+        deadline = time.monotonic() + self.deadline
+        cost = estimate_tokens(messages)
+        attempt = 0
+        while True:
+            await self._aadmit(cost, deadline)
+            try:
+                response = await self.llm.ainvoke(messages, config, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+            else:
+                self._settle(cost, response)
+                return response
+            finally:
+                self._slots.release()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["in_flight"] = self._slots.in_use
+        stats["queued"] = self._slots.queued()
+        if self._requests is not None:
+            stats["requests_available"] = round(self._requests.available(), 2)
+        if self._tokens is not None:
+            stats["tokens_available"] = round(self._tokens.available(), 2)
+        return stats
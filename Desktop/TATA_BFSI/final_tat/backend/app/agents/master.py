@@ -4,29 +4,88 @@ from dotenv import load_dotenv
 # Load keys immediately
 load_dotenv()
 
-from typing import TypedDict, List
-from langgraph.graph import StateGraph, END
-from langchain_groq import ChatGroq
-from langchain_core.messages import HumanMessage, SystemMessage
-from app.agents.tools import tool_lookup_user, tool_check_eligibility
-from app.core.logic import calculate_emi, get_emi_options_table
+import asyncio
+import operator
+import threading
+from typing import TypedDict, List, Annotated
+from app.agents.intent import IntentClassifier, AGREE, REPLIES
+from app.agents.tools import tool_lookup_user, tool_underwrite, tool_offer_table, TENURE_OPTIONS
+from app.core.metrics import instrument_node
+from app.core.config import COUNTER_OFFER_ENABLED
 # --- NEW IMPORT ---
-from app.services.pdf_generator import generate_sanction_letter
+from app.services.letter_jobs import get_letter_queue
+from app.services.affordability import counter_offer
 
-# 1. Setup LLM
-llm = ChatGroq(
-    temperature=0, 
-    model_name="llama-3.1-8b-instant", 
-    api_key=os.getenv("GROQ_API_KEY")
-)
+# 1. Setup LLM, context window and graph
+# Built on first use (or by the startup warm-up, see app/main.py) rather than
+# at import: the LangGraph / LangChain / Groq stack is most of the cold start.
+_llm = None
+_context_manager = None
+_intent_classifier = None
+_graph = None
+_init_lock = threading.RLock()
+
+def get_llm():
+    """
+    ChatGroq behind the response cache (LLM_CACHE_*) and the gateway (LLM_*).
+    Cache misses go through the gateway's rate limits and retries, so the
+    client's own retries are off.
+    """
+    global _llm
+    if _llm is None:
+        with _init_lock:
+            if _llm is None:
+                from langchain_groq import ChatGroq
+                from app.agents.llm_cache import CachedChatModel
+                from app.agents.llm_gateway import LLMGateway
+
+                llm = CachedChatModel(LLMGateway(ChatGroq(
+                    temperature=0, 
+                    model_name="llama-3.1-8b-instant", 
+                    api_key=os.getenv("GROQ_API_KEY"),
+                    max_retries=0
+                )))
+                # Sales replies are cacheable; editing SALES_PROMPT invalidates its old entries
+                llm.register_prompt("sales", SALES_PROMPT)
+                _llm = llm
+    return _llm
+
+def get_context_manager():
+    """
+    Keeps the sales prompt inside CONTEXT_TOKEN_BUDGET (see core/config.py).
+    """
+    global _context_manager
+    if _context_manager is None:
+        with _init_lock:
+            if _context_manager is None:
+                from app.agents.context import ContextManager
+                _context_manager = ContextManager(get_llm())
+    return _context_manager
+
+def get_intent_classifier() -> IntentClassifier:
+    """
+    Answers "yes" / "no thanks" / "hi" locally before paying for an LLM call.
+    """
+    global _intent_classifier
+    if _intent_classifier is None:
+        with _init_lock:
+            if _intent_classifier is None:
+                _intent_classifier = IntentClassifier()
+    return _intent_classifier
 
 # 2. Define State
 class AgentState(TypedDict):
-    messages: List[str]
+    # Append-only: holds only this turn's messages. Nodes return just the new
+    # ones and the reducer appends them, so nothing is copied per turn.
+    messages: Annotated[List[str], operator.add]
+    history: List[str] # Tail of earlier turns, read-only (owned by the session store)
+    history_start: int # Index of history[0] in the full thread
+    context: dict # Rolling summary of turns that fell out of the LLM window
     current_stage: str
     user_data: dict
     loan_amount: float
     sanction_letter: str # <--- NEW FIELD
+    letter_job_id: str # Background render job for the sanction letter
 
 # 3. Define Nodes
 
@@ -34,36 +93,75 @@ def entry_node(state: AgentState):
     """
     DUMMY NODE: Just decides where to go based on state.
     """
-    return state
+    return {}
 
-def sales_node(state: AgentState):
-    messages = state["messages"]
-    last_user_msg = messages[-1].strip()
+SALES_PROMPT = """You are a polite Tata Capital Loan Officer. 
+    Persuade the user to apply. 
+    If the user agrees or says 'yes', reply ONLY with: 'MOVE_TO_VERIFICATION'.
+    Do not ask for the phone number yourself, just output the token."""
+
+MOVE_TOKEN = "MOVE_TO_VERIFICATION"
+
+def _sales_shortcut(state: AgentState):
+    """
+    Replies that never need the LLM. Returns None when the LLM must answer.
+    """
+    last_user_msg = state["messages"][-1].strip()
 
     # --- 1. THE SHORTCUT FIX ---
     if last_user_msg.isdigit() and len(last_user_msg) == 10:
-        return {
-            "current_stage": "VERIFICATION",
-            "messages": messages 
-        }
+        return {"current_stage": "VERIFICATION"}
 
-    # --- 2. Standard Sales Logic ---
-    sys_msg = """You are a polite Tata Capital Loan Officer. 
-    Persuade the user to apply. 
-    If the user agrees or says 'yes', reply ONLY with: 'MOVE_TO_VERIFICATION'.
-    Do not ask for the phone number yourself, just output the token."""
-    
-    conversation = [SystemMessage(content=sys_msg)] + [HumanMessage(content=m) for m in messages]
-    response = llm.invoke(conversation)
-    content = response.content.strip()
-    
-    if "MOVE_TO_VERIFICATION" in content:
+    # --- 2. Confident local intent (rules / tiny model) ---
+    intent = get_intent_classifier().classify(last_user_msg)
+    if intent is None:
+        return None
+    if intent.label == AGREE:
+        return _sales_reply(MOVE_TOKEN, state.get("context", {}))
+    return {"messages": [REPLIES[intent.label]], "current_stage": "SALES"}
+
+def _build_sales_prompt(state: AgentState):
+    return get_context_manager().build(
+        SALES_PROMPT,
+        history=state.get("history", []),
+        history_start=state.get("history_start", 0),
+        new_messages=state["messages"],
+        context=state.get("context")
+    )
+
+def _sales_reply(content: str, context: dict):
+    if MOVE_TOKEN in content:
         return {
             "current_stage": "VERIFICATION", 
-            "messages": messages + ["Great! Let's get started. Please type your 10-digit phone number."]
+            "messages": ["Great! Let's get started. Please type your 10-digit phone number."],
+            "context": context
         }
     
-    return {"messages": messages + [content], "current_stage": "SALES"}
+    return {"messages": [content], "current_stage": "SALES", "context": context}
+
+def sales_node(state: AgentState):
+    shortcut = _sales_shortcut(state)
+    if shortcut is not None:
+        return shortcut
+
+    # --- 3. Standard Sales Logic ---
+    conversation, context = _build_sales_prompt(state)
+    response = get_llm().invoke(conversation)
+    return _sales_reply(response.content.strip(), context)
+
+async def asales_node(state: AgentState):
+    """
+    Async twin of sales_node, used by app_graph.astream / ainvoke so the LLM
+    call does not hold a threadpool slot and its tokens can be streamed.
+    """
+    shortcut = _sales_shortcut(state)
+    if shortcut is not None:
+        return shortcut
+
+    # The occasional summary fold is a blocking LLM call, keep it off the loop
+    conversation, context = await asyncio.to_thread(_build_sales_prompt, state)
+    response = await get_llm().ainvoke(conversation)
+    return _sales_reply(response.content.strip(), context)
 
 def verification_node(state: AgentState):
     messages = state["messages"]
@@ -76,11 +174,11 @@ def verification_node(state: AgentState):
         if result["found"]:
             user = result["data"]
             msg = f"Thanks {user['name']}. You are eligible! How much loan do you need?"
-            return {"user_data": user, "current_stage": "UNDERWRITING", "messages": messages + [msg]}
+            return {"user_data": user, "current_stage": "UNDERWRITING", "messages": [msg]}
         else:
-            return {"messages": messages + ["Number not found. Try 9999999901."], "current_stage": "VERIFICATION"}
+            return {"messages": ["Number not found. Try 9999999901."], "current_stage": "VERIFICATION"}
             
-    return {"messages": messages + ["Please enter a valid 10-digit phone number."], "current_stage": "VERIFICATION"}
+    return {"messages": ["Please enter a valid 10-digit phone number."], "current_stage": "VERIFICATION"}
 
 def underwriting_node(state: AgentState):
     messages = state["messages"]
@@ -93,16 +191,16 @@ def underwriting_node(state: AgentState):
             clean_amount = last_msg.lower().replace("k", "000").replace(",", "")
             amount = float(clean_amount)
             
-            offer_table = get_emi_options_table(amount)
+            offer_table = tool_offer_table(amount)
             
             return {
-                "messages": messages + [offer_table], 
+                "messages": [offer_table], 
                 "current_stage": "UNDERWRITING", 
                 "loan_amount": amount 
             }
         except ValueError:
             return {
-                "messages": messages + ["Please enter a valid numeric amount (e.g. 500000)."], 
+                "messages": ["Please enter a valid numeric amount (e.g. 500000)."], 
                 "current_stage": "UNDERWRITING"
             }
 
@@ -110,16 +208,16 @@ def underwriting_node(state: AgentState):
     else:
         amount = state["loan_amount"]
         
-        if last_msg in ["12", "24", "36","48","60"]:
+        if last_msg in TENURE_OPTIONS:
             selected_tenure = int(last_msg)
             
-            decision = tool_check_eligibility(amount, user_data)
+            decision = tool_underwrite(amount, selected_tenure, user_data)
             
             if decision["status"] == "APPROVED_INSTANT":
-                final_emi = calculate_emi(amount, 12.0, selected_tenure)
+                final_emi = decision["emi"]
                 
-                # --- NEW: GENERATE PDF ---
-                pdf_path = generate_sanction_letter(
+                # --- NEW: QUEUE PDF (rendered in the background) ---
+                job_id = get_letter_queue().submit(
                     user_name=user_data['name'],
                     phone=user_data['phone'],
                     amount=amount,
@@ -127,55 +225,84 @@ def underwriting_node(state: AgentState):
                     emi=final_emi
                 )
                 
-                res = f"Excellent choice! Your {selected_tenure}-month plan is **INSTANTLY APPROVED**. 🟢\n\nI have generated your Sanction Letter. Please download it below."
+                res = f"Excellent choice! Your {selected_tenure}-month plan is **INSTANTLY APPROVED**. 🟢\n\nI am preparing your Sanction Letter. You can download it below."
                 
                 return {
-                    "messages": messages + [res], 
+                    "messages": [res], 
                     "current_stage": "END", 
-                    "sanction_letter": pdf_path # <--- Store path
+                    "letter_job_id": job_id # <--- Poll /letters/jobs/{id}
                 }
                 
             elif decision["status"] == "REQUIRES_SALARY_SLIP":
                 res = f"Great choice. Since ₹{amount:,.0f} is a high amount, I just need your Salary Slip to confirm the EMI. Please upload it."
-                return {"messages": messages + [res], "current_stage": "UPLOAD"}
+                return {"messages": [res], "current_stage": "UPLOAD"}
                 
             else:
+                # --- COUNTER-OFFER: the most we can sanction, instead of a dead end ---
+                offer = counter_offer(user_data) if COUNTER_OFFER_ENABLED else None
+                if offer and offer["amount"] < amount:
+                    res = (f"I'm sorry, I can't approve ₹{amount:,.0f}. Reason: {decision['reason']}\n\n"
+                           f"The most I can offer you is **₹{offer['amount']:,.0f}** over {offer['tenure']} months "
+                           f"(EMI ₹{offer['emi']:,.0f}). Type an amount up to ₹{offer['amount']:,.0f} to see your plans.")
+                    return {"messages": [res], "current_stage": "UNDERWRITING", "loan_amount": 0}
+
                 res = f"I'm sorry. We cannot approve this amount. Reason: {decision['reason']}"
-                return {"messages": messages + [res], "current_stage": "END"}
+                return {"messages": [res], "current_stage": "END"}
         
         else:
             return {
-                "messages": messages + ["Please select a tenure: Type '12', '24', or '36'."], 
+                "messages": ["Please select a tenure: Type '12', '24', or '36'."], 
                 "current_stage": "UNDERWRITING"
             }
 
 # 4. Build Graph
-workflow = StateGraph(AgentState)
+def router(state):
+    return state["current_stage"].lower()
 
-workflow.add_node("entry", entry_node) 
-workflow.add_node("sales", sales_node)
-workflow.add_node("verification", verification_node)
-workflow.add_node("underwriting", underwriting_node)
+def build_graph():
+    from langchain_core.runnables import RunnableLambda
+    from langgraph.graph import StateGraph, END
 
-workflow.set_entry_point("entry")
+    workflow = StateGraph(AgentState)
 
-def router(state):
-    return state["current_stage"].lower()
+    # Every node is timed and its stage changes counted (see /metrics)
+    workflow.add_node("entry", instrument_node("entry", entry_node)) 
+    workflow.add_node("sales", RunnableLambda(
+        instrument_node("sales", sales_node),
+        afunc=instrument_node("sales", asales_node),
+        name="sales"
+    ))
+    workflow.add_node("verification", instrument_node("verification", verification_node))
+    workflow.add_node("underwriting", instrument_node("underwriting", underwriting_node))
+
+    workflow.set_entry_point("entry")
 
-workflow.add_conditional_edges(
-    "entry",
-    router,
-    {
-        "sales": "sales",
-        "verification": "verification",
-        "underwriting": "underwriting",
-        "upload": END,
-        "end": END
-    }
-)
-
-workflow.add_edge("sales", END)
-workflow.add_edge("verification", END)
-workflow.add_edge("underwriting", END)
-
-app_graph = workflow.compile()
\ No newline at end of file
+    workflow.add_conditional_edges(
+        "entry",
+        router,
+        {
+            "sales": "sales",
+            "verification": "verification",
+            "underwriting": "underwriting",
+            "upload": END,
+            "end": END
+        }
+    )
+
+    workflow.add_edge("sales", END)
+    workflow.add_edge("verification", END)
+    workflow.add_edge("underwriting", END)
+
+    return workflow.compile()
+
+def get_graph():
+    """
+    The compiled graph, built on first use. Concurrent first callers wait
+    for one build instead of racing.
+    """
+    global _graph
+    if _graph is None:
+        with _init_lock:
+            if _graph is None:
+                _graph = build_graph()
+    return _graph
@@ -1,5 +1,15 @@
 from app.services.mock_crm import get_customer_by_phone
-from app.core.logic import check_initial_eligibility, verify_salary_slip_logic
+from app.core.logic import (
+    check_initial_eligibility, verify_salary_slip_logic, calculate_emi, check_uploaded_slip,
+    eligibility_decision, get_emi_options_table, get_offer_tenures, policy_rate, TENURE_MONTHS
+)
+from app.services.offer_grid import get_offer_grid
+
+# Tenures the chat accepts (as typed by the user)
+TENURE_OPTIONS = [str(t) for t in TENURE_MONTHS]
+
+# /upload sanctions slip-verified loans on this tenure
+UPLOAD_TENURE = 36
 
 def tool_lookup_user(phone: str):
     """
@@ -18,4 +28,43 @@ def tool_check_eligibility(amount: float, user_data: dict):
         requested_amount=float(amount),
         pre_approved_limit=user_data["pre_approved_limit"],
         credit_score=user_data["credit_score"]
-    )
\ No newline at end of file
+    )
+
+def tool_offer_table(amount: float) -> str:
+    """
+    The EMI options table for an amount; read from the offer grid when the
+    amount is on its ladder.
+    """
+    grid = get_offer_grid()
+    emis = grid.offer_emis(amount, get_offer_tenures(amount)) if grid else None
+    return get_emi_options_table(amount, emis)
+
+def tool_underwrite(amount: float, tenure: int, user_data: dict):
+    """
+    The decision for a chosen tenure, exactly as underwriting_node makes it.
+    Adds the sanctioned EMI when the loan is approved instantly.
+    Band and EMI come from the offer grid when it covers the customer and amount.
+    """
+    grid = get_offer_grid()
+    rule = grid.band(user_data["phone"], float(amount)) if grid else None
+    if rule is None:
+        decision = tool_check_eligibility(amount, user_data)
+    else:
+        decision = eligibility_decision(rule, float(amount), user_data["pre_approved_limit"],
+                                        user_data["credit_score"])
+    if decision["status"] == "APPROVED_INSTANT":
+        # The offer table's EMI, so the letter shows what the customer picked
+        emis = grid.offer_emis(amount, [tenure]) if grid else None
+        decision["emi"] = emis[0] if emis else calculate_emi(float(amount), policy_rate(), tenure)
+    return decision
+
+def tool_check_salary_slip(amount: float, salary: float):
+    """
+    The decision /upload makes once a salary slip is in (the policy's
+    "upload" stage; pass the salary from reconcile_salary).
+    """
+    decision = check_uploaded_slip(amount, salary)
+    if decision["status"] == "APPROVED_WITH_DOCS":
+        decision["tenure"] = UPLOAD_TENURE
+        decision["emi"] = calculate_emi(float(amount), policy_rate(), UPLOAD_TENURE)
+    return decision
@@ -0,0 +1,210 @@
+import os
+
+# --- PATHS ---
+CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.normpath(os.path.join(CORE_DIR, ".."))
+
+# --- CUSTOMER STORE ---
+# Where KYC records come from. Accepted formats (picked by file extension):
+#   .json            -> JSON array of customer objects (the default mock file)
+#   .ndjson / .jsonl -> one customer object per line
+#   .db / .sqlite    -> compact SQLite table built with
+#                       `python -m app.services.customer_store build <src> <dest>`
+CUSTOMER_DB_PATH = os.getenv(
+    "CUSTOMER_DB_PATH",
+    os.path.join(APP_DIR, "data", "customers.json")
+)
+
+# How often (seconds) a lookup is allowed to stat() the file to check for changes.
+CUSTOMER_DB_RECHECK_SECONDS = float(os.getenv("CUSTOMER_DB_RECHECK_SECONDS", "1.0"))
+
+# --- CREDIT POLICY ---
+# Underwriting rules, compiled once by app/core/rules.py. Each stage runs its
+# "reject" rules (any match rejects; the first one listed gives the reason),
+# then its "tiers" in order, then "default". A rule's "when" compares two
+# sides of the form `number`, `name` or `number * name`, where a name is a
+# param below or an applicant field. Reasons are format strings over both.
+CREDIT_POLICY = {
+    "params": {
+        "rate_pa": 12.0,
+        "min_credit_score": 700,
+        "max_limit_multiple": 2,
+        "max_emi_to_salary": 0.5,
+    },
+    "stages": {
+        # Stage 1: CRM limits and score only (check_initial_eligibility)
+        "initial": {
+            "reject": [
+                {"name": "min_credit_score", "when": "credit_score < min_credit_score",
+                 "reason": "Credit Score below {min_credit_score} threshold."},
+                {"name": "max_limit_multiple", "when": "requested_amount > max_limit_multiple * pre_approved_limit",
+                 "reason": "Requested amount {requested_amount} exceeds {max_limit_multiple}x limit of {pre_approved_limit}."},
+            ],
+            "tiers": [
+                {"name": "within_limit", "when": "requested_amount <= pre_approved_limit",
+                 "status": "APPROVED_INSTANT", "reason": "Within pre-approved limit."},
+            ],
+            "default": {"status": "REQUIRES_SALARY_SLIP",
+                        "reason": "Amount exceeds pre-approved limit but is within {max_limit_multiple}x multiplier."},
+        },
+        # Stage 2: EMI against the salary (verify_salary_slip_logic)
+        "salary_slip": {
+            "tiers": [
+                {"name": "emi_within_cap", "when": "emi <= max_emi_to_salary * salary",
+                 "status": "APPROVED_WITH_DOCS", "reason": "EMI ({emi}) is within {max_emi_to_salary:.0%} of salary ({salary})."},
+            ],
+            "default": {"status": "REJECTED", "reason": "EMI ({emi}) exceeds {max_emi_to_salary:.0%} of monthly salary."},
+        },
+        # After /upload (check_uploaded_slip, mock EMI burden rule)
+        "upload": {
+            "tiers": [
+                {"name": "burden_within_cap", "when": "max_emi_to_salary * salary > 0.02 * requested_amount",
+                 "status": "APPROVED_WITH_DOCS", "reason": "EMI burden within {max_emi_to_salary:.0%} of salary."},
+            ],
+            "default": {"status": "REJECTED",
+                        "reason": "EMI burden exceeds {max_emi_to_salary:.0%} of the declared salary ({salary})."},
+        },
+    },
+}
+# Optional JSON file with the same shape; replaces CREDIT_POLICY and is
+# reloaded when it changes, so every worker picks up a new policy in place.
+CREDIT_POLICY_PATH = os.getenv("CREDIT_POLICY_PATH", "")
+CREDIT_POLICY_RECHECK_SECONDS = float(os.getenv("CREDIT_POLICY_RECHECK_SECONDS", "1.0"))
+# Reject rules are re-ranked by observed hit rate every this many evaluations
+CREDIT_POLICY_REORDER_EVERY = int(os.getenv("CREDIT_POLICY_REORDER_EVERY", "1000"))
+
+# --- OFFER GRID ---
+# Stage 1 decisions per customer and amount (one byte each) plus an EMI /
+# interest grid over a ladder of amounts, precomputed with
+# `python -m app.services.offer_grid build`.
+# Offers for amounts on the ladder are looked up; anything else is computed live.
+OFFER_GRID_ENABLED = os.getenv("OFFER_GRID_ENABLED", "1") == "1"
+OFFER_GRID_DIR = os.getenv("OFFER_GRID_DIR", os.path.join(APP_DIR, "data", "offers"))
+OFFER_GRID_MIN_AMOUNT = float(os.getenv("OFFER_GRID_MIN_AMOUNT", "10000"))
+OFFER_GRID_MAX_AMOUNT = float(os.getenv("OFFER_GRID_MAX_AMOUNT", "5000000"))
+OFFER_GRID_STEP = float(os.getenv("OFFER_GRID_STEP", "10000"))
+
+# --- COUNTER-OFFERS ---
+# A rejected amount gets the largest loan the customer can afford instead:
+# EMI + existing obligations (current_loans, monthly) <= the policy's
+# max_emi_to_salary x salary, and never more than its max_limit_multiple x
+# the pre-approved limit (see CREDIT_POLICY params).
+COUNTER_OFFER_ENABLED = os.getenv("COUNTER_OFFER_ENABLED", "1") == "1"
+COUNTER_OFFER_STEP = float(os.getenv("COUNTER_OFFER_STEP", "1000"))  # offers are rounded down to this
+COUNTER_OFFER_MIN_AMOUNT = float(os.getenv("COUNTER_OFFER_MIN_AMOUNT", "10000"))  # smaller = no offer
+
+# --- STARTUP ---
+# Heavy components (LLM client, graph, customer index, PDF workers) are built
+# lazily; the warm-up builds them ahead of the first request.
+#   "background" -> serve health checks at once, warm up in a thread (/ready says when done)
+#   "blocking"   -> finish warming before the app accepts requests
+#   "off"        -> everything initializes on first use
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "background")
+
+# --- SESSION STORE ---
+# Backend for conversation state:
+#   "memory" -> in-process dict, single uvicorn worker only
+#   "sqlite" -> shared SQLite file in WAL mode, safe for `uvicorn --workers N`
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(APP_DIR, "data", "sessions.db"))
+
+# Requests on one session run one at a time; a request waits at most this
+# long (seconds) for the one ahead of it before failing with 409
+SESSION_LOCK_TIMEOUT = float(os.getenv("SESSION_LOCK_TIMEOUT", "30"))
+
+# Eviction limits for the in-process store
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "10000"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# --- LLM CONTEXT WINDOW (sales_node) ---
+# The prompt is: system prompt + rolling summary of older turns + last K turns verbatim.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_KEEP_TURNS = int(os.getenv("CONTEXT_KEEP_TURNS", "4"))
+# Older turns are folded into the summary in batches of this many turns,
+# so the summarizer runs once per batch instead of on every request.
+CONTEXT_SUMMARY_BATCH_TURNS = int(os.getenv("CONTEXT_SUMMARY_BATCH_TURNS", "4"))
+CONTEXT_SUMMARY_MAX_TOKENS = int(os.getenv("CONTEXT_SUMMARY_MAX_TOKENS", "256"))
+# How many trailing messages /chat loads from the session store per turn
+CONTEXT_HISTORY_LIMIT = 4 * (CONTEXT_KEEP_TURNS + CONTEXT_SUMMARY_BATCH_TURNS)
+
+# --- INTENT FAST PATH (sales_node) ---
+# Short, unambiguous replies ("yes", "no thanks", "hi") are answered without the LLM.
+INTENT_FAST_PATH = os.getenv("INTENT_FAST_PATH", "1") == "1"
+# Optional pickled classifier (predict_proba + classes_, e.g. a scikit-learn
+# pipeline) consulted when no rule matches. Empty = rules only.
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", "")
+INTENT_MODEL_THRESHOLD = float(os.getenv("INTENT_MODEL_THRESHOLD", "0.9"))
+
+# --- LLM RESPONSE CACHE ---
+# temperature=0 means identical (normalized) prompts give identical replies.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+# Optional SQLite file so the cache survives restarts and is shared by workers. Empty = memory only.
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+
+# --- LLM GATEWAY ---
+# Admission control for provider calls (cache hits never get here).
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))  # waiting callers beyond this are shed at once
+# Provider limits; defaults are Groq's free tier for llama-3.1-8b-instant. 0 = unlimited
+LLM_RPM = float(os.getenv("LLM_RPM", "30"))
+LLM_TPM = float(os.getenv("LLM_TPM", "6000"))
+LLM_COMPLETION_TOKENS = int(os.getenv("LLM_COMPLETION_TOKENS", "256"))  # booked per call until usage is known
+# Longest a call may wait to be admitted, and its total budget including retries (seconds)
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "5"))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "20"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+
+# --- BATCH ELIGIBILITY ---
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 2)))
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "5000"))
+
+# --- SANCTION LETTER JOBS ---
+# PDFs are rendered off the request path on a process pool.
+LETTER_WORKERS = int(os.getenv("LETTER_WORKERS", "2"))
+# Max letters queued or rendering at once; submitters wait up to
+# LETTER_QUEUE_TIMEOUT seconds for a slot before the request fails with 503.
+LETTER_QUEUE_SIZE = int(os.getenv("LETTER_QUEUE_SIZE", "200"))
+LETTER_QUEUE_TIMEOUT = float(os.getenv("LETTER_QUEUE_TIMEOUT", "2.0"))
+# How many finished jobs to remember in-process (status of older ones comes from disk)
+LETTER_JOB_HISTORY = int(os.getenv("LETTER_JOB_HISTORY", "10000"))
+# Fill the variable fields into a pre-rendered letter instead of laying out every PDF
+LETTER_TEMPLATE_MODE = os.getenv("LETTER_TEMPLATE_MODE", "1") == "1"
+
+# --- BULK SANCTION LETTERS ---
+# `python -m app.services.bulk_letters` renders campaign letters straight into
+# ZIP shards of BULK_LETTER_SHARD_SIZE letters (max 65535), on a process pool
+# fed BULK_LETTER_CHUNK_SIZE records per task.
+BULK_LETTER_WORKERS = int(os.getenv("BULK_LETTER_WORKERS", str(os.cpu_count() or 2)))
+BULK_LETTER_SHARD_SIZE = int(os.getenv("BULK_LETTER_SHARD_SIZE", "10000"))
+BULK_LETTER_CHUNK_SIZE = int(os.getenv("BULK_LETTER_CHUNK_SIZE", "200"))
+
+# --- SANCTION LETTER STORE ---
+# Content-addressed: <dir>/<sha256[:2]>/<sha256>.pdf, served by GET /letters/{id}.
+# Point every API host at the same directory (shared volume) to serve from any of them.
+LETTER_STORE_DIR = os.getenv("LETTER_STORE_DIR", os.path.normpath(os.path.join(APP_DIR, "..", "static", "letters")))
+# Job ID -> letter ID refs; inside the store so the same GC expires them
+LETTER_JOB_DIR = os.getenv("LETTER_JOB_DIR", os.path.join(LETTER_STORE_DIR, "jobs"))
+LETTER_RETENTION_SECONDS = float(os.getenv("LETTER_RETENTION_SECONDS", str(30 * 24 * 3600)))
+# How often the background GC sweeps the store (0 disables it)
+LETTER_GC_INTERVAL_SECONDS = float(os.getenv("LETTER_GC_INTERVAL_SECONDS", "3600"))
+
+# --- UPLOADS (/upload) ---
+# Larger bodies are refused with 413 before they are read
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(5 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(64 * 1024)))
+# A slip salary further than this (fraction) from the CRM salary is not
+# trusted on its own: the lower of the two decides
+SLIP_SALARY_TOLERANCE = float(os.getenv("SLIP_SALARY_TOLERANCE", "0.25"))
+
+# --- SALARY SLIP PARSER ---
+SLIP_PARSER_WORKERS = int(os.getenv("SLIP_PARSER_WORKERS", "2"))
+# Stop reading after this many pages even if the figures were not found
+SLIP_MAX_PAGES = int(os.getenv("SLIP_MAX_PAGES", "10"))
+# Parsed results, keyed by the file's SHA-256
+SLIP_CACHE_MAX_ENTRIES = int(os.getenv("SLIP_CACHE_MAX_ENTRIES", "1000"))
+SLIP_PARSE_TIMEOUT = float(os.getenv("SLIP_PARSE_TIMEOUT", "10"))
@@ -1,95 +1,226 @@
-def calculate_emi(principal: float, rate_pa: float, tenure_years: int) -> float:
+import numpy as np
+
+from app.core.config import SLIP_SALARY_TOLERANCE
+from app.core.rules import get_credit_policy
+
+# --- VECTORIZED EMI ENGINE ---
+# Every function below takes scalars or arrays (broadcast together) of
+# principal, annual rate (%) and tenure in MONTHS.
+
+def calculate_emi_array(principal, rate_pa, tenure_months) -> np.ndarray:
+    """
+    EMI for many loans in one pass (standard reducing-balance formula).
+    Loans with principal <= 0 or tenure <= 0 get 0; a 0% rate is straight-line.
+    """
+    principal, rate_pa, tenure_months = np.broadcast_arrays(
+        np.asarray(principal, dtype=np.float64),
+        np.asarray(rate_pa, dtype=np.float64),
+        np.asarray(tenure_months, dtype=np.float64)
+    )
+    monthly_rate = rate_pa / (12 * 100)
+    valid = (principal > 0) & (tenure_months > 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = (1 + monthly_rate) ** tenure_months
+        emi = (principal * monthly_rate * factor) / (factor - 1)
+        flat = principal / tenure_months
+
+    emi = np.where(monthly_rate == 0, flat, emi)
+    return np.where(valid, emi, 0.0)
+
+def amortization_schedule(principal, rate_pa, tenure_months) -> dict:
+    """
+    Month-by-month schedules for many loans at once.
+    Returns (n_loans, max_tenure) arrays; months past a loan's tenure are 0.
+    """
+    principal = np.atleast_1d(np.asarray(principal, dtype=np.float64))
+    rate_pa = np.atleast_1d(np.asarray(rate_pa, dtype=np.float64))
+    tenure_months = np.atleast_1d(np.asarray(tenure_months, dtype=np.int64))
+    principal, rate_pa, tenure_months = np.broadcast_arrays(principal, rate_pa, tenure_months)
+
+    emi = calculate_emi_array(principal, rate_pa, tenure_months)[:, None]
+    r = (rate_pa / (12 * 100))[:, None]
+    p = principal[:, None]
+    n = tenure_months[:, None]
+    k = np.arange(1, max(int(tenure_months.max(initial=0)), 0) + 1)[None, :]
+
+    # Closed-form balance after k payments: P(1+r)^k - EMI((1+r)^k - 1)/r
+    # (the last month is pinned to exactly 0 to drop float noise)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = (1 + r) ** k
+        balance = np.where(r == 0, p - emi * k, p * growth - emi * (growth - 1) / r)
+    opening = np.concatenate([np.broadcast_to(p, (p.shape[0], 1)), balance[:, :-1]], axis=1)
+    interest = opening * r
+    principal_paid = emi - interest
+
+    active = k <= n
+    balance = np.where(k == n, 0.0, balance)
+    return {
+        "month": np.broadcast_to(k, active.shape),
+        "emi": np.where(active, emi, 0.0),
+        "interest": np.where(active, interest, 0.0),
+        "principal": np.where(active, principal_paid, 0.0),
+        "balance": np.where(active, balance, 0.0),
+    }
+
+def price_loans(principal, rate_pa, tenure_months, schedule: bool = False) -> dict:
+    """
+    EMI, total payment and total interest for every loan; full amortization
+    schedules too when schedule=True.
+    """
+    emi = calculate_emi_array(principal, rate_pa, tenure_months)
+    principal_arr = np.broadcast_to(np.asarray(principal, dtype=np.float64), emi.shape)
+    months = np.broadcast_to(np.asarray(tenure_months, dtype=np.float64), emi.shape)
+
+    total_payment = emi * months  # emi is already 0 for invalid loans
+    result = {
+        "emi": emi,
+        "total_payment": total_payment,
+        "total_interest": np.where(emi > 0, total_payment - principal_arr, 0.0),
+    }
+    if schedule:
+        result["schedule"] = amortization_schedule(principal, rate_pa, tenure_months)
+    return result
+
+def max_principal_array(emi, rate_pa, tenure_months) -> np.ndarray:
+    """
+    Inverse of calculate_emi_array: the largest principal a monthly EMI can
+    service, P = EMI * (1 - (1+r)^-n) / r. A 0% rate is straight-line.
+    """
+    emi, rate_pa, tenure_months = np.broadcast_arrays(
+        np.asarray(emi, dtype=np.float64),
+        np.asarray(rate_pa, dtype=np.float64),
+        np.asarray(tenure_months, dtype=np.float64)
+    )
+    monthly_rate = rate_pa / (12 * 100)
+    valid = (emi > 0) & (tenure_months > 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        principal = emi * (1 - (1 + monthly_rate) ** -tenure_months) / monthly_rate
+    principal = np.where(monthly_rate == 0, emi * tenure_months, principal)
+    return np.where(valid, principal, 0.0)
+
+def max_affordable_amounts(salary, obligations, tenure_months, rate_pa: float = 12.0,
+                           foir: float = 0.5, step: float = 1000) -> np.ndarray:
+    """
+    Largest loan per (customer, tenure) whose EMI keeps total obligations
+    within `foir` (fixed obligations to income ratio) of the monthly salary.
+    salary / obligations are per customer (n,), tenures (t,); returns (n, t),
+    rounded down to `step` so the EMI never crosses the cap.
+    """
+    salary = np.atleast_1d(np.asarray(salary, dtype=np.float64))
+    obligations = np.atleast_1d(np.asarray(obligations, dtype=np.float64))
+    capacity = np.maximum(foir * salary - obligations, 0.0)[:, None]
+    principal = max_principal_array(capacity, rate_pa, np.asarray(tenure_months)[None, :])
+    # The tiny shave keeps float noise from rounding a boundary case up
+    return np.floor(principal * (1 - 1e-12) / step) * step
+
+def calculate_emi(principal: float, rate_pa: float, tenure_months: int) -> float:
     """
     Calculates EMI using standard formula.
-    Rate is per annum, converted to monthly.
+    Rate is per annum, converted to monthly; tenure in months, like the array engine.
     """
-    if principal <= 0 or tenure_years <= 0:
+    if principal <= 0 or tenure_months <= 0:
         return 0.0
     
-    monthly_rate = rate_pa / (12 * 100)
-    months = tenure_years * 12
+    emi = calculate_emi_array(principal, rate_pa, tenure_months)
     
-    emi = (principal * monthly_rate * ((1 + monthly_rate) ** months)) / \
-          (((1 + monthly_rate) ** months) - 1)
-    
-    return round(emi, 2)
+    return round(float(emi), 2)
+
+# --- CREDIT POLICY ---
+# The rules themselves (score floor, limit multiple, EMI cap, rate) live in
+# CREDIT_POLICY (core/config.py) and are evaluated by core/rules.py.
+
+def policy_rate() -> float:
+    """
+    Annual interest rate (%) of the current credit policy.
+    """
+    return get_credit_policy().params["rate_pa"]
+
+# --- ELIGIBILITY BANDS ---
+def eligibility_decision(rule: str, requested_amount: float, pre_approved_limit: float, credit_score: int) -> dict:
+    """
+    The Stage 1 decision when the deciding rule is already known (the offer
+    grid's bands); counted as a live decision.
+    """
+    return get_credit_policy().outcome(
+        "initial", rule, count=True, requested_amount=requested_amount,
+        pre_approved_limit=pre_approved_limit, credit_score=credit_score
+    )
 
 def check_initial_eligibility(requested_amount: float, 
                               pre_approved_limit: float, 
                               credit_score: int) -> dict:
     """
     Stage 1 Check: Based on Limits and Score ONLY.
+    [cite_start]Rules: score floor, 2x limit, instant approval within limit [cite: 1, 14, 27]
     """
-    # [cite_start]Rule: Reject if credit score < 700 [cite: 1, 14, 27]
-    if credit_score < 700:
-        return {
-            "status": "REJECTED",
-            "reason": "Credit Score below 700 threshold."
-        }
-
-    # [cite_start]Rule: Reject if > 2x pre-approved limit [cite: 27]
-    if requested_amount > (2 * pre_approved_limit):
-        return {
-            "status": "REJECTED",
-            "reason": f"Requested amount {requested_amount} exceeds 2x limit of {pre_approved_limit}."
-        }
-
-    # [cite_start]Rule: If <= Limit, Approve Instantly [cite: 27]
-    if requested_amount <= pre_approved_limit:
-        return {
-            "status": "APPROVED_INSTANT",
-            "reason": "Within pre-approved limit."
-        }
-
-    # [cite_start]Rule: If > Limit but <= 2x Limit, Request Salary Slip [cite: 27]
-    return {
-        "status": "REQUIRES_SALARY_SLIP",
-        "reason": "Amount exceeds pre-approved limit but is within 2x multiplier."
-    }
+    return get_credit_policy().evaluate(
+        "initial", requested_amount=requested_amount,
+        pre_approved_limit=pre_approved_limit, credit_score=credit_score
+    )
 
 def verify_salary_slip_logic(requested_amount: float, 
                              salary: float, 
-                             tenure_years: int = 3, 
-                             interest_rate: float = 12.0) -> dict:
+                             tenure_months: int = 36, 
+                             interest_rate: float = None) -> dict:
     """
     Stage 2 Check: Only called if status was 'REQUIRES_SALARY_SLIP'.
     [cite_start]Rule: Approve only if expected EMI <= 50% of salary [cite: 27]
     """
-    emi = calculate_emi(requested_amount, interest_rate, tenure_years)
-    
-    if emi <= (0.5 * salary):
-        return {
-            "status": "APPROVED_WITH_DOCS",
-            "emi": emi,
-            "reason": f"EMI ({emi}) is within 50% of salary ({salary})."
-        }
-    else:
-        return {
-            "status": "REJECTED",
-            "emi": emi,
-            "reason": f"EMI ({emi}) exceeds 50% of monthly salary."
-        }
+    if interest_rate is None:
+        interest_rate = policy_rate()
+    emi = calculate_emi(requested_amount, interest_rate, tenure_months)
+    decision = get_credit_policy().evaluate("salary_slip", emi=emi, salary=salary)
+    return {"status": decision["status"], "emi": emi, "reason": decision["reason"]}
+
+def check_uploaded_slip(requested_amount: float, salary: float) -> dict:
+    """
+    Post-upload check used by /upload (mock rule: EMI burden <= max_emi_to_salary x salary).
+    """
+    return get_credit_policy().evaluate("upload", requested_amount=requested_amount, salary=salary)
+
+def reconcile_salary(slip_salary, crm_salary: float, tolerance: float = SLIP_SALARY_TOLERANCE):
+    """
+    (salary to decide on, source) from the parsed slip and the CRM record.
+    The slip wins when it agrees with the CRM within `tolerance`; otherwise
+    the lower figure is used, so a misread or edited slip cannot raise it.
+    """
+    if not slip_salary:
+        return crm_salary, "crm"
+    if abs(slip_salary - crm_salary) <= tolerance * crm_salary:
+        return slip_salary, "slip"
+    return min(slip_salary, crm_salary), "mismatch"
+
+# Every tenure (months) the chat accepts; get_offer_tenures picks three per amount
+TENURE_MONTHS = [12, 24, 36, 48, 60]
+
+def get_offer_tenures(amount: float) -> list:
+    """
+    Tenure options shown for an amount (see get_emi_options_table).
+    """
+    return [36, 48, 60] if amount >= 500000 else [12, 24, 36]
 
-def get_emi_options_table(amount: float) -> str:
+def get_emi_options_table(amount: float, emis=None) -> str:
     """
     Generates a Markdown table with dynamic tenure options.
     - Small loans: 12, 24, 36 months
     - Large loans (> 5 Lakhs): 36, 48, 60 months
+    `emis` (one per tenure) skips the EMI math, e.g. when read from the offer grid.
     """
-    rate = 12.0
+    rate = policy_rate()
     
     # --- SMART LOGIC: Tenure selection based on Amount ---
+    tenures = get_offer_tenures(amount)
     if amount >= 500000:
-        tenures = [36, 48, 60]
         title_suffix = "(Long Tenure for Low EMI)"
     else:
-        tenures = [12, 24, 36]
         title_suffix = "(Standard Plans)"
     
-    # Calculate EMIs
-    emi_1 = calculate_emi(amount, rate, tenures[0]/12)
-    emi_2 = calculate_emi(amount, rate, tenures[1]/12)
-    emi_3 = calculate_emi(amount, rate, tenures[2]/12)
+    # Calculate EMIs (all three tenures in one vectorized call)
+    if emis is None:
+        emis = calculate_emi_array(amount, rate, np.array(tenures)) if amount > 0 else np.zeros(3)
+    emi_1, emi_2, emi_3 = (round(float(e), 2) for e in emis)
     
     # Create Table
     table = f"""
@@ -103,4 +234,4 @@ def get_emi_options_table(amount: float) -> str:
     
     *Please type '{tenures[0]}', '{tenures[1]}', or '{tenures[2]}' to proceed.*
     """
-    return table
\ No newline at end of file
+    return table
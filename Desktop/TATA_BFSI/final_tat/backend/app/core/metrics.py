@@ -0,0 +1,254 @@
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets (seconds): sub-ms local work up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_fmt(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (non-cumulative) + overflow, sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_fmt(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Hand-rolled Prometheus registry. Metrics update under a per-metric lock
+    (a dict lookup and an add), so instrumentation is cheap enough to leave
+    on. Collectors are callables read only at scrape time; they export the
+    existing stats() dicts as gauges.
+    """
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Tuple[str, str, Callable[[], dict]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, prefix: str, help: str, stats: Callable[[], dict]):
+        """
+        Exports every numeric value of stats() as gauge <prefix>_<key>.
+        One level of nested dicts becomes a "key" label, e.g. per-node counts.
+        """
+        with self._lock:
+            self._collectors = [c for c in self._collectors if c[0] != prefix]
+            self._collectors.append((prefix, help, stats))
+
+    def _render_stats(self, prefix: str, help: str, stats: Callable[[], dict]) -> Iterable[str]:
+        try:
+            values = stats()
+        except Exception as e:
+            print(f"❌ Metrics collector {prefix} failed: {e}")
+            return
+        for key, value in values.items():
+            name = f"{prefix}_{key}"
+            if isinstance(value, bool) or value is None:
+                continue
+            if isinstance(value, (int, float)):
+                yield f"# HELP {name} {help}"
+                yield f"# TYPE {name} gauge"
+                yield f"{name} {_fmt(value)}"
+            elif isinstance(value, dict):
+                # {"sales": {"hits": 3, "misses": 1}} -> <prefix>_<key>_hits{key="sales"} 3
+                samples: Dict[str, List[str]] = {}
+                for sub, inner in value.items():
+                    inner = inner if isinstance(inner, dict) else {"value": inner}
+                    for field, number in inner.items():
+                        if isinstance(number, (int, float)) and not isinstance(number, bool):
+                            samples.setdefault(f"{name}_{field}", []).append(
+                                f'{name}_{field}{{key="{_escape(sub)}"}} {_fmt(number)}')
+                for metric, lines in samples.items():
+                    yield f"# HELP {metric} {help}"
+                    yield f"# TYPE {metric} gauge"
+                    yield from lines
+
+    def render(self) -> str:
+        with self._lock:
+            metrics, collectors = list(self._metrics), list(self._collectors)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for prefix, help, stats in collectors:
+            lines.extend(self._render_stats(prefix, help, stats))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- METRICS ---
+NODE_LATENCY = REGISTRY.histogram(
+    "bfsi_node_latency_seconds", "Time spent in each LangGraph node.", ["node"])
+NODE_ERRORS = REGISTRY.counter(
+    "bfsi_node_errors_total", "LangGraph node calls that raised.", ["node"])
+STAGE_TRANSITIONS = REGISTRY.counter(
+    "bfsi_stage_transitions_total", "Conversation stage changes (from -> to).", ["from_stage", "to_stage"])
+LLM_LATENCY = REGISTRY.histogram(
+    "bfsi_llm_request_seconds", "Latency of calls that reach the LLM provider.", ["node"])
+LLM_TOKENS = REGISTRY.counter(
+    "bfsi_llm_tokens_total", "LLM tokens used, by kind (prompt / completion).", ["node", "kind"])
+LLM_ADMISSION = REGISTRY.counter(
+    "bfsi_llm_admission_total", "LLM gateway decisions (admitted / rate_limited / queue_full / ...).", ["outcome"])
+LLM_QUEUE_WAIT = REGISTRY.histogram(
+    "bfsi_llm_queue_wait_seconds", "Time admitted LLM calls waited for a slot and rate budget.")
+LLM_RETRIES = REGISTRY.counter(
+    "bfsi_llm_retries_total", "LLM calls retried, by provider status / error.", ["reason"])
+CRM_LATENCY = REGISTRY.histogram(
+    "bfsi_crm_lookup_seconds", "Customer lookups, by result (found / not_found / error).", ["result"])
+PDF_RENDER = REGISTRY.histogram(
+    "bfsi_pdf_render_seconds", "Sanction-letter render time inside the worker.")
+LETTER_JOB_LATENCY = REGISTRY.histogram(
+    "bfsi_letter_job_seconds", "Sanction-letter job time from submit to done (queue + render).", ["status"])
+SESSION_LOCK_WAIT = REGISTRY.histogram(
+    "bfsi_session_lock_wait_seconds", "Time requests queued behind another request on the same session.")
+SLIP_PARSE_LATENCY = REGISTRY.histogram(
+    "bfsi_slip_parse_seconds", "Salary-slip parse time as seen by /upload.", ["cached"])
+
+
+def record_transition(from_stage: Optional[str], to_stage: Optional[str]):
+    if from_stage and to_stage:
+        STAGE_TRANSITIONS.inc(from_stage, to_stage)
+
+
+def instrument_node(name: str, fn: Callable) -> Callable:
+    """
+    Wraps a LangGraph node (sync or async) with a latency histogram, an error
+    counter and stage-transition counting. functools.wraps keeps the
+    signature, so LangGraph still sees the same parameters.
+    """
+    def _after(state, result, started):
+        NODE_LATENCY.observe(time.perf_counter() - started, name)
+        if isinstance(result, dict) and "current_stage" in result:
+            record_transition(state.get("current_stage"), result["current_stage"])
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = await fn(state, *args, **kwargs)
+            except Exception:
+                NODE_ERRORS.inc(name)
+                raise
+            _after(state, result, started)
+            return result
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = fn(state, *args, **kwargs)
+        except Exception:
+            NODE_ERRORS.inc(name)
+            raise
+        _after(state, result, started)
+        return result
+    return wrapper
+
+
+def record_llm_usage(node: str, response, seconds: float):
+    """
+    Latency + token counts from a chat model response. Token usage comes from
+    LangChain's usage_metadata, falling back to the provider's token_usage.
+    """
+    LLM_LATENCY.observe(seconds, node)
+    usage = getattr(response, "usage_metadata", None) or {}
+    prompt = usage.get("input_tokens")
+    completion = usage.get("output_tokens")
+    if prompt is None:
+        token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+        prompt = token_usage.get("prompt_tokens")
+        completion = token_usage.get("completion_tokens")
+    if prompt:
+        LLM_TOKENS.inc(node, "prompt", amount=prompt)
+    if completion:
+        LLM_TOKENS.inc(node, "completion", amount=completion)
@@ -0,0 +1,399 @@
+import hashlib
+import json
+import operator
+import os
+import re
+import string
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import (
+    CREDIT_POLICY,
+    CREDIT_POLICY_PATH,
+    CREDIT_POLICY_RECHECK_SECONDS,
+    CREDIT_POLICY_REORDER_EVERY,
+)
+
+OPS = {
+    "<=": operator.le, ">=": operator.ge, "==": operator.eq,
+    "!=": operator.ne, "<": operator.lt, ">": operator.gt,
+}
+_OP_RE = re.compile(r"(<=|>=|==|!=|<|>)")
+_SIDE_RE = re.compile(r"^\s*(?:(?P<coef>-?\d+(?:\.\d+)?|[A-Za-z_]\w*)\s*\*\s*)?(?P<name>[A-Za-z_]\w*)\s*$")
+_NUMBER_RE = re.compile(r"^\s*-?\d+(?:\.\d+)?\s*$")
+
+DEFAULT_RULE = "default"
+
+# Applicant fields each stage is evaluated with (see core/logic.py); rules and
+# reasons may use these and the params, anything else fails to compile
+STAGE_FIELDS = {
+    "initial": {"requested_amount", "pre_approved_limit", "credit_score"},
+    "salary_slip": {"emi", "salary"},
+    "upload": {"requested_amount", "salary"},
+}
+
+
+class PolicyError(ValueError):
+    """
+    Raised when a policy does not compile (bad shape, syntax or unknown op).
+    """
+
+
+def _number(text: str):
+    value = float(text)
+    return int(value) if value.is_integer() and "." not in text else value
+
+
+class _Side:
+    """
+    One side of a comparison: a constant, a field, or coef * field, where
+    coef is a number or a param. Params are folded in at compile time.
+    """
+    __slots__ = ("coef", "field", "const")
+
+    def __init__(self, text: str, params: Dict):
+        self.coef, self.field, self.const = None, None, None
+        if _NUMBER_RE.match(text):
+            self.const = _number(text.strip())
+            return
+        match = _SIDE_RE.match(text)
+        if not match:
+            raise PolicyError(f"cannot parse {text.strip()!r}")
+        coef, name = match["coef"], match["name"]
+        if coef is not None:
+            if _NUMBER_RE.match(coef):
+                coef = _number(coef)
+            elif coef in params:
+                coef = params[coef]
+            else:
+                raise PolicyError(f"{coef!r} in {text.strip()!r} is not a param")
+        if name in params:
+            self.const = params[name] if coef is None else coef * params[name]
+        else:
+            self.coef, self.field = coef, name
+
+    def value(self, values: Dict):
+        if self.field is None:
+            return self.const
+        x = values[self.field]
+        return x if self.coef is None else self.coef * x
+
+
+class Rule:
+    """
+    A compiled `when` clause plus the decision it leads to.
+    """
+
+    def __init__(self, spec: Dict, params: Dict, position: int, status: Optional[str] = None):
+        self.name = spec["name"]
+        self.position = position  # order in the policy; decides which reason wins
+        self.status = spec.get("status", status)
+        self.reason = spec.get("reason", "")
+        parts = _OP_RE.split(spec["when"])
+        if len(parts) != 3:
+            raise PolicyError(f"rule {self.name}: expected `<side> <op> <side>`, got {spec['when']!r}")
+        self.when = spec["when"]
+        self._left, self._right = _Side(parts[0], params), _Side(parts[2], params)
+        self._op = OPS[parts[1]]
+        self.fields = [s.field for s in (self._left, self._right) if s.field]
+        self.evaluated = 0
+        self.matched = 0
+        self.decided = 0
+
+    def test(self, values: Dict) -> bool:
+        return bool(self._op(self._left.value(values), self._right.value(values)))
+
+    def test_batch(self, values: Dict) -> np.ndarray:
+        return np.asarray(self._op(self._left.value(values), self._right.value(values)), dtype=bool)
+
+    def hit_rate(self) -> float:
+        return (self.matched + 1) / (self.evaluated + 2)
+
+
+class _Format(dict):
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+class Stage:
+    """
+    Reject rules (any match rejects), then tiers in order, then the default.
+
+    Reject rules are tried most-selective first, ranked by their observed hit
+    rate, so a rejection usually costs one check. Only the reason depends on
+    their order: when a rule matches, earlier-listed rules it jumped ahead of
+    are checked too, so the reason is always the one the policy lists first.
+    """
+
+    def __init__(self, name: str, spec: Dict, params: Dict):
+        self.name = name
+        self.params = params
+        self.reject = [Rule(r, params, i, status="REJECTED") for i, r in enumerate(spec.get("reject", []))]
+        self.tiers = [Rule(r, params, len(self.reject) + i) for i, r in enumerate(spec.get("tiers", []))]
+        default = spec.get("default")
+        if not default:
+            raise PolicyError(f"stage {name}: missing default")
+        self.default = Rule(dict(default, name=DEFAULT_RULE, when="0 == 0"), params,
+                            len(self.reject) + len(self.tiers))
+        self.rules = self.reject + self.tiers + [self.default]
+        self.fields = sorted({f for rule in self.rules for f in rule.fields})
+        self._check_names(STAGE_FIELDS.get(name, set().union(*STAGE_FIELDS.values())))
+        self._order = list(self.reject)
+        self._evaluations = 0
+
+    def _check_names(self, known: set):
+        # A typo would otherwise compile and raise KeyError on every evaluation
+        for rule in self.rules:
+            for field in rule.fields:
+                if field not in known:
+                    raise PolicyError(f"stage {self.name}, rule {rule.name}: unknown name {field!r} "
+                                      f"(fields: {', '.join(sorted(known))}; params: {', '.join(self.params)})")
+            try:
+                names = {f.split(".")[0].split("[")[0] for _, f, _, _ in string.Formatter().parse(rule.reason) if f}
+            except ValueError as e:
+                raise PolicyError(f"stage {self.name}, rule {rule.name}: bad reason {rule.reason!r}: {e}")
+            unknown = names - known - set(self.params)
+            if unknown:
+                raise PolicyError(f"stage {self.name}, rule {rule.name}: unknown name(s) "
+                                  f"{', '.join(sorted(unknown))} in reason")
+
+    def _reorder(self):
+        self._order = sorted(self.reject, key=lambda r: (-r.hit_rate(), r.position))
+
+    def _tick(self, n: int):
+        before = self._evaluations
+        self._evaluations += n
+        if before // CREDIT_POLICY_REORDER_EVERY != self._evaluations // CREDIT_POLICY_REORDER_EVERY:
+            self._reorder()
+
+    def outcome(self, rule: Rule, values: Dict) -> Dict:
+        return {"status": rule.status, "reason": rule.reason.format_map(_Format(self.params, **values))}
+
+    def decide(self, values: Dict, count: bool = True) -> Rule:
+        order = self._order
+        for i, rule in enumerate(order):
+            if count:
+                rule.evaluated += 1
+            if rule.test(values):
+                if count:
+                    rule.matched += 1
+                # Earlier-listed rules ranked behind this one still take precedence
+                for earlier in sorted(order[i + 1:], key=lambda r: r.position):
+                    if earlier.position > rule.position:
+                        break
+                    if count:
+                        earlier.evaluated += 1
+                    if earlier.test(values):
+                        if count:
+                            earlier.matched += 1
+                        rule = earlier
+                        break
+                break
+        else:
+            for rule in self.tiers:
+                if count:
+                    rule.evaluated += 1
+                if rule.test(values):
+                    if count:
+                        rule.matched += 1
+                    break
+            else:
+                rule = self.default
+        if count:
+            rule.decided += 1
+            self._tick(1)
+        return rule
+
+    def decide_batch(self, values: Dict, count: bool = True) -> np.ndarray:
+        """
+        Index into self.rules of the deciding rule, per applicant.
+        """
+        arrays = np.broadcast_arrays(*(np.asarray(values[f]) for f in self.fields))
+        shape = arrays[0].shape if arrays else ()
+        flat = {f: a.ravel() for f, a in zip(self.fields, arrays)}
+        n = int(np.prod(shape))
+        decided = np.full(n, self.default.position)
+        pending = np.arange(n)
+
+        def run(rule: Rule, rows: np.ndarray) -> np.ndarray:
+            hit = rule.test_batch({f: a[rows] for f, a in flat.items()})
+            hit = np.broadcast_to(hit, rows.shape)
+            if count:
+                rule.evaluated += len(rows)
+                rule.matched += int(hit.sum())
+            return hit
+
+        order = self._order
+        for rule in order:
+            if not len(pending):
+                break
+            hit = run(rule, pending)
+            decided[pending[hit]] = rule.position
+            pending = pending[~hit]
+        # Same precedence fix-up as decide(), on the rejected rows only
+        for i, rule in enumerate(order):
+            rows = np.flatnonzero(decided == rule.position)
+            for earlier in sorted(order[i + 1:], key=lambda r: r.position):
+                if earlier.position > rule.position or not len(rows):
+                    break
+                hit = run(earlier, rows)
+                decided[rows[hit]] = earlier.position
+                rows = rows[~hit]
+        for rule in self.tiers:
+            if not len(pending):
+                break
+            hit = run(rule, pending)
+            decided[pending[hit]] = rule.position
+            pending = pending[~hit]
+
+        if count:
+            for position, hits in zip(*np.unique(decided, return_counts=True)):
+                self.rules[position].decided += int(hits)
+            self._tick(n)
+        return decided.reshape(shape)
+
+
+class CompiledPolicy:
+    def __init__(self, spec: Dict):
+        try:
+            self.params = dict(spec.get("params", {}))
+            self.stages = {name: Stage(name, stage, self.params) for name, stage in spec["stages"].items()}
+        except (KeyError, TypeError) as e:
+            raise PolicyError(f"bad policy: {e}") from e
+        self.version = hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class CreditPolicyEngine:
+    """
+    Evaluates the credit policy (CREDIT_POLICY, or the CREDIT_POLICY_PATH file).
+
+    The policy is compiled once into Rule objects; a changed file is
+    recompiled on the next check, without a restart, and a broken one is
+    logged and ignored so the last good policy keeps serving. Per-rule
+    counters (evaluated / matched / decided) show which rules reject most.
+    """
+
+    def __init__(self, path: str = CREDIT_POLICY_PATH, default: Dict = CREDIT_POLICY,
+                 recheck_seconds: float = CREDIT_POLICY_RECHECK_SECONDS):
+        self.path = path
+        self.default = default
+        self.recheck_seconds = recheck_seconds
+        self._lock = threading.Lock()
+        self._policy = CompiledPolicy(default)
+        self._signature = None
+        self._last_check = 0.0
+        self._reloads = 0
+        self._errors = 0
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Recompiles the policy file if it changed. Returns True when it did.
+        """
+        if not self.path:
+            return False
+        now = time.monotonic()
+        if not force and self._last_check and now - self._last_check < self.recheck_seconds:
+            return False
+
+        with self._lock:
+            self._last_check = now
+            try:
+                st = os.stat(self.path)
+                signature = (st.st_mtime_ns, st.st_size)
+            except FileNotFoundError:
+                signature = None
+            if signature == self._signature and not force:
+                return False
+            self._signature = signature
+            try:
+                if signature is None:
+                    raise PolicyError("file not found")
+                with open(self.path) as f:
+                    policy = CompiledPolicy(json.load(f))
+            except (OSError, ValueError) as e:
+                self._errors += 1
+                print(f"❌ Error loading credit policy {self.path}, keeping version {self._policy.version}: {e}")
+                return False
+            self._policy = policy
+            self._reloads += 1
+            print(f"DEBUG: Loaded credit policy {policy.version} from {self.path}")
+            return True
+
+    @property
+    def policy(self) -> CompiledPolicy:
+        self.refresh()
+        return self._policy
+
+    @property
+    def params(self) -> Dict:
+        return self.policy.params
+
+    @property
+    def version(self) -> str:
+        return self.policy.version
+
+    def decide(self, stage: str, **values) -> Tuple[str, Dict]:
+        """
+        (name of the deciding rule, {"status", "reason"}) for one applicant.
+        """
+        compiled = self.policy.stages[stage]
+        rule = compiled.decide(values)
+        return rule.name, compiled.outcome(rule, values)
+
+    def evaluate(self, stage: str, **values) -> Dict:
+        return self.decide(stage, **values)[1]
+
+    def outcome(self, stage: str, rule_name: str, count: bool = False, **values) -> Dict:
+        """
+        The decision a given rule makes, without evaluating anything.
+        count=True records it as decided, for decisions precomputed elsewhere
+        (the offer grid's bands) that are served as live ones.
+        """
+        compiled = self.policy.stages[stage]
+        rule = next(r for r in compiled.rules if r.name == rule_name)
+        if count:
+            rule.decided += 1
+        return compiled.outcome(rule, values)
+
+    def evaluate_batch(self, stage: str, count: bool = True, **arrays) -> Dict[str, np.ndarray]:
+        """
+        Statuses and deciding rule names for a whole batch of applicants.
+        Fields are NumPy arrays (or scalars) that broadcast together; reasons
+        are not formatted, use outcome() for the rows that need one.
+        """
+        compiled = self.policy.stages[stage]
+        decided = compiled.decide_batch(arrays, count=count)
+        statuses = np.array([r.status for r in compiled.rules], dtype=object)
+        names = np.array([r.name for r in compiled.rules], dtype=object)
+        return {"status": statuses[decided], "rule": names[decided]}
+
+    def stats(self) -> Dict:
+        policy = self.policy
+        rules = {}
+        for stage in policy.stages.values():
+            for rule in stage.rules:
+                rules[f"{stage.name}.{rule.name}"] = {
+                    "evaluated": rule.evaluated, "matched": rule.matched, "decided": rule.decided
+                }
+        return {"version": policy.version, "reloads": self._reloads, "errors": self._errors, "rules": rules}
+
+
+# --- DEFAULT ENGINE ---
+_default_engine: Optional[CreditPolicyEngine] = None
+_default_lock = threading.Lock()
+
+
+def get_credit_policy() -> CreditPolicyEngine:
+    """
+    Process-wide policy engine, created on first use.
+    """
+    global _default_engine
+    if _default_engine is None:
+        with _default_lock:
+            if _default_engine is None:
+                _default_engine = CreditPolicyEngine()
+                _default_engine.refresh(force=True)
+    return _default_engine
@@ -0,0 +1,67 @@
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from app.core.config import STARTUP_WARMUP
+
+
+class WarmUp:
+    """
+    Ordered list of one-off initializers run at startup (STARTUP_WARMUP).
+
+    Each step is timed; a failing step is logged and skipped, since every
+    component still initializes lazily on first use. `ready` flips once all
+    steps have run, which is what /ready reports to the load balancer.
+    """
+
+    def __init__(self, mode: str = STARTUP_WARMUP):
+        self.mode = mode
+        self._steps: List[Tuple[str, Callable[[], object]]] = []
+        self._timings: Dict[str, float] = {}
+        self._errors: Dict[str, str] = {}
+        self._done = threading.Event()
+        self._seconds = 0.0
+
+    def add(self, name: str, fn: Callable[[], object]):
+        self._steps.append((name, fn))
+
+    def run(self):
+        started = time.perf_counter()
+        for name, fn in self._steps:
+            step_started = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                self._errors[name] = str(e)
+                print(f"❌ Warm-up step {name} failed: {e}")
+            self._timings[name] = time.perf_counter() - step_started
+        self._seconds = time.perf_counter() - started
+        print(f"DEBUG: Warm-up finished in {self._seconds:.2f}s")
+        self._done.set()
+
+    def start(self):
+        if self.mode == "blocking":
+            self.run()
+        elif self.mode == "background":
+            threading.Thread(target=self.run, name="warm-up", daemon=True).start()
+        else:
+            self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def status(self) -> dict:
+        return {
+            "mode": self.mode,
+            "ready": self.ready,
+            "pending": [name for name, _ in self._steps if name not in self._timings] if not self.ready else [],
+            "errors": dict(self._errors),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "ready": int(self.ready),
+            "seconds": round(self._seconds, 4),
+            "steps": {name: {"seconds": round(t, 4)} for name, t in self._timings.items()},
+        }
@@ -1,14 +1,59 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+import json
 import os
+import time
 
 # Backend URL
-API_BASE_URL = "http://localhost:8000"
+API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
+
+# Stream replies token-by-token from /chat/stream (set UI_STREAMING=0 to use /chat)
+STREAMING = os.getenv("UI_STREAMING", "1") == "1"
+
+# Sanction letters render in the background; wait this long before showing "preparing"
+LETTER_WAIT_SECONDS = float(os.getenv("UI_LETTER_WAIT_SECONDS", "5"))
+# A job may not be visible yet from the worker that answers the poll, or the
+# API may be restarting: 404 / 5xx only count as failures after this long
+LETTER_GIVE_UP_SECONDS = float(os.getenv("UI_LETTER_GIVE_UP_SECONDS", "120"))
+
+# Performance mode (UI_PERFORMANCE_MODE=0 to turn off):
+#  - one pooled keep-alive HTTP session per UI process instead of a new connection per call
+#  - letter PDFs cached by letter ID (the ID is the content hash, so they never change)
+#  - chat turns rerun only the chat fragment; the full transcript is redrawn only
+#    when the sidebar must change or after UI_FRAGMENT_WINDOW new messages
+PERFORMANCE_MODE = os.getenv("UI_PERFORMANCE_MODE", "1") == "1"
+HTTP_POOL_SIZE = int(os.getenv("UI_HTTP_POOL_SIZE", "20"))
+LETTER_CACHE_ENTRIES = int(os.getenv("UI_LETTER_CACHE_ENTRIES", "256"))
+FRAGMENT_WINDOW = int(os.getenv("UI_FRAGMENT_WINDOW", "20"))
 
 st.set_page_config(page_title="Tata Capital GenAI Agent", page_icon="🏦")
 
 st.title("🏦 Tata Capital Loan Assistant")
 
+# --- 0. HTTP ---
+@st.cache_resource
+def http_session() -> requests.Session:
+    """
+    Shared by every browser session of this UI process; urllib3's pool is thread-safe.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+http = http_session() if PERFORMANCE_MODE else requests
+
+def load_letter(letter_url: str) -> bytes:
+    # Fetched over HTTP, so the UI does not need to share a disk with the API
+    res = http.get(f"{API_BASE_URL}{letter_url}", timeout=10)
+    res.raise_for_status()
+    return res.content
+
+letter_bytes = (st.cache_data(max_entries=LETTER_CACHE_ENTRIES, show_spinner=False)(load_letter)
+                if PERFORMANCE_MODE else load_letter)
+
 # --- 1. INITIALIZE SESSION STATE ---
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -40,7 +85,7 @@ with st.sidebar:
             with st.spinner("Analyzing Document..."):
                 files = {"file": uploaded_file}
                 try:
-                    res = requests.post(
+                    res = http.post(
                         f"{API_BASE_URL}/upload?thread_id={st.session_state.thread_id}", 
                         files=files
                     )
@@ -52,7 +97,7 @@ with st.sidebar:
                         msg_data = {
                             "role": "assistant", 
                             "content": data["bot_reply"],
-                            "sanction_letter": data.get("sanction_letter") # <--- SAVE THIS
+                            "letter_job_id": data.get("letter_job_id") # <--- SAVE THIS
                         }
                         st.session_state.messages.append(msg_data)
                         st.rerun()
@@ -61,7 +106,7 @@ with st.sidebar:
 
     # Reset Button
     if st.button("Reset Conversation"):
-        requests.post(f"{API_BASE_URL}/reset/{st.session_state.thread_id}")
+        http.post(f"{API_BASE_URL}/reset/{st.session_state.thread_id}")
         st.session_state.messages = []
         st.session_state.current_stage = "SALES"
         st.session_state.user_data = {}
@@ -69,28 +114,100 @@ with st.sidebar:
 
 # --- 3. MAIN CHAT INTERFACE ---
 
+def resolve_letter(msg: dict, wait: float = 0.0):
+    """
+    Polls the letter job attached to a message; stores the letter URL once done.
+    """
+    job_id = msg.get("letter_job_id")
+    if not job_id or msg.get("sanction_letter") or msg.get("letter_error"):
+        return
+    deadline = time.monotonic() + wait
+    give_up_at = msg.setdefault("letter_give_up_at", time.time() + LETTER_GIVE_UP_SECONDS)
+    while True:
+        try:
+            res = http.get(f"{API_BASE_URL}/letters/jobs/{job_id}", timeout=5)
+        except Exception:
+            return
+        transient = res.status_code == 404 or res.status_code >= 500
+        if res.status_code != 200 and (not transient or time.time() >= give_up_at):
+            msg["letter_error"] = f"Letter unavailable ({res.status_code})"
+            return
+        if res.status_code != 200:
+            if time.monotonic() >= deadline:
+                return
+            time.sleep(0.3)
+            continue
+        job = res.json()
+        if job["status"] == "done":
+            msg["sanction_letter"] = job["sanction_letter"]
+            return
+        if job["status"] == "failed":
+            msg["letter_error"] = job.get("error") or "Letter generation failed"
+            return
+        if time.monotonic() >= deadline:
+            return
+        time.sleep(0.3)
+
 # --- FIX: RENDER HISTORY WITH BUTTONS ---
-for i, msg in enumerate(st.session_state.messages):
+def render_message(i: int, msg: dict):
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
         
         # CHECK IF THIS MESSAGE HAS A PDF ATTACHED
-        pdf_path = msg.get("sanction_letter")
-        if pdf_path and os.path.exists(pdf_path):
+        if msg.get("letter_job_id") and not msg.get("sanction_letter"):
+            with st.spinner("Preparing your Sanction Letter..."):
+                resolve_letter(msg, wait=LETTER_WAIT_SECONDS)
+            if msg.get("letter_error"):
+                st.error(msg["letter_error"])
+            elif not msg.get("sanction_letter"):
+                st.info("Your Sanction Letter is still being prepared.")
+                if st.button("🔄 Check again", key=f"letter_refresh_{i}"):
+                    st.rerun()
+
+        letter_url = msg.get("sanction_letter")
+        if letter_url:
             try:
-                with open(pdf_path, "rb") as pdf_file:
-                    st.download_button(
-                        label="📄 Download Sanction Letter",
-                        data=pdf_file.read(),
-                        file_name="Sanction_Letter.pdf",
-                        mime='application/pdf',
-                        key=f"download_btn_{i}" # Unique key for every button
-                    )
+                st.download_button(
+                    label="📄 Download Sanction Letter",
+                    data=letter_bytes(letter_url),
+                    file_name="Sanction_Letter.pdf",
+                    mime='application/pdf',
+                    key=f"download_btn_{i}" # Unique key for every button
+                )
             except Exception as e:
                 st.error(f"Error loading PDF: {e}")
 
+# --- STREAMING RENDERER ---
+def stream_chat(payload: dict, final: dict):
+    """
+    Yields reply tokens from the /chat/stream SSE feed for st.write_stream.
+    The closing 'done' event (or 'error') is written into `final`.
+    """
+    with http.post(f"{API_BASE_URL}/chat/stream", json=payload, stream=True) as response:
+        if response.status_code != 200:
+            final["error"] = f"Backend Error: {response.status_code}"
+            return
+
+        response.encoding = response.encoding or "utf-8"
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "token":
+                    yield data["text"]
+                elif event == "done":
+                    final.update(data)
+                elif event == "error":
+                    final["error"] = f"Backend Error: {data.get('status')} {data.get('detail')}"
+
 # --- 4. HANDLE USER INPUT ---
-if prompt := st.chat_input("Type your message here..."):
+def handle_prompt(prompt: str) -> bool:
+    """
+    Sends one message and shows the reply. Returns True once the reply is
+    saved to history (False if it failed and the error is on screen).
+    """
     # Display User Message
     st.chat_message("user").markdown(prompt)
     st.session_state.messages.append({"role": "user", "content": prompt})
@@ -102,33 +219,98 @@ if prompt := st.chat_input("Type your message here..."):
     }
     
     try:
+        if STREAMING:
+            final = {}
+            with st.chat_message("assistant"):
+                bubble = st.empty()
+                with bubble.container():
+                    streamed = st.write_stream(stream_chat(payload, final))
+
+            if "error" in final:
+                st.error(final["error"])
+                return False
+
+            # The 'done' event is authoritative: many replies stream no tokens at all
+            # (intent fast path, cache hits, retries), so show it unless the stream already did
+            bot_text = final.get("response", "Error: No response")
+            if not isinstance(streamed, str) or streamed.strip() != bot_text.strip():
+                bubble.markdown(bot_text)
+            st.session_state.current_stage = final.get("next_stage", "SALES")
+            if final.get("user_data"):
+                st.session_state.user_data = final["user_data"]
+            st.session_state.messages.append({
+                "role": "assistant", 
+                "content": bot_text,
+                "sanction_letter": final.get("sanction_letter"),
+                "letter_job_id": final.get("letter_job_id")
+            })
+            return True
+
         with st.spinner("Agent is thinking..."):
-            response = requests.post(f"{API_BASE_URL}/chat", json=payload)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                bot_text = data.get("response", "Error: No response")
-                next_stage = data.get("next_stage", "SALES")
-                user_data = data.get("user_data", {})
-                sanction_path = data.get("sanction_letter") # Capture the path
-                
-                # Update State
-                st.session_state.current_stage = next_stage
-                if user_data:
-                    st.session_state.user_data = user_data
-                
-                # --- SAVE MESSAGE WITH PDF PATH ---
-                st.session_state.messages.append({
-                    "role": "assistant", 
-                    "content": bot_text,
-                    "sanction_letter": sanction_path # <--- CRITICAL: Save it here
-                })
-                
-                # Refresh to update the Sidebar and History Loop
-                st.rerun()
-            else:
-                st.error(f"Backend Error: {response.status_code}")
+            response = http.post(f"{API_BASE_URL}/chat", json=payload)
+        
+        if response.status_code != 200:
+            st.error(f"Backend Error: {response.status_code}")
+            return False
+
+        data = response.json()
+    
+        bot_text = data.get("response", "Error: No response")
+        next_stage = data.get("next_stage", "SALES")
+        user_data = data.get("user_data", {})
+        sanction_path = data.get("sanction_letter") # Capture the path
+        letter_job_id = data.get("letter_job_id") # Or the job rendering it
+    
+        # Update State
+        st.session_state.current_stage = next_stage
+        if user_data:
+            st.session_state.user_data = user_data
+    
+        # --- SAVE MESSAGE WITH PDF PATH ---
+        st.session_state.messages.append({
+            "role": "assistant", 
+            "content": bot_text,
+            "sanction_letter": sanction_path, # <--- CRITICAL: Save it here
+            "letter_job_id": letter_job_id
+        })
+        return True
             
     except Exception as e:
-        st.error(f"Error connecting to brain: {e}")
\ No newline at end of file
+        st.error(f"Error connecting to brain: {e}")
+        return False
+
+@st.fragment
+def chat_panel():
+    """
+    Messages since the last full run, plus the input. A chat turn reruns
+    only this fragment, so the transcript drawn by the full run stays on
+    screen without being rebuilt.
+    """
+    start = st.session_state.transcript_upto
+    for i in range(start, len(st.session_state.messages)):
+        render_message(i, st.session_state.messages[i])
+
+    if prompt := st.chat_input("Type your message here..."):
+        sidebar = (st.session_state.current_stage, st.session_state.user_data)
+        if not handle_prompt(prompt):
+            return
+        # Full rerun only when the sidebar changes (every letter comes with a
+        # stage change) or the tail gets long; otherwise the turn is already on screen
+        if (st.session_state.current_stage, st.session_state.user_data) != sidebar \
+                or len(st.session_state.messages) - start >= FRAGMENT_WINDOW:
+            st.rerun()
+        if not STREAMING:
+            render_message(len(st.session_state.messages) - 1, st.session_state.messages[-1])
+
+if PERFORMANCE_MODE:
+    st.session_state.transcript_upto = len(st.session_state.messages)
+    for i, msg in enumerate(st.session_state.messages):
+        render_message(i, msg)
+    chat_panel()
+else:
+    for i, msg in enumerate(st.session_state.messages):
+        render_message(i, msg)
+    if prompt := st.chat_input("Type your message here..."):
+        if handle_prompt(prompt):
+            # Refresh to update the Sidebar and History Loop
+            st.rerun()
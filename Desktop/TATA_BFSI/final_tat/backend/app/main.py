@@ -1,26 +1,110 @@
-import shutil
-import os
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import io
+import json
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, JSONResponse, RedirectResponse, Response, PlainTextResponse
 from pydantic import BaseModel
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 from dotenv import load_dotenv
 
 # Import your Graph
-from app.agents.master import app_graph
+from app.agents.master import get_graph, get_llm, get_context_manager, get_intent_classifier, MOVE_TOKEN
+from app.agents.llm_gateway import LLMOverloadedError
 # --- NEW IMPORTS FOR PDF & LOGIC ---
-from app.services.pdf_generator import generate_sanction_letter
-from app.core.logic import calculate_emi
+from app.services.letter_jobs import get_letter_queue, LetterQueueFullError, DONE as LETTER_DONE
+from app.services.letter_store import get_letter_store, parse_range
+from app.services.pdf_parser import get_slip_parser
+from app.services.upload_ingest import UploadSizeLimitMiddleware, UploadTooLargeError, hash_upload
+from app.agents.tools import tool_check_salary_slip
+from app.agents import master
+from app.services import batch_eligibility, letter_jobs, letter_store, pdf_parser, offer_grid
+from app.core.config import CONTEXT_HISTORY_LIMIT
+from app.core.logic import reconcile_salary
+from app.core.metrics import REGISTRY, SLIP_PARSE_LATENCY, record_transition
+from app.core import rules
+from app.core.startup import WarmUp
+from app.services.customer_store import get_customer_store
+from app.services.offer_grid import get_offer_grid
+from app.services.session_store import create_session_store, new_session_state, SessionConflictError
+from app.services.session_locks import get_session_locks, SessionBusyError
 
 load_dotenv()
 
+# Everything heavy is lazy; this builds it ahead of the first customer
+# (STARTUP_WARMUP in core/config.py). Cheapest first, so /ready moves early.
+STARTUP = WarmUp()
+STARTUP.add("customer_index", lambda: get_customer_store().refresh())
+STARTUP.add("offer_grid", lambda: get_offer_grid() and get_offer_grid().refresh(force=True))
+STARTUP.add("intent", get_intent_classifier)
+STARTUP.add("llm_client", get_llm)
+STARTUP.add("context_manager", get_context_manager)
+STARTUP.add("graph", get_graph)
+STARTUP.add("pdf_workers", lambda: get_letter_queue().warm())
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Retention sweep for stored sanction letters (LETTER_GC_* in core/config.py)
+    get_letter_store().start_gc()
+    STARTUP.start()
+    yield
+    get_letter_store().stop_gc()
+
 app = FastAPI(
     title="Tata Capital Agentic Backend",
     description="API for Chat, File Upload, and Logic testing.",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 )
 
-# --- 1. THE FAKE DATABASE (Session Storage) ---
-MEMORY_DB = {}
+# Refuse oversized salary slips before the body is read (UPLOAD_MAX_BYTES)
+app.add_middleware(UploadSizeLimitMiddleware, paths=["/upload"])
+
+# --- 1. SESSION STORAGE ---
+# In-process (LRU + idle TTL + byte cap) or shared SQLite for multi-worker
+# deployments, see SESSION_* in core/config.py
+SESSION_STORE = create_session_store()
+
+CONFLICT_DETAIL = "This conversation was updated by another request. Please retry."
+
+# Requests on one thread_id run one at a time, in order (SESSION_LOCK_TIMEOUT);
+# different sessions never wait on each other
+SESSION_LOCKS = get_session_locks()
+BUSY_DETAIL = "Still working on your previous message. Please retry."
+
+# Stats of the lazy components only once something has built them: reading
+# /stats or /metrics must not build an LLM client or load the offer grid.
+def _if_built(module, singleton: str, stats: Callable = lambda obj: obj.stats()) -> Callable[[], dict]:
+    def collect() -> dict:
+        obj = getattr(module, singleton)
+        return stats(obj) if obj is not None else {}
+    return collect
+
+CONTEXT_STATS = _if_built(master, "_context_manager")
+INTENT_STATS = _if_built(master, "_intent_classifier")
+LLM_CACHE_STATS = _if_built(master, "_llm")
+LLM_GATEWAY_STATS = _if_built(master, "_llm", lambda llm: llm.llm.stats())
+LETTER_QUEUE_STATS = _if_built(letter_jobs, "_default_queue")
+LETTER_STORE_STATS = _if_built(letter_store, "_default_store")
+SLIP_PARSER_STATS = _if_built(pdf_parser, "_default_parser")
+OFFER_GRID_STATS = _if_built(offer_grid, "_default_grid")
+CREDIT_POLICY_STATS = _if_built(rules, "_default_engine")
+
+# The /stats counters, also exported as gauges on /metrics
+REGISTRY.register_stats("bfsi_sessions", "Session store counters.", SESSION_STORE.stats)
+REGISTRY.register_stats("bfsi_context", "Context window / summary counters.", CONTEXT_STATS)
+REGISTRY.register_stats("bfsi_intent", "Local intent fast-path counters.", INTENT_STATS)
+REGISTRY.register_stats("bfsi_llm_cache", "LLM response cache counters.", LLM_CACHE_STATS)
+REGISTRY.register_stats("bfsi_llm_gateway", "LLM admission control counters.", LLM_GATEWAY_STATS)
+REGISTRY.register_stats("bfsi_startup", "Startup warm-up timings (seconds).", STARTUP.stats)
+REGISTRY.register_stats("bfsi_letters", "Sanction-letter job queue counters.", LETTER_QUEUE_STATS)
+REGISTRY.register_stats("bfsi_letter_store", "Sanction-letter store counters.", LETTER_STORE_STATS)
+REGISTRY.register_stats("bfsi_slip_parser", "Salary-slip parser counters.", SLIP_PARSER_STATS)
+REGISTRY.register_stats("bfsi_session_locks", "Per-session lock contention counters.", SESSION_LOCKS.stats)
+REGISTRY.register_stats("bfsi_credit_rules", "Credit policy rule counters (evaluated / matched / decided).",
+                        CREDIT_POLICY_STATS)
+REGISTRY.register_stats("bfsi_offer_grid", "Precomputed offer grid hits and fallbacks.", OFFER_GRID_STATS)
 
 # --- 2. DATA MODELS ---
 class ChatRequest(BaseModel):
@@ -32,6 +116,7 @@ class ChatResponse(BaseModel):
     next_stage: str
     user_data: Dict[str, Any] = {}
     sanction_letter: Optional[str] = None # <--- Added this field
+    letter_job_id: Optional[str] = None # Poll /letters/jobs/{id} for the PDF
 
 # --- 3. ENDPOINTS ---
 
@@ -39,130 +124,403 @@ class ChatResponse(BaseModel):
 def health_check():
     return {"status": "active", "message": "System Ready"}
 
+@app.get("/ready")
+def readiness_check():
+    """
+    Readiness probe: 503 until the startup warm-up has run, so new replicas
+    only take traffic once the first request will not pay the cold start.
+    """
+    status = STARTUP.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/stats")
+def stats():
+    """
+    Counters per component; {} for lazy ones nothing has built yet.
+    """
+    return {
+        "sessions": SESSION_STORE.stats(),
+        "startup": STARTUP.stats(),
+        "context": CONTEXT_STATS(),
+        "intent": INTENT_STATS(),
+        "llm_cache": LLM_CACHE_STATS(),
+        "llm_gateway": LLM_GATEWAY_STATS(),
+        "letters": LETTER_QUEUE_STATS(),
+        "letter_store": LETTER_STORE_STATS(),
+        "slip_parser": SLIP_PARSER_STATS(),
+        "session_locks": SESSION_LOCKS.stats(),
+        "offer_grid": OFFER_GRID_STATS(),
+        "credit_policy": CREDIT_POLICY_STATS()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Prometheus text exposition: node / LLM / CRM / PDF latency histograms,
+    LLM token counters, stage transitions and the /stats counters.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/reset/{thread_id}")
 def reset_memory(thread_id: str):
-    if thread_id in MEMORY_DB:
-        del MEMORY_DB[thread_id]
+    try:
+        with SESSION_LOCKS.hold(thread_id):
+            SESSION_STORE.delete(thread_id)
+    except SessionBusyError:
+        raise HTTPException(status_code=409, detail=BUSY_DETAIL)
     return {"message": f"Memory cleared for {thread_id}"}
 
-@app.post("/chat", response_model=ChatResponse)
-def chat_endpoint(req: ChatRequest):
+# --- 4. CHAT HELPERS (shared by /chat and /chat/stream) ---
+
+def _load_turn(req: ChatRequest):
     """
-    The Main Brain. Sends text to the Agent.
+    Loads the session and builds the graph inputs for one turn.
     """
-    # 1. Retrieve or Initialize State
-    if req.thread_id not in MEMORY_DB:
-        MEMORY_DB[req.thread_id] = {
-            "messages": [], 
-            "current_stage": "SALES",
-            "user_data": {},
-            "loan_amount": 0,
-            "sanction_letter": None
-        }
-    
-    current_state = MEMORY_DB[req.thread_id]
+    # Only the tail of the log is loaded; older turns live in the rolling summary
+    current_state = SESSION_STORE.get(req.thread_id, history_limit=CONTEXT_HISTORY_LIMIT) \
+        or new_session_state()
+    history = current_state["messages"]
 
-    # 2. Append User Message to State
+    # Only this turn's message goes in; earlier turns are passed by reference
     inputs = {
-        "messages": current_state["messages"] + [req.message],
+        "messages": [req.message],
+        "history": history,
+        "history_start": current_state["message_count"] - len(history),
+        "context": current_state.get("context", {}),
         "current_stage": current_state["current_stage"],
         "user_data": current_state["user_data"],
         "loan_amount": current_state["loan_amount"],
-        "sanction_letter": current_state.get("sanction_letter")
+        "sanction_letter": current_state.get("sanction_letter"),
+        "letter_job_id": current_state.get("letter_job_id")
     }
-    
+    return current_state, inputs
+
+def _save_turn(req: ChatRequest, current_state: dict, result: dict):
+    """
+    Saves the NEW state back to the session store (messages: just the delta).
+    """
+    SESSION_STORE.put(req.thread_id, {
+        "current_stage": result["current_stage"],
+        "user_data": result.get("user_data", {}),
+        "loan_amount": result.get("loan_amount", 0),
+        "sanction_letter": result.get("sanction_letter"),
+        "letter_job_id": result.get("letter_job_id"),
+        "upload": current_state.get("upload"),
+        "context": result.get("context", {})
+    }, expected_version=current_state["version"], new_messages=result["messages"])
+
+def _chat_reply(result: dict) -> dict:
+    # Extract the Bot's last reply
+    bot_msg = result["messages"][-1]
+    response_text = bot_msg.content if hasattr(bot_msg, 'content') else str(bot_msg)
+
+    # --- FIX: Pass 'sanction_letter' to the frontend ---
+    return {
+        "response": response_text,
+        "next_stage": result["current_stage"],
+        "user_data": result.get("user_data", {}),
+        "sanction_letter": result.get("sanction_letter", None),
+        "letter_job_id": result.get("letter_job_id", None)
+    }
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# --- 5. CHAT ENDPOINTS ---
+
+@app.post("/chat", response_model=ChatResponse)
+def chat_endpoint(req: ChatRequest):
+    """
+    The Main Brain. Sends text to the Agent.
+    """
     try:
-        # 3. Run the LangGraph Agent
-        result = app_graph.invoke(inputs)
-        
-        # 4. Save the NEW state back to our "Fake Database"
-        MEMORY_DB[req.thread_id] = {
-            "messages": result["messages"],
-            "current_stage": result["current_stage"],
-            "user_data": result.get("user_data", {}),
-            "loan_amount": result.get("loan_amount", 0),
-            "sanction_letter": result.get("sanction_letter")
-        }
-        
-        # 5. Extract the Bot's last reply
-        bot_msg = result["messages"][-1]
-        response_text = bot_msg.content if hasattr(bot_msg, 'content') else str(bot_msg)
-
-        # --- FIX: Pass 'sanction_letter' to the frontend ---
-        return {
-            "response": response_text,
-            "next_stage": result["current_stage"],
-            "user_data": result.get("user_data", {}),
-            "sanction_letter": result.get("sanction_letter", None) # <--- ADD THIS
-        }
+        # load -> graph -> save as one step per session, so a quick second
+        # message waits for the first instead of failing with a conflict
+        with SESSION_LOCKS.hold(req.thread_id):
+            current_state, inputs = _load_turn(req)
+            result = get_graph().invoke(inputs)
+            _save_turn(req, current_state, result)
+        return _chat_reply(result)
 
+    except SessionBusyError:
+        raise HTTPException(status_code=409, detail=BUSY_DETAIL)
+    except SessionConflictError:
+        raise HTTPException(status_code=409, detail=CONFLICT_DETAIL)
+    except LLMOverloadedError as e:
+        # Shed before anything was saved: safe to resend the same message
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except LetterQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/stream")
+async def chat_stream_endpoint(req: ChatRequest):
+    """
+    Async twin of /chat. Streams sales_node tokens as Server-Sent Events:
+      event: token -> {"text": "..."}             (zero or more)
+      event: done  -> same body as /chat          (last event)
+      event: error -> {"status": 409|500|503, "detail": "...", "retry_after"?: seconds}
+    The 'done' response is authoritative; it can differ from the streamed
+    text (e.g. when the model answers with the hand-off token).
+    """
+    async def event_stream():
+        result = None
+        held = ""        # text held back while it could still be the hand-off token
+        flushing = False
+        try:
+            # Taken inside the generator, so it is released however the
+            # stream ends (including a client disconnect)
+            async with SESSION_LOCKS.ahold(req.thread_id):
+                current_state, inputs = await run_in_threadpool(_load_turn, req)
+                # Off the loop: the first call may still be building the graph
+                graph = await run_in_threadpool(get_graph)
+                async for mode, chunk in graph.astream(inputs, stream_mode=["messages", "values"]):
+                    if mode == "values":
+                        result = chunk
+                        continue
+
+                    message, metadata = chunk
+                    if metadata.get("langgraph_node") != "sales" or not message.content:
+                        continue
+                    if flushing:
+                        yield _sse("token", {"text": message.content})
+                        continue
+                    held += message.content
+                    if not MOVE_TOKEN.startswith(held.strip().strip("'\"")[:len(MOVE_TOKEN)]):
+                        flushing = True
+                        yield _sse("token", {"text": held})
+
+                await run_in_threadpool(_save_turn, req, current_state, result)
+            yield _sse("done", _chat_reply(result))
+
+        except SessionBusyError:
+            yield _sse("error", {"status": 409, "detail": BUSY_DETAIL})
+        except SessionConflictError:
+            yield _sse("error", {"status": 409, "detail": CONFLICT_DETAIL})
+        except LLMOverloadedError as e:
+            yield _sse("error", {"status": 503, "detail": str(e), "retry_after": e.retry_after})
+        except LetterQueueFullError as e:
+            yield _sse("error", {"status": 503, "detail": str(e)})
+        except Exception as e:
+            yield _sse("error", {"status": 500, "detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 
 @app.post("/upload")
 async def upload_salary_slip(thread_id: str, file: UploadFile = File(...)):
     """
     The specific endpoint for the '2x Limit' Edge Case.
+    The body arrives in a per-request spooled temp file (memory first, disk
+    past 1 MB); it is size-capped by UploadSizeLimitMiddleware and never
+    copied into the working directory.
     """
+    try:
+        async with SESSION_LOCKS.ahold(thread_id):
+            return await _process_upload(thread_id, file)
+    except SessionBusyError:
+        raise HTTPException(status_code=409, detail=BUSY_DETAIL)
+    finally:
+        await file.close()
+
+async def _process_upload(thread_id: str, file: UploadFile):
     # 1. Check if session exists
-    if thread_id not in MEMORY_DB:
+    state = await run_in_threadpool(SESSION_STORE.get, thread_id, history_limit=0)
+    if state is None:
         raise HTTPException(status_code=404, detail="Session not found. Start a chat first.")
-    
-    state = MEMORY_DB[thread_id]
-    
-    # 2. Validation
+
+    # 2. Fingerprint the file (streamed, off the loop once spooled to disk)
+    try:
+        sha256, size = await hash_upload(file)
+    except UploadTooLargeError:
+        raise HTTPException(status_code=413, detail="File too large.")
+
+    # Same file again (retry / double submit): answer with the first result
+    previous = state.get("upload") or {}
+    if previous.get("sha256") == sha256:
+        return {**previous["result"], "duplicate": True}
+
+    # 3. Validation
     if state["current_stage"] != "UPLOAD":
         return {"message": "I am not expecting a file right now. Let's chat first."}
-
-    # 3. Save the file
-    file_location = f"temp_{file.filename}"
-    with open(file_location, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
     
-    # 4. Run the "Post-Upload" Logic
-    user_salary = state["user_data"].get("salary", 50000)
+    # 4. Read the slip (process pool, cached by file hash)
+    parser = get_slip_parser()
+    started = time.perf_counter()
+    slip = parser.cached(sha256)
+    cached = slip is not None
+    if not cached:
+        slip = await parser.parse(sha256, await file.read())
+    SLIP_PARSE_LATENCY.observe(time.perf_counter() - started, str(cached).lower())
+
+    # 5. Run the "Post-Upload" Logic
+    # Take-home pay drives the EMI check, checked against the CRM salary
+    slip_salary = slip["net_salary"] or slip["gross_salary"]
+    crm_salary = state["user_data"].get("salary", 50000)
+    user_salary, salary_source = reconcile_salary(slip_salary, crm_salary)
     loan_ask = state["loan_amount"]
     
-    pdf_path = None
+    job_id = None
     
-    # Mock Approval Logic (EMI <= 50% Salary)
-    if user_salary * 0.5 > (loan_ask * 0.02): 
-        decision = "APPROVED_WITH_DOCS"
-        
-        # --- GENERATE PDF ON UPLOAD SUCCESS ---
-        # Default to 36 months for this edge case if not tracked
-        tenure = 36 
-        emi = calculate_emi(loan_ask, 12.0, tenure)
-        
-        pdf_path = generate_sanction_letter(
-            user_name=state["user_data"]["name"],
-            phone=state["user_data"]["phone"],
-            amount=loan_ask,
-            tenure=tenure,
-            emi=emi
-        )
+    # Approval rule: the credit policy's "upload" stage (EMI burden vs salary),
+    # unchanged by the parser; only the salary it sees now comes from the slip
+    slip_check = tool_check_salary_slip(loan_ask, user_salary)
+    decision = slip_check["status"]
+    if decision == "APPROVED_WITH_DOCS": 
+        # --- QUEUE PDF ON UPLOAD SUCCESS ---
+        # Default to 36 months for this edge case if not tracked.
+        # submit() may wait briefly for a queue slot, keep that off the loop.
+        try:
+            job_id = await run_in_threadpool(
+                get_letter_queue().submit,
+                user_name=state["user_data"]["name"],
+                phone=state["user_data"]["phone"],
+                amount=loan_ask,
+                tenure=slip_check["tenure"],
+                emi=slip_check["emi"]
+            )
+        except LetterQueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e))
         
         bot_reply = "Received your Salary Slip. Everything looks good! Your loan is APPROVED. ✅"
         next_stage = "END"
     else:
-        decision = "REJECTED"
         bot_reply = "I reviewed your slip. Unfortunately, your EMI burden is too high."
         next_stage = "END"
 
-    # 5. Update State
-    state["messages"].append(f"User uploaded: {file.filename}")
-    state["messages"].append(bot_reply)
-    state["current_stage"] = next_stage
-    state["sanction_letter"] = pdf_path # Save to memory
-    
-    # Clean up file
-    os.remove(file_location)
-
     # --- RETURN CORRECT STRUCTURE ---
-    return {
+    result = {
         "status": "processed",
         "decision": decision,
         "bot_reply": bot_reply,
-        "sanction_letter": pdf_path # Send path to frontend
-    }
\ No newline at end of file
+        "letter_job_id": job_id, # Frontend polls /letters/jobs/{id}
+        "slip": {
+            "gross_salary": slip["gross_salary"],
+            "net_salary": slip["net_salary"],
+            "crm_salary": crm_salary,
+            "salary_used": user_salary,
+            "salary_source": salary_source,
+            "error": slip["error"]
+        }
+    }
+
+    # 6. Update State
+    record_transition(state["current_stage"], next_stage)
+    state["current_stage"] = next_stage
+    state["letter_job_id"] = job_id # Save to memory
+    state["upload"] = {"sha256": sha256, "size": size, "result": result}
+    try:
+        await run_in_threadpool(
+            SESSION_STORE.put,
+            thread_id, state,
+            expected_version=state["version"],
+            new_messages=[f"User uploaded: {file.filename}", bot_reply]
+        )
+    except SessionConflictError:
+        raise HTTPException(status_code=409, detail=CONFLICT_DETAIL)
+
+    return result
+
+
+# --- 6. SANCTION LETTER JOBS ---
+
+def _letter_job(job_id: str) -> dict:
+    # Job IDs are uuid4 hex; anything else never reaches the filesystem
+    if len(job_id) != 32 or any(c not in "0123456789abcdef" for c in job_id):
+        raise HTTPException(status_code=404, detail="Letter job not found.")
+    job = get_letter_queue().status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Letter job not found.")
+    return job
+
+@app.get("/letters/jobs/{job_id}")
+def letter_job_status(job_id: str):
+    """
+    Status of a sanction-letter render: queued | done | failed.
+    'sanction_letter' is the URL to download it from once done.
+    """
+    job = _letter_job(job_id)
+    letter_id = job["letter_id"]
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "letter_id": letter_id,
+        "sanction_letter": f"/letters/{letter_id}" if letter_id else None,
+        "error": job["error"]
+    }
+
+@app.get("/letters/jobs/{job_id}/pdf")
+def letter_job_pdf(job_id: str):
+    """
+    Redirects to the finished PDF. 202 while it is still rendering.
+    """
+    job = _letter_job(job_id)
+    if job["status"] != LETTER_DONE:
+        return JSONResponse(status_code=202 if job["error"] is None else 500,
+                            content={"job_id": job_id, "status": job["status"], "error": job["error"]})
+    return RedirectResponse(f"/letters/{job['letter_id']}", status_code=303)
+
+@app.api_route("/letters/{letter_id}", methods=["GET", "HEAD"])
+def get_letter(letter_id: str, request: Request):
+    """
+    Streams a stored sanction letter. The ID is the content hash, so it doubles
+    as a strong ETag (If-None-Match -> 304) and the response never changes.
+    Single byte ranges are honoured (206 / 416).
+    """
+    store = get_letter_store()
+    st = store.stat(letter_id)
+    if st is None:
+        raise HTTPException(status_code=404, detail="Letter not found.")
+
+    etag = f'"{letter_id}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "Content-Disposition": f'attachment; filename="Sanction_Letter_{letter_id[:8]}.pdf"'
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    size = st.st_size
+    try:
+        # A Range that no longer matches If-Range is ignored (full body)
+        if_range = request.headers.get("if-range")
+        byte_range = parse_range(request.headers.get("range"), size) if if_range in (None, etag) else None
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    status_code, start, end = 200, 0, size - 1
+    if byte_range is not None:
+        status_code, (start, end) = 206, byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type="application/pdf")
+    return StreamingResponse(store.iter_range(letter_id, start, end), status_code=status_code,
+                             headers=headers, media_type="application/pdf")
+
+
+@app.post("/batch/eligibility")
+def batch_eligibility_endpoint(file: UploadFile = File(...),
+                               output_format: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    """
+    Campaign pre-approval: streams decisions + EMI grids for a CSV / NDJSON
+    file of (phone, amount, tenure) rows. Same decisions as the chat flow.
+    """
+    in_fmt = batch_eligibility.detect_format(file.filename, default="csv")
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    rows = batch_eligibility.read_rows(stream, in_fmt)
+    results = batch_eligibility.decide_stream(rows)
+
+    return StreamingResponse(
+        batch_eligibility.format_rows(results, output_format),
+        media_type="text/csv" if output_format == "csv" else "application/x-ndjson"
+    )
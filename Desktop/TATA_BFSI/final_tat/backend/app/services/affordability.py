@@ -0,0 +1,153 @@
+import argparse
+import csv
+import json
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from app.core.config import (
+    CUSTOMER_DB_PATH,
+    BATCH_CHUNK_SIZE,
+    COUNTER_OFFER_STEP,
+    COUNTER_OFFER_MIN_AMOUNT,
+)
+from app.core.logic import max_affordable_amounts, calculate_emi_array, get_offer_tenures, policy_rate, TENURE_MONTHS
+from app.core.rules import get_credit_policy
+from app.services.batch_eligibility import chunked, detect_format
+from app.services.customer_store import iter_records
+
+# Same defaults the chat and /upload use when the CRM field is missing
+DEFAULT_SALARY = 50000
+DEFAULT_OBLIGATIONS = 0
+
+
+def customer_arrays(customers: List[Dict]) -> Dict[str, np.ndarray]:
+    return {
+        "credit_score": np.array([c["credit_score"] for c in customers], dtype=np.float64),
+        "pre_approved_limit": np.array([c["pre_approved_limit"] for c in customers], dtype=np.float64),
+        "salary": np.array([c.get("salary", DEFAULT_SALARY) for c in customers], dtype=np.float64),
+        "obligations": np.array([c.get("current_loans", DEFAULT_OBLIGATIONS) for c in customers], dtype=np.float64),
+    }
+
+
+def max_sanctionable(credit_score, pre_approved_limit, salary, obligations, tenures=TENURE_MONTHS,
+                     rate: float = None, foir: float = None, step: float = COUNTER_OFFER_STEP,
+                     min_amount: float = COUNTER_OFFER_MIN_AMOUNT) -> np.ndarray:
+    """
+    Largest amount each customer can be sanctioned per tenure, (n, t):
+    affordable under the FOIR cap (default: the policy's max_emi_to_salary), capped at the policy's limit multiple, and
+    not rejected by the Stage 1 policy. 0 where nothing >= min_amount fits.
+    """
+    engine = get_credit_policy()
+    rate = policy_rate() if rate is None else rate
+    foir = engine.params["max_emi_to_salary"] if foir is None else foir
+    amounts = max_affordable_amounts(salary, obligations, tenures, rate, foir, step)
+    limit = np.atleast_1d(np.asarray(pre_approved_limit, dtype=np.float64))[:, None]
+    amounts = np.minimum(amounts, np.floor(engine.params["max_limit_multiple"] * limit / step) * step)
+    # The whole (customer, tenure) grid through the Stage 1 rules in one batch
+    decided = engine.evaluate_batch("initial", count=False, requested_amount=amounts, pre_approved_limit=limit,
+                                    credit_score=np.atleast_1d(np.asarray(credit_score))[:, None])
+    amounts = np.where(decided["status"] != "REJECTED", amounts, 0.0)
+    return np.where(amounts >= min_amount, amounts, 0.0)
+
+
+def _offered(amounts: np.ndarray, tenures) -> np.ndarray:
+    # True where the offer table for that amount lists that tenure (get_offer_tenures)
+    tenures = np.asarray(tenures)[None, :]
+    large = amounts >= 500000
+    return np.where(large, np.isin(tenures, get_offer_tenures(500000)), np.isin(tenures, get_offer_tenures(0)))
+
+
+def best_offers(amounts: np.ndarray, tenures=TENURE_MONTHS, rate: float = None) -> Dict[str, np.ndarray]:
+    """
+    Per customer: the largest amount, the shortest tenure that reaches it, and its EMI.
+    Only pairs the chat can follow through on count, i.e. the offer table for
+    the amount lists the tenure.
+    """
+    rate = policy_rate() if rate is None else rate
+    eligible = np.where(_offered(amounts, tenures), amounts, 0.0)
+    best = eligible.argmax(axis=1)  # first max = shortest tenure
+    rows = np.arange(len(amounts))
+    amount = eligible[rows, best]
+    tenure = np.asarray(tenures)[best]
+    return {"amount": amount, "tenure": tenure, "emi": np.round(calculate_emi_array(amount, rate, tenure), 2)}
+
+
+def counter_offer(user: Dict, tenures=TENURE_MONTHS) -> Optional[Dict]:
+    """
+    The counter-offer for one customer, or None if no amount qualifies.
+    """
+    arrays = customer_arrays([user])
+    amounts = max_sanctionable(**arrays, tenures=tenures)
+    best = best_offers(amounts, tenures)
+    if best["amount"][0] <= 0:
+        return None
+    return {
+        "amount": float(best["amount"][0]),
+        "tenure": int(best["tenure"][0]),
+        "emi": float(best["emi"][0]),
+        "by_tenure": {str(t): float(a) for t, a in zip(tenures, amounts[0])},
+    }
+
+
+# --- BULK ---
+
+def solve_chunk(customers: List[Dict], tenures=TENURE_MONTHS) -> List[Dict]:
+    amounts = max_sanctionable(**customer_arrays(customers), tenures=tenures)
+    best = best_offers(amounts, tenures)
+    out = []
+    for i, cust in enumerate(customers):
+        row = {"phone": str(cust["phone"])}
+        row.update({f"max_{t}": float(a) for t, a in zip(tenures, amounts[i])})
+        qualifies = best["amount"][i] > 0
+        row.update(best_amount=float(best["amount"][i]),
+                   best_tenure=int(best["tenure"][i]) if qualifies else None,
+                   best_emi=float(best["emi"][i]) if qualifies else None)
+        out.append(row)
+    return out
+
+
+def solve_stream(customers: Iterable[Dict], chunk_size: int = BATCH_CHUNK_SIZE) -> Iterator[Dict]:
+    # One vectorized solve per chunk; a chunk of 5k customers takes a few ms
+    for chunk in chunked(customers, chunk_size):
+        yield from solve_chunk(chunk)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Maximum sanctionable amount per tenure for every customer in the customer file."
+    )
+    parser.add_argument("input", nargs="?", default=CUSTOMER_DB_PATH, help="Customer file (.json / .ndjson / .db)")
+    parser.add_argument("-o", "--output", default="-", help="Output file (.csv or .ndjson), '-' for stdout")
+    parser.add_argument("--output-format", choices=["csv", "ndjson"])
+    parser.add_argument("--chunk-size", type=int, default=BATCH_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    out_fmt = args.output_format or detect_format(args.output)
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    fields = ["phone"] + [f"max_{t}" for t in TENURE_MONTHS] + ["best_amount", "best_tenure", "best_emi"]
+
+    started = time.perf_counter()
+    total = qualified = 0
+    writer = csv.DictWriter(dst, fieldnames=fields) if out_fmt == "csv" else None
+    if writer:
+        writer.writeheader()
+    for row in solve_stream(iter_records(args.input), args.chunk_size):
+        total += 1
+        qualified += row["best_amount"] > 0
+        if writer:
+            writer.writerow(row)
+        else:
+            dst.write(json.dumps(row) + "\n")
+
+    if dst is not sys.stdout:
+        dst.close()
+    elapsed = time.perf_counter() - started
+    print(f"✅ {total} customers in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f}/s), "
+          f"{qualified} with an offer", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
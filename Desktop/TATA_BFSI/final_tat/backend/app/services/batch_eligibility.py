@@ -0,0 +1,236 @@
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO
+
+import numpy as np
+
+from app.agents.tools import (
+    tool_lookup_user, tool_underwrite, tool_check_salary_slip, TENURE_OPTIONS
+)
+from app.core.config import BATCH_WORKERS, BATCH_CHUNK_SIZE
+from app.core.logic import calculate_emi_array, get_offer_tenures, policy_rate
+
+OUTPUT_FIELDS = ["phone", "amount", "tenure", "status", "reason", "emi",
+                 "status_after_docs", "emi_after_docs", "emi_grid"]
+
+
+# --- INPUT ---
+
+def read_rows(stream: TextIO, fmt: str) -> Iterator[dict]:
+    """
+    Lazily yields {"phone", "amount", "tenure"} rows from CSV (with a header)
+    or NDJSON, so multi-GB files are never held in memory.
+    """
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            yield {"phone": row.get("phone"), "amount": row.get("amount"), "tenure": row.get("tenure")}
+    else:
+        for line in stream:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield {"phone": None, "amount": None, "tenure": None, "_error": "Malformed JSON line."}
+
+
+def chunked(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# --- DECISIONS (run inside worker processes) ---
+
+def _parse(row: dict):
+    phone = str(row.get("phone") or "").strip()
+    amount = float(str(row.get("amount")).lower().replace("k", "000").replace(",", ""))
+    tenure = str(row.get("tenure") or "").strip()
+    return phone, amount, tenure
+
+
+def decide_chunk(rows: List[dict]) -> List[dict]:
+    """
+    Decides a chunk of rows with the same helpers the chat flow uses
+    (tool_lookup_user / tool_underwrite / tool_check_salary_slip).
+    """
+    out = []
+    valid = []  # (index, amount) of rows that get an EMI grid
+    for row in rows:
+        result = {"phone": row.get("phone"), "amount": row.get("amount"), "tenure": row.get("tenure"),
+                  "status": "INVALID", "reason": row.get("_error", ""), "emi": None,
+                  "status_after_docs": None, "emi_after_docs": None, "emi_grid": None}
+        out.append(result)
+        if "_error" in row:
+            continue
+        try:
+            phone, amount, tenure = _parse(row)
+        except (TypeError, ValueError):
+            result["reason"] = "Amount is not a number."
+            continue
+        result.update(phone=phone, amount=amount, tenure=tenure)
+        if tenure not in TENURE_OPTIONS:
+            result["reason"] = f"Tenure must be one of {', '.join(TENURE_OPTIONS)}."
+            continue
+
+        lookup = tool_lookup_user(phone)
+        if not lookup["found"]:
+            result.update(status="NOT_FOUND", reason="Phone not in CRM.")
+            continue
+        user = lookup["data"]
+
+        decision = tool_underwrite(amount, int(tenure), user)
+        result.update(tenure=int(tenure), status=decision["status"],
+                      reason=decision["reason"], emi=decision.get("emi"))
+
+        if decision["status"] == "REQUIRES_SALARY_SLIP":
+            # Same default /upload uses when the CRM has no salary
+            after = tool_check_salary_slip(amount, user.get("salary", 50000))
+            result.update(status_after_docs=after["status"], emi_after_docs=after.get("emi"))
+        valid.append((len(out) - 1, amount))
+
+    # EMI grid shown in the chat offer table, for the whole chunk in one pass
+    if valid:
+        amounts = np.array([a for _, a in valid])
+        tenures = np.array([get_offer_tenures(a) for a in amounts])
+        emis = calculate_emi_array(amounts[:, None], policy_rate(), tenures)
+        for (i, _), row_tenures, row_emis in zip(valid, tenures, emis):
+            out[i]["emi_grid"] = {str(t): round(float(e), 2) for t, e in zip(row_tenures, row_emis)}
+    return out
+
+
+# --- BOUNDED PARALLEL MAP ---
+
+def bounded_map(executor: Executor, fn: Callable, items: Iterable, max_in_flight: int) -> Iterator:
+    """
+    Like executor.map, but only keeps max_in_flight tasks submitted at once
+    (executor.map would consume the whole input up front). Order is kept.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _worker_init():
+    # Keep the store's DEBUG prints out of CLI output written to stdout
+    sys.stdout = sys.stderr
+
+
+def create_executor(workers: int = BATCH_WORKERS) -> ProcessPoolExecutor:
+    """
+    "spawn" keeps workers clear of the server's threads and event loop;
+    each worker opens its own customer store.
+    """
+    return ProcessPoolExecutor(max_workers=workers, initializer=_worker_init,
+                               mp_context=multiprocessing.get_context("spawn"))
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor(workers: int = BATCH_WORKERS) -> ProcessPoolExecutor:
+    """
+    Shared pool for the API, created on first use.
+    """
+    global _executor
+    if _executor is None:
+        _executor = create_executor(workers)
+    return _executor
+
+
+def decide_stream(rows: Iterable[dict], executor: Optional[Executor] = None,
+                  workers: int = BATCH_WORKERS, chunk_size: int = BATCH_CHUNK_SIZE) -> Iterator[dict]:
+    executor = executor or get_executor(workers)
+    for decided in bounded_map(executor, decide_chunk, chunked(rows, chunk_size), max_in_flight=2 * workers):
+        yield from decided
+
+
+# --- OUTPUT ---
+
+def format_rows(results: Iterable[dict], fmt: str) -> Iterator[str]:
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=OUTPUT_FIELDS)
+        writer.writeheader()
+        for result in results:
+            result = dict(result, emi_grid=json.dumps(result["emi_grid"]) if result["emi_grid"] else "")
+            writer.writerow(result)
+            if buf.tell() > 64 * 1024:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+    else:
+        for result in results:
+            yield json.dumps(result) + "\n"
+
+
+def detect_format(name: str, default: str = "ndjson") -> str:
+    name = (name or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl", ".json")):
+        return "ndjson"
+    return default
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Batch eligibility decisions + EMI grids for (phone, amount, tenure) rows."
+    )
+    parser.add_argument("input", help="CSV (phone,amount,tenure header) or NDJSON file, '-' for stdin")
+    parser.add_argument("-o", "--output", default="-", help="Output file (.csv or .ndjson), '-' for stdout")
+    parser.add_argument("--input-format", choices=["csv", "ndjson"])
+    parser.add_argument("--output-format", choices=["csv", "ndjson"])
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=BATCH_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    in_fmt = args.input_format or detect_format(args.input)
+    out_fmt = args.output_format or detect_format(args.output)
+    src = sys.stdin if args.input == "-" else open(args.input, "r", newline="")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+
+    started = time.perf_counter()
+    counts: Dict[str, int] = {}
+
+    def counted(results):
+        for result in results:
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            yield result
+
+    with create_executor(args.workers) as executor:
+        results = decide_stream(read_rows(src, in_fmt), executor, args.workers, args.chunk_size)
+        for text in format_rows(counted(results), out_fmt):
+            dst.write(text)
+
+    if dst is not sys.stdout:
+        dst.close()
+    if src is not sys.stdin:
+        src.close()
+    total = sum(counts.values())
+    elapsed = time.perf_counter() - started
+    print(f"✅ {total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s): {counts}",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
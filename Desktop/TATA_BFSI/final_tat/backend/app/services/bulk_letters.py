@@ -0,0 +1,305 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import struct
+import sys
+import time
+import uuid
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from app.core.config import BULK_LETTER_WORKERS, BULK_LETTER_SHARD_SIZE, BULK_LETTER_CHUNK_SIZE
+from app.services.batch_eligibility import bounded_map, chunked, detect_format
+
+MANIFEST_FILE = "manifest.ndjson"
+ZIP_MAX_ENTRIES = 0xFFFF  # no ZIP64: keeps the writer small, and shards stay well under it
+_UNSAFE_NAME = re.compile(r"[^0-9A-Za-z_-]")
+
+
+# --- INPUT ---
+
+def read_records(stream: TextIO, fmt: str) -> Iterator[dict]:
+    """
+    Lazily yields approved records (name, phone, amount, tenure[, emi]) from
+    CSV (with a header) or NDJSON. Tenure is in months.
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield {"_error": "Malformed JSON line."}
+
+
+# --- RENDERING (runs inside worker processes) ---
+
+def _base36(n: int) -> str:
+    digits = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    out = ""
+    while True:
+        n, r = divmod(n, 36)
+        out = digits[r] + out
+        if not n:
+            return out
+
+
+def ref_number(run_tag: str, seq: int, now: Optional[datetime] = None) -> str:
+    # TCL/PL/<yyyymm>/<run tag><seq>: unique within and across runs, fits the 24-char slot
+    now = now or datetime.now()
+    return f"TCL/PL/{now.strftime('%Y%m')}/{run_tag}{_base36(seq).rjust(6, '0')}"
+
+
+def entry_name(seq: int, phone: str) -> str:
+    # The phone is input data: no separators, dots or control characters in a ZIP path
+    phone = _UNSAFE_NAME.sub("", phone)[:20]
+    return f"{seq:08d}_{phone}.pdf" if phone else f"{seq:08d}.pdf"
+
+
+def render_chunk(task: Tuple[str, int, List[dict], int]) -> List[tuple]:
+    """
+    Renders a chunk of records starting at sequence number `first`.
+    Each entry comes back ready for the ZIP: (seq, name, crc32, size, deflated
+    bytes), or (seq, None, error) for a record that could not be rendered.
+    """
+    from app.core.logic import calculate_emi_array, policy_rate
+    from app.services.pdf_generator import render_letter_pdf
+
+    run_tag, first, records, level = task
+    parsed = []
+    for rec in records:
+        try:
+            if "_error" in rec:
+                raise ValueError(rec["_error"])
+            parsed.append((str(rec["name"]), str(rec["phone"]), float(rec["amount"]), int(rec["tenure"])))
+        except (KeyError, TypeError, ValueError) as e:
+            parsed.append(f"{type(e).__name__}: {e}")
+
+    # EMIs for the whole chunk in one call; tenure is in months, as printed on the letter
+    valid = [p for p in parsed if not isinstance(p, str)]
+    emis = iter(calculate_emi_array([p[2] for p in valid], policy_rate(), [p[3] for p in valid]))
+
+    out = []
+    for seq, (rec, fields) in enumerate(zip(records, parsed), start=first):
+        if isinstance(fields, str):
+            out.append((seq, None, fields))
+            continue
+        name, phone, amount, tenure = fields
+        emi = round(float(next(emis)), 2)
+        try:
+            if rec.get("emi") not in (None, ""):
+                emi = float(rec["emi"])
+            data = render_letter_pdf(name, phone, amount, tenure, emi, ref_no=ref_number(run_tag, seq))
+        except (TypeError, ValueError) as e:
+            out.append((seq, None, f"{type(e).__name__}: {e}"))
+            continue
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)  # raw deflate, as ZIP stores it
+        payload = compressor.compress(data) + compressor.flush()
+        out.append((seq, entry_name(seq, phone), zlib.crc32(data), len(data), payload))
+    return out
+
+
+def _worker_init():
+    from app.services.pdf_generator import warm_letter_template
+    sys.stdout = sys.stderr
+    warm_letter_template()
+
+
+# --- STREAMING ZIP ---
+
+class ZipShardWriter:
+    """
+    Appends pre-compressed entries to a ZIP file as they arrive; only the
+    central directory (one small record per entry) is kept in memory.
+    Workers deflate and checksum, so the parent only writes bytes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "wb")
+        self._central: List[bytes] = []
+        now = datetime.now()
+        self._dos_time = (now.hour << 11) | (now.minute << 5) | (now.second // 2)
+        self._dos_date = ((now.year - 1980) << 9) | (now.month << 5) | now.day
+
+    def add(self, name: str, crc: int, size: int, payload: bytes):
+        if len(self._central) >= ZIP_MAX_ENTRIES or self._f.tell() + len(payload) >= 0xFFFFFFFF:
+            raise ValueError("ZIP shard full; use a smaller --shard-size")
+        encoded = name.encode("utf-8")
+        offset = self._f.tell()
+        fields = (20, 0x0800, 8, self._dos_time, self._dos_date, crc, len(payload), size, len(encoded))
+        self._f.write(struct.pack("<IHHHHHIIIHH", 0x04034B50, *fields, 0))
+        self._f.write(encoded)
+        self._f.write(payload)
+        self._central.append(
+            struct.pack("<IHHHHHHIIIHHHHHII", 0x02014B50, 20, *fields, 0, 0, 0, 0, 0, offset) + encoded
+        )
+
+    def close(self) -> int:
+        start = self._f.tell()
+        for record in self._central:
+            self._f.write(record)
+        end = self._f.tell()
+        n = len(self._central)
+        self._f.write(struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, n, n, end - start, start, 0))
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._f.close()
+        return end + 22
+
+
+# --- RUN / RESUME ---
+
+def load_manifest(out_dir: str) -> Tuple[Optional[dict], List[dict]]:
+    """
+    (run header, completed shards) from a previous run in out_dir.
+    """
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None, []
+    header, shards = None, []
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break  # torn last line from a crash: that shard is redone
+            if "run" in entry:
+                header = entry
+            else:
+                shards.append(entry)
+    return header, shards
+
+
+def _append_manifest(out_dir: str, entry: dict):
+    with open(os.path.join(out_dir, MANIFEST_FILE), "a") as f:
+        f.write(json.dumps(entry) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def generate(records: Iterable[dict], out_dir: str, workers: int = BULK_LETTER_WORKERS,
+             shard_size: int = BULK_LETTER_SHARD_SIZE, chunk_size: int = BULK_LETTER_CHUNK_SIZE,
+             level: int = 1, progress_every: float = 2.0) -> dict:
+    """
+    Renders every record into <out_dir>/letters-NNNNN.zip shards.
+
+    A shard is written as .part and renamed once complete, then logged in
+    manifest.ndjson. Running again with the same input and out_dir skips
+    the logged shards and picks up from the first unfinished one, with the
+    same reference numbers. Memory is bounded by the tasks in flight
+    (2 x workers chunks) plus one shard's central directory.
+    """
+    if not 0 < shard_size <= ZIP_MAX_ENTRIES:
+        raise ValueError(f"shard_size must be between 1 and {ZIP_MAX_ENTRIES}")
+    os.makedirs(out_dir, exist_ok=True)
+    header, done_shards = load_manifest(out_dir)
+    if header is None:
+        header = {"run": uuid.uuid4().hex[:4].upper(), "started_at": time.time(), "shard_size": shard_size}
+        _append_manifest(out_dir, header)
+    shard_size = header["shard_size"]  # resume with the same boundaries
+    first_shard = len(done_shards)
+    skip = sum(s["count"] for s in done_shards)
+
+    def tasks():
+        seq = skip
+        for chunk in chunked(itertools.islice(records, skip, None), chunk_size):
+            # Never let a chunk straddle two shards
+            while chunk:
+                room = shard_size - seq % shard_size
+                yield header["run"], seq, chunk[:room], level
+                seq += len(chunk[:room])
+                chunk = chunk[room:]
+
+    started = time.perf_counter()
+    last_report = started
+    totals = {"letters": 0, "errors": 0, "bytes": 0, "shards": 0}
+    writer, shard, shard_errors, shard_first, shard_count = None, None, [], 0, 0
+
+    def finish_shard():
+        size = writer.close()
+        name = f"letters-{shard:05d}.zip"
+        os.replace(os.path.join(out_dir, f"{name}.part"), os.path.join(out_dir, name))
+        _append_manifest(out_dir, {"shard": shard, "file": name, "first": shard_first,
+                                   "count": shard_count, "bytes": size, "errors": shard_errors})
+        totals["bytes"] += size
+        totals["shards"] += 1
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_worker_init,
+                                   mp_context=multiprocessing.get_context("spawn"))
+    with executor:
+        for entries in bounded_map(executor, render_chunk, tasks(), max_in_flight=2 * workers):
+            for entry in entries:
+                seq = entry[0]
+                if seq // shard_size != shard:
+                    if writer is not None:
+                        finish_shard()
+                    shard, shard_first, shard_count, shard_errors = seq // shard_size, seq, 0, []
+                    writer = ZipShardWriter(os.path.join(out_dir, f"letters-{shard:05d}.zip.part"))
+                shard_count += 1
+                if entry[1] is None:
+                    shard_errors.append({"seq": seq, "error": entry[2]})
+                    totals["errors"] += 1
+                else:
+                    writer.add(*entry[1:])
+                    totals["letters"] += 1
+
+            now = time.perf_counter()
+            if progress_every and now - last_report >= progress_every:
+                last_report = now
+                print(f"DEBUG: {totals['letters']} letters, "
+                      f"{totals['letters'] / (now - started):,.0f} letters/s", file=sys.stderr)
+        if writer is not None:
+            finish_shard()
+
+    elapsed = time.perf_counter() - started
+    totals.update(resumed_from_shard=first_shard, skipped=skip, seconds=round(elapsed, 2),
+                  letters_per_s=round(totals["letters"] / max(elapsed, 1e-9), 1))
+    return totals
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render sanction letters for approved (name, phone, amount, tenure[, emi]) records "
+                    "into streaming ZIP shards. Re-run with the same arguments to resume."
+    )
+    parser.add_argument("input", help="CSV (with header) or NDJSON file, '-' for stdin; tenure in months "
+                                      "(e.g. 36, as in /batch/eligibility output), emi optional")
+    parser.add_argument("-o", "--out-dir", required=True, help="Directory for ZIP shards and manifest.ndjson")
+    parser.add_argument("--input-format", choices=["csv", "ndjson"])
+    parser.add_argument("--workers", type=int, default=BULK_LETTER_WORKERS)
+    parser.add_argument("--shard-size", type=int, default=BULK_LETTER_SHARD_SIZE, help="Letters per ZIP")
+    parser.add_argument("--chunk-size", type=int, default=BULK_LETTER_CHUNK_SIZE, help="Letters per worker task")
+    parser.add_argument("--level", type=int, default=1, help="Deflate level 0-9")
+    args = parser.parse_args(argv)
+
+    fmt = args.input_format or detect_format(args.input)
+    src = sys.stdin if args.input == "-" else open(args.input, "r", newline="")
+    try:
+        totals = generate(read_records(src, fmt), args.out_dir, args.workers,
+                          args.shard_size, args.chunk_size, args.level)
+    except KeyboardInterrupt:
+        print(f"❌ Interrupted; run the same command again to resume from {args.out_dir}", file=sys.stderr)
+        sys.exit(130)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+    print(f"✅ {totals['letters']} letters ({totals['errors']} errors) in {totals['shards']} new shards, "
+          f"{totals['seconds']}s ({totals['letters_per_s']:,.0f} letters/s, "
+          f"{totals['bytes'] / 1e6:.1f} MB); skipped {totals['skipped']} already done",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+from app.core.config import CUSTOMER_DB_PATH, CUSTOMER_DB_RECHECK_SECONDS
+
+JSON_EXTENSIONS = (".json",)
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+
+def _detect_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in SQLITE_EXTENSIONS:
+        return "sqlite"
+    if ext in NDJSON_EXTENSIONS:
+        return "ndjson"
+    return "json"
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """
+    Streams raw customer records out of a JSON / NDJSON / SQLite file.
+    """
+    fmt = _detect_format(path)
+
+    if fmt == "sqlite":
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            for (record,) in conn.execute("SELECT record FROM customers ORDER BY phone"):
+                yield json.loads(record)
+        finally:
+            conn.close()
+    elif fmt == "ndjson":
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    else:
+        with open(path, "r") as f:
+            for cust in json.load(f):
+                yield cust
+
+
+class CustomerStore:
+    """
+    Phone-keyed view over the customer file.
+
+    JSON / NDJSON files are loaded once into a dict. SQLite files are queried
+    through the primary key, so nothing is loaded up front. Either way the file
+    is re-opened only when its mtime or size changes.
+    """
+
+    def __init__(self, path: str = CUSTOMER_DB_PATH,
+                 recheck_seconds: float = CUSTOMER_DB_RECHECK_SECONDS):
+        self.path = os.path.normpath(path)
+        self.format = _detect_format(self.path)
+        self.recheck_seconds = recheck_seconds
+
+        self._lock = threading.Lock()
+        self._signature = None      # (mtime_ns, size) of the loaded file
+        self._last_check = 0.0
+        self._generation = 0        # bumped on every reload
+        self._index: Dict[str, Dict] = {}
+        self._count = 0
+        self._local = threading.local()  # per-thread SQLite connection
+
+    # --- CHANGE DETECTION ---
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reloads the store if the file changed. Returns True when a reload happened.
+        """
+        now = time.monotonic()
+        if not force and self._signature is not None and now - self._last_check < self.recheck_seconds:
+            return False
+
+        with self._lock:
+            self._last_check = now
+            signature = self._stat_signature()
+            if signature is None:
+                if self._signature is not None or force:
+                    print(f"❌ Error: customer file NOT found: {self.path}")
+                self._signature = None
+                self._index = {}
+                self._count = 0
+                self._generation += 1
+                return False
+            if not force and signature == self._signature:
+                return False
+
+            try:
+                self._load()
+            except Exception as e:
+                # Keep serving the previous snapshot if the new file is broken
+                print(f"❌ Error reading customer file {self.path}: {e}")
+                return False
+
+            self._signature = signature
+            self._generation += 1
+            print(f"DEBUG: Loaded {self._count} customers from {self.path} ({self.format})")
+            return True
+
+    def _load(self):
+        if self.format == "sqlite":
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            try:
+                self._count = conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+            finally:
+                conn.close()
+            self._index = {}
+        else:
+            index = {}
+            for cust in iter_records(self.path):
+                index[str(cust["phone"])] = cust
+            self._index = index
+            self._count = len(index)
+
+    def _sqlite_conn(self) -> sqlite3.Connection:
+        cached = getattr(self._local, "conn", None)
+        if cached is not None and cached[0] == self._generation:
+            return cached[1]
+        if cached is not None:
+            cached[1].close()
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        self._local.conn = (self._generation, conn)
+        return conn
+
+    # --- LOOKUPS ---
+
+    def get(self, phone: str) -> Optional[Dict]:
+        self.refresh()
+        if self._signature is None:
+            return None
+
+        if self.format == "sqlite":
+            row = self._sqlite_conn().execute(
+                "SELECT record FROM customers WHERE phone = ?", (str(phone),)
+            ).fetchone()
+            return json.loads(row[0]) if row else None
+
+        return self._index.get(str(phone))
+
+    def __iter__(self) -> Iterator[Dict]:
+        self.refresh()
+        if self._signature is None:
+            return iter(())
+        if self.format == "sqlite":
+            return iter_records(self.path)
+        # The dict is only ever swapped, never mutated, so this is safe mid-reload
+        return iter(self._index.values())
+
+    def __len__(self) -> int:
+        self.refresh()
+        return self._count
+
+
+# --- DEFAULT STORE ---
+_default_store: Optional[CustomerStore] = None
+_default_lock = threading.Lock()
+
+
+def get_customer_store() -> CustomerStore:
+    """
+    Process-wide store for CUSTOMER_DB_PATH, created on first use.
+    """
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                _default_store = CustomerStore()
+    return _default_store
+
+
+# --- COMPACT FORMAT BUILDER ---
+
+def build_sqlite(src_path: str, dest_path: str, batch_size: int = 50000) -> int:
+    """
+    Converts a JSON / NDJSON customer file into the compact SQLite format.
+    Writes to a temp file and swaps it in atomically, so running workers
+    pick up the new file on their next change check.
+    """
+    tmp_path = f"{dest_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    count = 0
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute(
+            "CREATE TABLE customers (phone TEXT PRIMARY KEY, record TEXT NOT NULL) WITHOUT ROWID"
+        )
+        batch = []
+        for cust in iter_records(src_path):
+            batch.append((str(cust["phone"]), json.dumps(cust, separators=(",", ":"))))
+            if len(batch) >= batch_size:
+                conn.executemany("INSERT OR REPLACE INTO customers VALUES (?, ?)", batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            conn.executemany("INSERT OR REPLACE INTO customers VALUES (?, ?)", batch)
+            count += len(batch)
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, dest_path)
+    return count
+
+
+if __name__ == "__main__":
+    # Usage: python -m app.services.customer_store build <customers.json> <customers.db>
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        print("Usage: python -m app.services.customer_store build <src.json|src.ndjson> <dest.db>")
+        sys.exit(1)
+    started = time.perf_counter()
+    n = build_sqlite(sys.argv[2], sys.argv[3])
+    print(f"✅ Wrote {n} customers to {sys.argv[3]} in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,231 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from app.core.config import (
+    LETTER_WORKERS,
+    LETTER_QUEUE_SIZE,
+    LETTER_QUEUE_TIMEOUT,
+    LETTER_JOB_DIR,
+    LETTER_JOB_HISTORY,
+)
+from app.core.metrics import PDF_RENDER, LETTER_JOB_LATENCY
+from app.services.letter_store import get_letter_store
+
+QUEUED = "queued"
+DONE = "done"
+FAILED = "failed"
+
+
+class LetterQueueFullError(Exception):
+    """
+    Raised when no render slot frees up within LETTER_QUEUE_TIMEOUT.
+    """
+
+
+def _ref_path(job_dir: str, job_id: str) -> str:
+    return os.path.join(job_dir, f"{job_id}.ref")
+
+
+def _write_ref(job_dir: str, job_id: str, state: dict):
+    # Temp + rename, so a reader never sees a partial file
+    os.makedirs(job_dir, exist_ok=True)
+    ref_path = _ref_path(job_dir, job_id)
+    tmp_path = f"{ref_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, ref_path)
+
+
+def _read_ref(job_dir: str, job_id: str) -> Optional[dict]:
+    try:
+        with open(_ref_path(job_dir, job_id)) as f:
+            text = f.read().strip()
+    except FileNotFoundError:
+        return None
+    if not text.startswith("{"):
+        return {"status": DONE, "letter_id": text}  # plain letter id, from before job states were shared
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def render_letter(job_id: str, job_dir: str, letter: dict) -> Tuple[str, float, bool]:
+    """
+    Worker-side: renders one letter into the letter store and marks
+    <job_dir>/<job_id>.ref done with its letter id.
+    Returns (letter id, render seconds, whether the store already had it);
+    the submitting process counts the store write, since /stats reads its counters.
+    """
+    from app.services.pdf_generator import render_letter_pdf
+
+    started = time.perf_counter()
+    data = render_letter_pdf(**letter)
+    render_seconds = time.perf_counter() - started
+    letter_id, deduplicated = get_letter_store().write(data)
+    _write_ref(job_dir, job_id, {"status": DONE, "letter_id": letter_id, "error": None})
+    return letter_id, render_seconds, deduplicated
+
+
+def _worker_init():
+    from app.services.pdf_generator import warm_letter_template
+    warm_letter_template()
+
+
+class LetterJobQueue:
+    """
+    Bounded background renderer for sanction letters.
+
+    submit() returns a job ID immediately; the PDF is rendered on a process
+    pool into the letter store. Every job keeps its state (queued, then done
+    with its letter, or failed) in a small ref file under job_dir, so any
+    uvicorn worker can answer status() for it from the moment it is submitted.
+    """
+
+    def __init__(self, workers: int = LETTER_WORKERS,
+                 queue_size: int = LETTER_QUEUE_SIZE,
+                 queue_timeout: float = LETTER_QUEUE_TIMEOUT,
+                 job_dir: str = LETTER_JOB_DIR,
+                 history: int = LETTER_JOB_HISTORY):
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self.job_dir = job_dir
+        self.history = history
+
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+        self._stats = {"submitted": 0, "done": 0, "failed": 0, "rejected": 0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_worker_init
+                )
+            return self._executor
+
+    # --- API ---
+
+    def submit(self, user_name: str, phone: str, amount: float, tenure: int, emi: float) -> str:
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise LetterQueueFullError("Sanction letter queue is full. Please retry shortly.")
+
+        job_id = uuid.uuid4().hex
+        letter = {"user_name": user_name, "phone": phone, "amount": amount, "tenure": tenure, "emi": emi}
+        submitted_at = time.time()
+        with self._lock:
+            self._jobs[job_id] = {"status": QUEUED, "submitted_at": submitted_at, "error": None}
+            self._stats["submitted"] += 1
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+
+        try:
+            # Before the render is queued, so the worker's "done" always lands last
+            _write_ref(self.job_dir, job_id, {"status": QUEUED, "letter_id": None, "error": None})
+            future = self._get_executor().submit(render_letter, job_id, self.job_dir, letter)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+        return job_id
+
+    def _finish(self, job_id: str, future: Future):
+        self._slots.release()
+        error = future.exception()
+        if error is not None:
+            try:
+                _write_ref(self.job_dir, job_id, {"status": FAILED, "letter_id": None, "error": str(error)})
+            except OSError as e:
+                print(f"❌ Could not record failed letter job {job_id}: {e}")
+        else:
+            letter_id, render_seconds, deduplicated = future.result()
+            PDF_RENDER.observe(render_seconds)
+            get_letter_store().record_put(deduplicated)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and error is None:
+                job["letter_id"] = letter_id
+            if job is not None:
+                LETTER_JOB_LATENCY.observe(time.time() - job["submitted_at"], FAILED if error else DONE)
+            if error is None:
+                self._stats["done"] += 1
+            else:
+                self._stats["failed"] += 1
+                print(f"❌ Sanction letter job {job_id} failed: {error}")
+            if job is not None:
+                job["status"] = DONE if error is None else FAILED
+                job["error"] = None if error is None else str(error)
+                job["finished_at"] = time.time()
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """
+        {"job_id", "status", "letter_id", "error"} or None for an unknown job.
+        """
+        with self._lock:
+            job = dict(self._jobs[job_id]) if job_id in self._jobs else None
+
+        if job is None:
+            # Submitted by another worker (or before a restart): the ref file is the truth
+            job = _read_ref(self.job_dir, job_id)
+            if job is None:
+                return None
+        return {
+            "job_id": job_id,
+            "status": job["status"],
+            "letter_id": job.get("letter_id"),
+            "error": job.get("error"),
+        }
+
+    def warm(self, timeout: float = 60.0):
+        """
+        Starts every worker now (spawn, fpdf import, template build) so the
+        first approved customer does not pay for it. Submitted back to back,
+        each ping lands on a fresh worker.
+        """
+        executor = self._get_executor()
+        futures = [executor.submit(os.getpid) for _ in range(self.workers)]
+        for future in futures:
+            future.result(timeout=timeout)
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        """
+        Polls until the job leaves the queue or the timeout passes (tests / CLI).
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            status = self.status(job_id)
+            if status is None or status["status"] != QUEUED or time.monotonic() >= deadline:
+                return status
+            time.sleep(0.05)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = sum(1 for j in self._jobs.values() if j["status"] == QUEUED)
+        return stats
+
+
+# --- DEFAULT QUEUE ---
+_default_queue: Optional[LetterJobQueue] = None
+_default_lock = threading.Lock()
+
+
+def get_letter_queue() -> LetterJobQueue:
+    global _default_queue
+    if _default_queue is None:
+        with _default_lock:
+            if _default_queue is None:
+                _default_queue = LetterJobQueue()
+    return _default_queue
@@ -0,0 +1,201 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+from app.core.config import (
+    LETTER_STORE_DIR,
+    LETTER_RETENTION_SECONDS,
+    LETTER_GC_INTERVAL_SECONDS,
+)
+
+CHUNK_SIZE = 64 * 1024
+ID_LENGTH = 64  # sha256 hex
+
+
+def is_letter_id(letter_id: str) -> bool:
+    return len(letter_id) == ID_LENGTH and all(c in "0123456789abcdef" for c in letter_id)
+
+
+class LetterStore:
+    """
+    Content-addressed store for sanction-letter PDFs.
+
+    A letter's ID is the SHA-256 of its bytes and its file lives at
+    <root>/<id[:2]>/<id>.pdf, so names never collide and identical letters
+    share a file. Files are written via temp + rename, so a visible file is
+    always complete. Letters older than the retention period are removed by
+    gc(), which can run on a background thread.
+    """
+
+    def __init__(self, root: str = LETTER_STORE_DIR,
+                 retention_seconds: float = LETTER_RETENTION_SECONDS):
+        self.root = root
+        self.retention_seconds = retention_seconds
+
+        self._gc_thread: Optional[threading.Thread] = None
+        self._gc_stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {"stored": 0, "deduplicated": 0, "gc_runs": 0, "gc_removed": 0}
+
+    def path(self, letter_id: str) -> str:
+        if not is_letter_id(letter_id):
+            raise ValueError(f"Invalid letter id: {letter_id!r}")
+        return os.path.join(self.root, letter_id[:2], f"{letter_id}.pdf")
+
+    # --- WRITE ---
+
+    def put(self, data: bytes) -> str:
+        letter_id, deduplicated = self.write(data)
+        self.record_put(deduplicated)
+        return letter_id
+
+    def write(self, data: bytes) -> Tuple[str, bool]:
+        """
+        Stores the bytes; (letter id, True if they were already stored).
+        Leaves the stats alone, so a render worker can write and the process
+        that serves /stats counts it (record_put).
+        """
+        letter_id = hashlib.sha256(data).hexdigest()
+        path = self.path(letter_id)
+
+        if os.path.exists(path):
+            # Same bytes already stored: just restart its retention clock
+            try:
+                os.utime(path)
+                return letter_id, True
+            except FileNotFoundError:
+                pass  # collected by gc() since the check: write it again
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return letter_id, False
+
+    def record_put(self, deduplicated: bool):
+        with self._lock:
+            self._stats["deduplicated" if deduplicated else "stored"] += 1
+
+    # --- READ ---
+
+    def stat(self, letter_id: str) -> Optional[os.stat_result]:
+        """
+        None if the letter is unknown (or already collected).
+        """
+        try:
+            return os.stat(self.path(letter_id))
+        except (ValueError, FileNotFoundError):
+            return None
+
+    def read(self, letter_id: str) -> bytes:
+        with open(self.path(letter_id), "rb") as f:
+            return f.read()
+
+    def iter_range(self, letter_id: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Yields bytes [start, end] (inclusive, like HTTP ranges) in chunks.
+        """
+        with open(self.path(letter_id), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    # --- RETENTION ---
+
+    def gc(self, now: Optional[float] = None) -> int:
+        """
+        Deletes everything under the root past the retention period: letters,
+        job refs (see letter_jobs.py) and temp files orphaned by a crash.
+        """
+        cutoff = (now or time.time()) - self.retention_seconds
+        removed = 0
+        if not os.path.isdir(self.root):
+            return 0
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass  # another worker got there first
+        with self._lock:
+            self._stats["gc_runs"] += 1
+            self._stats["gc_removed"] += removed
+        return removed
+
+    def start_gc(self, interval: float = LETTER_GC_INTERVAL_SECONDS):
+        if self._gc_thread is not None or interval <= 0:
+            return
+        self._gc_stop.clear()
+
+        def loop():
+            while not self._gc_stop.wait(interval):
+                try:
+                    removed = self.gc()
+                    if removed:
+                        print(f"DEBUG: Letter GC removed {removed} file(s)")
+                except Exception as e:
+                    print(f"❌ Letter GC failed: {e}")
+
+        self._gc_thread = threading.Thread(target=loop, name="letter-gc", daemon=True)
+        self._gc_thread.start()
+
+    def stop_gc(self):
+        self._gc_stop.set()
+        if self._gc_thread is not None:
+            self._gc_thread.join(timeout=5)
+            self._gc_thread = None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single "bytes=a-b" / "bytes=a-" / "bytes=-n" Range header into an
+    inclusive (start, end). None means "send the whole file" (no header, or a
+    multi-range request); ValueError means the range is unsatisfiable.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first == "":
+            length = int(last)
+            if length <= 0:
+                raise ValueError("Empty suffix range")
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        raise ValueError(f"Bad range: {header}")
+    if start >= size or end < start:
+        raise ValueError(f"Unsatisfiable range: {header}")
+    return start, min(end, size - 1)
+
+
+# --- DEFAULT STORE ---
+_default_store: Optional[LetterStore] = None
+_default_lock = threading.Lock()
+
+
+def get_letter_store() -> LetterStore:
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                _default_store = LetterStore()
+    return _default_store
@@ -0,0 +1,316 @@
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import (
+    BATCH_CHUNK_SIZE,
+    CUSTOMER_DB_PATH,
+    CUSTOMER_DB_RECHECK_SECONDS,
+    OFFER_GRID_DIR,
+    OFFER_GRID_ENABLED,
+    OFFER_GRID_MIN_AMOUNT,
+    OFFER_GRID_MAX_AMOUNT,
+    OFFER_GRID_STEP,
+)
+from app.core.logic import (
+    calculate_emi_array,
+    policy_rate,
+    TENURE_MONTHS,
+)
+from app.core.rules import get_credit_policy
+from app.services.customer_store import iter_records
+
+# Same tenures as the chat; the rate is the policy's
+GRID_TENURES = TENURE_MONTHS
+
+# grid.npy planes, each [amount, tenure]
+PLANE_EMI = 0           # offer table EMI, tenure in months
+PLANE_INTEREST = 1      # offer table total interest
+GRID_PLANES = 2
+
+PHONES_FILE = "phones.npy"
+BANDS_FILE = "bands.npy"      # [customer, amount] uint8: Stage 1 deciding rule, see meta["rules"]
+GRID_FILE = "grid.npy"
+META_FILE = "meta.json"
+
+
+def _signature(path: str):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _phone_key(phone) -> Optional[int]:
+    # Phones are stored as int64; anything that does not round-trip stays on the live path
+    phone = str(phone)
+    if not phone.isdigit() or len(phone) > 18 or str(int(phone)) != phone:
+        return None
+    return int(phone)
+
+
+# --- BUILDER ---
+
+def amount_ladder(min_amount: float = OFFER_GRID_MIN_AMOUNT, max_amount: float = OFFER_GRID_MAX_AMOUNT,
+                  step: float = OFFER_GRID_STEP) -> np.ndarray:
+    return np.arange(min_amount, max_amount + step / 2, step, dtype=np.float64)
+
+
+def compute_grid(amounts: np.ndarray, rate: float, tenures: List[int] = GRID_TENURES) -> np.ndarray:
+    """
+    [plane, amount, tenure] EMI / interest grid, rounded the way the chat rounds.
+    """
+    months = np.asarray(tenures, dtype=np.float64)[None, :]
+    principal = amounts[:, None]
+    emi = np.round(calculate_emi_array(principal, rate, months), 2)
+    interest = emi * months - principal
+    return np.stack([emi, interest])
+
+
+def build_offer_grid(src_path: str = CUSTOMER_DB_PATH, dest_dir: str = OFFER_GRID_DIR) -> int:
+    """
+    Walks the customer file and writes the offer grid directory:
+      phones.npy     sorted int64 phone index
+      bands.npy      Stage 1 decision per phone and ladder amount
+      grid.npy       EMI / interest grid over the amount ladder and tenures
+      meta.json      ladder, rate, tenures, policy version, rule names and the source file signature
+    Bands are the compiled "initial" stage run over every (customer, amount)
+    pair, stored as the index of the deciding rule; a policy change makes
+    them stale until rebuilt.
+    Built next to dest_dir and swapped in, so readers see the old or the new
+    grid, never half of one.
+    """
+    signature = _signature(src_path)  # taken first: a change during the walk makes the grid stale
+    policy = get_credit_policy().policy
+    stage, rate = policy.stages["initial"], policy.params["rate_pa"]
+    if len(stage.rules) > np.iinfo(np.uint8).max:
+        raise ValueError("too many Stage 1 rules for uint8 bands")
+    phones, scores, limits = [], [], []
+    for cust in iter_records(src_path):
+        key = _phone_key(cust["phone"])
+        if key is None:
+            continue
+        phones.append(key)
+        scores.append(float(cust["credit_score"]))
+        limits.append(float(cust["pre_approved_limit"]))
+
+    phones = np.asarray(phones, dtype=np.int64)
+    scores, limits = np.asarray(scores), np.asarray(limits)
+    order = np.argsort(phones, kind="stable")
+    phones, scores, limits = phones[order], scores[order], limits[order]
+    # Duplicate phones: the last record wins, as in CustomerStore
+    last = np.append(phones[1:] != phones[:-1], True) if len(phones) else np.zeros(0, dtype=bool)
+    phones, scores, limits = phones[last], scores[last], limits[last]
+
+    amounts = amount_ladder()
+    meta = {
+        "built_at": time.time(),
+        "source": os.path.abspath(src_path),
+        "source_signature": signature,
+        "customers": int(len(phones)),
+        "min_amount": float(amounts[0]),
+        "step": float(OFFER_GRID_STEP),
+        "amounts": int(len(amounts)),
+        "rate": rate,
+        "policy": policy.version,
+        "rules": [rule.name for rule in stage.rules],
+        "tenures": GRID_TENURES,
+    }
+
+    dest_dir = os.path.normpath(dest_dir)
+    tmp_dir = f"{dest_dir}.tmp-{os.getpid()}"
+    old_dir = f"{dest_dir}.old-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, PHONES_FILE), phones)
+    bands = np.lib.format.open_memmap(os.path.join(tmp_dir, BANDS_FILE), mode="w+", dtype=np.uint8,
+                                      shape=(len(phones), len(amounts)))
+    for start in range(0, len(phones), BATCH_CHUNK_SIZE):
+        rows = slice(start, start + BATCH_CHUNK_SIZE)
+        # Not counted: these are not live decisions
+        bands[rows] = stage.decide_batch({"requested_amount": amounts[None, :],
+                                          "pre_approved_limit": limits[rows, None],
+                                          "credit_score": scores[rows, None]}, count=False)
+    bands.flush()
+    del bands
+    np.save(os.path.join(tmp_dir, GRID_FILE), compute_grid(amounts, rate))
+    with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    if os.path.exists(dest_dir):
+        os.rename(dest_dir, old_dir)
+    os.rename(tmp_dir, dest_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return len(phones)
+
+
+# --- READER ---
+
+class OfferGrid:
+    """
+    O(1) offer answers from the precomputed grid (build_offer_grid).
+
+    The phone index and bands are memory-mapped, so every worker shares one
+    copy through the page cache. Anything the grid cannot answer exactly
+    returns None and the caller falls back to live math: a missing grid, an
+    amount off the ladder, an unknown phone, or bands built from an older
+    customer file or credit policy. The EMI grid depends only on rate and tenure, so
+    it stays valid when the customer file changes, but not the rate.
+    """
+
+    def __init__(self, path: str = OFFER_GRID_DIR, source_path: str = CUSTOMER_DB_PATH,
+                 recheck_seconds: float = CUSTOMER_DB_RECHECK_SECONDS):
+        self.path = os.path.normpath(path)
+        self.source_path = os.path.abspath(source_path)
+        self.recheck_seconds = recheck_seconds
+
+        self._lock = threading.Lock()
+        self._signature = None      # meta.json signature of the loaded grid
+        self._last_check = 0.0
+        self._meta: Dict = {}
+        self._phones = None
+        self._bands = None
+        self._grid = None
+        self._tenure_col: Dict[int, int] = {}
+        self._fresh = False         # bands match the current customer file
+        self._stats = {"band_hits": 0, "band_fallbacks": 0, "emi_hits": 0, "emi_fallbacks": 0}
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reloads the grid if it was rebuilt and re-checks the customer file.
+        Returns True when a reload happened.
+        """
+        now = time.monotonic()
+        if not force and self._last_check and now - self._last_check < self.recheck_seconds:
+            return False
+
+        with self._lock:
+            self._last_check = now
+            signature = _signature(os.path.join(self.path, META_FILE))
+            reloaded = False
+            if signature is None:
+                self._signature, self._grid, self._phones, self._bands = None, None, None, None
+            elif force or signature != self._signature:
+                try:
+                    self._load()
+                    self._signature = signature
+                    reloaded = True
+                    print(f"DEBUG: Loaded offer grid for {len(self._phones)} customers from {self.path}")
+                except Exception as e:
+                    # Keep the previous grid if the new one is mid-swap or broken
+                    print(f"❌ Error reading offer grid {self.path}: {e}")
+            self._fresh = (
+                self._phones is not None
+                and self._meta.get("source") == self.source_path
+                and self._meta.get("source_signature") == _signature(self.source_path)
+            )
+            return reloaded
+
+    def _load(self):
+        with open(os.path.join(self.path, META_FILE)) as f:
+            meta = json.load(f)
+        phones = np.load(os.path.join(self.path, PHONES_FILE), mmap_mode="r")
+        bands = np.load(os.path.join(self.path, BANDS_FILE), mmap_mode="r")
+        grid = np.load(os.path.join(self.path, GRID_FILE))  # a few hundred KB: keep in memory
+        if grid.shape != (GRID_PLANES, meta["amounts"], len(meta["tenures"])):
+            raise ValueError("grid does not match this build")
+        if bands.shape != (len(phones), meta["amounts"]):
+            raise ValueError("bands do not match this build")
+        self._tenure_col = {t: i for i, t in enumerate(meta["tenures"])}
+        self._meta, self._phones, self._bands, self._grid = meta, phones, bands, grid
+
+    def _count(self, key: str):
+        self._stats[key] += 1  # approximate under threads; good enough for a gauge
+
+    @staticmethod
+    def _amount_row(meta: Dict, amount: float) -> Optional[int]:
+        index = (amount - meta["min_amount"]) / meta["step"]
+        if not float(index).is_integer() or not 0 <= index < meta["amounts"]:
+            return None
+        return int(index)
+
+    # --- LOOKUPS ---
+
+    def band(self, phone, amount: float) -> Optional[str]:
+        """
+        Name of the Stage 1 rule that decides this customer and amount.
+        """
+        self.refresh()
+        key = _phone_key(phone)
+        # Snapshot: a concurrent refresh swaps these references, never mutates them
+        phones, bands, meta, fresh = self._phones, self._bands, self._meta, self._fresh
+        col = self._amount_row(meta, amount) if fresh and phones is not None else None
+        if col is None or key is None or meta.get("policy") != get_credit_policy().version:
+            self._count("band_fallbacks")
+            return None
+        i = int(np.searchsorted(phones, key))
+        if i == len(phones) or phones[i] != key:
+            self._count("band_fallbacks")
+            return None
+        self._count("band_hits")
+        return meta["rules"][bands[i, col]]
+
+    def _lookup(self, plane: int, amount: float, tenures: List[int]) -> Optional[List[float]]:
+        self.refresh()
+        grid, meta, cols = self._grid, self._meta, self._tenure_col
+        row = self._amount_row(meta, amount) if grid is not None and meta["rate"] == policy_rate() else None
+        if row is None or any(t not in cols for t in tenures):
+            self._count("emi_fallbacks")
+            return None
+        self._count("emi_hits")
+        return [float(grid[plane, row, cols[t]]) for t in tenures]
+
+    def offer_emis(self, amount: float, tenures: List[int]) -> Optional[List[float]]:
+        """
+        Offer table EMIs (tenures in months), or None off the ladder.
+        """
+        return self._lookup(PLANE_EMI, amount, tenures)
+
+    def total_interest(self, amount: float, tenures: List[int]) -> Optional[List[float]]:
+        return self._lookup(PLANE_INTEREST, amount, tenures)
+
+    def stats(self) -> Dict[str, float]:
+        self.refresh()
+        stats = dict(self._stats)
+        stats["loaded"] = int(self._grid is not None)
+        stats["fresh"] = int(self._fresh)
+        stats["customers"] = len(self._phones) if self._phones is not None else 0
+        return stats
+
+
+# --- DEFAULT GRID ---
+_default_grid: Optional[OfferGrid] = None
+_default_lock = threading.Lock()
+
+
+def get_offer_grid() -> Optional[OfferGrid]:
+    """
+    Process-wide grid for OFFER_GRID_DIR, or None when OFFER_GRID_ENABLED is off.
+    """
+    global _default_grid
+    if not OFFER_GRID_ENABLED:
+        return None
+    if _default_grid is None:
+        with _default_lock:
+            if _default_grid is None:
+                _default_grid = OfferGrid()
+    return _default_grid
+
+
+if __name__ == "__main__":
+    # Usage: python -m app.services.offer_grid build [customers file] [dest dir]
+    if len(sys.argv) not in (2, 3, 4) or sys.argv[1] != "build":
+        print("Usage: python -m app.services.offer_grid build [src.json|src.ndjson|src.db] [dest_dir]")
+        sys.exit(1)
+    src = sys.argv[2] if len(sys.argv) > 2 else CUSTOMER_DB_PATH
+    dest = sys.argv[3] if len(sys.argv) > 3 else OFFER_GRID_DIR
+    started = time.perf_counter()
+    n = build_offer_grid(src, dest)
+    print(f"✅ Wrote offer grid for {n} customers to {dest} in {time.perf_counter() - started:.1f}s")
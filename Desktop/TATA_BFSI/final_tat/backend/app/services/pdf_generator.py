@@ -1,7 +1,12 @@
 from fpdf import FPDF
-import os
 import random
+import threading
 from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import LETTER_TEMPLATE_MODE
+from app.core.logic import policy_rate
+from app.services.letter_store import get_letter_store
 
 class PDF(FPDF):
     def header(self):
@@ -30,31 +35,71 @@ class PDF(FPDF):
         self.cell(0, 5, 'This is a computer-generated document and does not require a physical signature.', 0, 1, 'C')
         self.cell(0, 5, f'Page {self.page_no()}', 0, 0, 'R')
 
-def generate_sanction_letter(user_name: str, phone: str, amount: float, tenure: int, emi: float):
+# --- VARIABLE FIELDS ---
+# Max characters each field may take in template mode (anything longer falls
+# back to a full layout). Left-aligned, so the unused width is blank padding.
+FIELD_WIDTHS = {
+    "ref_no": 24,
+    "name": 40,
+    "salutation": 41,
+    "phone": 15,
+    "amount": 28,
+    "tenure": 12,
+    "rate": 14,
+    "emi": 28,
+}
+
+
+def letter_fields(user_name: str, phone: str, amount: float, tenure: int, emi: float,
+                  now: Optional[datetime] = None, ref_no: Optional[str] = None) -> Dict[str, str]:
     """
-    Generates a Professional Sanction Letter.
+    The display strings that differ between two letters issued on the same day.
+    ref_no defaults to a random one; bulk runs pass their own so it is unique.
+    The rate is the credit policy's, the one the EMI was computed with.
+    """
+    now = now or datetime.now()
+    return {
+        "ref_no": ref_no or f"TCL/PL/{now.strftime('%Y%m')}/{random.randint(10000, 99999)}",
+        "date": now.strftime('%B %d, %Y'),
+        "name": f"{user_name}",
+        "salutation": f"{user_name},",
+        "phone": f"{phone}",
+        "amount": f"Rs. {amount:,.2f}",
+        "tenure": f"{tenure} Months",
+        "rate": f"{policy_rate():.2f}% p.a.",
+        "emi": f"Rs. {emi:,.2f}",
+    }
+
+
+def _pdf_bytes(pdf: FPDF) -> bytes:
+    # fpdf 1.7 returns a latin-1 str, fpdf2 a bytearray
+    data = pdf.output(dest="S")
+    return data.encode("latin-1") if isinstance(data, str) else bytes(data)
+
+
+def layout_sanction_letter(fields: Dict[str, str], compress: bool = True) -> FPDF:
+    """
+    Lays out the full letter for the given display fields.
     """
     # 1. Setup PDF
     pdf = PDF()
+    pdf.set_compression(compress)
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
     
     # 2. Reference Details
-    ref_no = f"TCL/PL/{datetime.now().strftime('%Y%m')}/{random.randint(10000, 99999)}"
-    date_str = datetime.now().strftime('%B %d, %Y')
-    
     pdf.set_font("Arial", 'B', 10)
     pdf.set_text_color(0, 0, 0)
-    pdf.cell(100, 6, f"Ref No: {ref_no}", 0, 0)
-    pdf.cell(0, 6, f"Date: {date_str}", 0, 1, 'R')
+    pdf.cell(100, 6, f"Ref No: {fields['ref_no']}", 0, 0)
+    pdf.cell(0, 6, f"Date: {fields['date']}", 0, 1, 'R')
     pdf.ln(5)
 
     # 3. Applicant Details
     pdf.set_font("Arial", 'B', 11)
     pdf.cell(0, 6, f"To,", 0, 1)
-    pdf.cell(0, 6, f"{user_name}", 0, 1)
+    pdf.cell(0, 6, fields["name"], 0, 1)
     pdf.set_font("Arial", '', 11)
-    pdf.cell(0, 6, f"Registered Mobile: +91-{phone}", 0, 1)
+    pdf.cell(0, 6, f"Registered Mobile: +91-{fields['phone']}", 0, 1)
     pdf.ln(8)
 
     # 4. Subject Line
@@ -66,7 +111,7 @@ def generate_sanction_letter(user_name: str, phone: str, amount: float, tenure:
     # 5. Salutation & Opening
     pdf.set_font("Arial", '', 11)
     pdf.multi_cell(0, 6, (
-        f"Dear {user_name},\n\n"
+        f"Dear {fields['salutation']}\n\n"
         "We thank you for choosing Tata Capital Financial Services Limited for your financial needs. "
         "We are pleased to inform you that based on your application and credit appraisal, "
         "we have sanctioned a Personal Loan to you under the following terms and conditions:"
@@ -88,10 +133,10 @@ def generate_sanction_letter(user_name: str, phone: str, amount: float, tenure:
         pdf.set_font("Arial", 'B', 10)
         pdf.cell(95, 8, f"  {value}", 1, 1)
 
-    add_row("Sanctioned Loan Amount", f"Rs. {amount:,.2f}")
-    add_row("Loan Tenure", f"{tenure} Months")
-    add_row("Rate of Interest (Fixed)", "12.00% p.a.")
-    add_row("Equated Monthly Installment (EMI)", f"Rs. {emi:,.2f}")
+    add_row("Sanctioned Loan Amount", fields["amount"])
+    add_row("Loan Tenure", fields["tenure"])
+    add_row("Rate of Interest (Fixed)", fields["rate"])
+    add_row("Equated Monthly Installment (EMI)", fields["emi"])
     add_row("Processing Fee", "Rs. 0.00 (Waived)")
     add_row("Pre-payment Charges", "Nil (After 12 EMIs)")
     
@@ -130,12 +175,137 @@ def generate_sanction_letter(user_name: str, phone: str, amount: float, tenure:
     pdf.set_font("Arial", '', 9)
     pdf.cell(0, 5, "Authorized Signatory", 0, 1)
 
+    return pdf
+
+
+def render_sanction_letter(user_name: str, phone: str, amount: float, tenure: int, emi: float,
+                           ref_no: Optional[str] = None) -> bytes:
+    """
+    Full layout, rendered to memory.
+    """
+    fields = letter_fields(user_name, phone, amount, tenure, emi, ref_no=ref_no)
+    return _pdf_bytes(layout_sanction_letter(fields))
+
+
+def _escape(text: str) -> bytes:
+    # Same escaping FPDF applies to text inside a PDF string literal
+    text = text.replace('\\', '\\\\').replace(')', '\\)').replace('(', '\\(').replace('\r', '\\r')
+    return text.encode("latin-1")
+
+
+class SanctionLetterTemplate:
+    """
+    The letter laid out once, with the variable fields left as fixed-width
+    placeholders in an uncompressed content stream.
+
+    A letter is the template bytes with each placeholder overwritten in place
+    (value + blank padding), so no object offset or stream length moves and
+    the xref table stays valid. The date is right-aligned, so the template is
+    rebuilt when the day changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._date: Optional[str] = None
+        self._template: bytes = b""
+        self._slots: List[Tuple[int, str]] = []
+
+    @staticmethod
+    def _placeholder(key: str) -> str:
+        # No spaces (multi_cell must not wrap it) and narrow enough to fit a line
+        return (f"[{key}" + "#" * FIELD_WIDTHS[key])[:FIELD_WIDTHS[key]]
+
+    def _build(self, date_str: str):
+        fields = {key: self._placeholder(key) for key in FIELD_WIDTHS}
+        fields["date"] = date_str
+        template = _pdf_bytes(layout_sanction_letter(fields, compress=False))
+
+        slots = []
+        for key in FIELD_WIDTHS:
+            marker = self._placeholder(key).encode("latin-1")
+            start = template.find(marker)
+            while start != -1:
+                slots.append((start, key))
+                start = template.find(marker, start + len(marker))
+        if {key for _, key in slots} != set(FIELD_WIDTHS):
+            raise RuntimeError("Sanction letter template is missing a field placeholder")
+
+        self._template, self._slots, self._date = template, sorted(slots), date_str
+
+    def warm(self):
+        self._ensure(datetime.now().strftime('%B %d, %Y'))
+
+    def _ensure(self, date_str: str):
+        if self._date != date_str:
+            with self._lock:
+                if self._date != date_str:
+                    self._build(date_str)
+
+    def render(self, user_name: str, phone: str, amount: float, tenure: int, emi: float,
+               ref_no: Optional[str] = None) -> bytes:
+        fields = letter_fields(user_name, phone, amount, tenure, emi, ref_no=ref_no)
+        try:
+            values = {key: _escape(fields[key]) for key in FIELD_WIDTHS}
+        except UnicodeEncodeError:
+            values = None
+        if values is None or any(len(values[key]) > FIELD_WIDTHS[key] for key in FIELD_WIDTHS):
+            # Too long for its slot (or not latin-1): lay the letter out in full
+            return _pdf_bytes(layout_sanction_letter(fields))
+
+        self._ensure(fields["date"])
+        with self._lock:
+            template, slots = self._template, self._slots
+        buf = bytearray(template)
+        for start, key in slots:
+            width = FIELD_WIDTHS[key]
+            buf[start:start + width] = values[key].ljust(width)
+        return bytes(buf)
+
+
+_template: Optional[SanctionLetterTemplate] = None
+_template_lock = threading.Lock()
+
+
+def get_letter_template() -> SanctionLetterTemplate:
+    global _template
+    if _template is None:
+        with _template_lock:
+            if _template is None:
+                _template = SanctionLetterTemplate()
+    return _template
+
+
+def warm_letter_template():
+    """
+    Lays the template out ahead of the first letter (process-pool initializer).
+    """
+    if LETTER_TEMPLATE_MODE:
+        get_letter_template().warm()
+
+
+def render_letter_pdf(user_name: str, phone: str, amount: float, tenure: int, emi: float,
+                      ref_no: Optional[str] = None) -> bytes:
+    """
+    The letter's PDF bytes, from the template when LETTER_TEMPLATE_MODE is on.
+    """
+    if LETTER_TEMPLATE_MODE:
+        return get_letter_template().render(user_name, phone, amount, tenure, emi, ref_no=ref_no)
+    return render_sanction_letter(user_name, phone, amount, tenure, emi, ref_no=ref_no)
+
+
+def generate_sanction_letter(user_name: str, phone: str, amount: float, tenure: int, emi: float,
+                             file_path: Optional[str] = None):
+    """
+    Generates a Professional Sanction Letter.
+    Saved to the letter store (see letter_store.py) unless an explicit file_path is given.
+    """
+    data = render_letter_pdf(user_name, phone, amount, tenure, emi)
+
     # 9. Save File
-    filename = f"Sanction_Letter_{phone}_{random.randint(10,99)}.pdf"
-    save_dir = os.path.join(os.path.dirname(__file__), "../../static")
-    os.makedirs(save_dir, exist_ok=True)
-    
-    file_path = os.path.join(save_dir, filename)
-    pdf.output(file_path)
+    if file_path is None:
+        store = get_letter_store()
+        return store.path(store.put(data))
+    with open(file_path, "wb") as f:
+        f.write(data)
     
-    return file_path
\ No newline at end of file
+    return file_path
@@ -0,0 +1,203 @@
+import asyncio
+import io
+import multiprocessing
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional
+
+from app.core.config import (
+    SLIP_PARSER_WORKERS,
+    SLIP_MAX_PAGES,
+    SLIP_CACHE_MAX_ENTRIES,
+    SLIP_PARSE_TIMEOUT,
+)
+
+# --- FIELD PATTERNS ---
+# A label, then the rest of its line; the amount is picked out of that by _pick_amount.
+_TAIL = r"([^\n]{0,60})"
+FIELD_PATTERNS = {
+    "gross_salary": re.compile(
+        r"(?:gross\s+(?:salary|earnings|pay)|total\s+earnings)" + _TAIL, re.IGNORECASE
+    ),
+    "net_salary": re.compile(
+        r"(?:net\s+(?:salary|pay|amount(?:\s+payable)?)|take[\s-]*home(?:\s+pay)?)" + _TAIL, re.IGNORECASE
+    ),
+}
+_NUMBER = re.compile(r"(?<![\d,])[0-9][0-9,]*(?:\.[0-9]{1,2})?")
+_MARKER = re.compile(r"(?:rs\.?|inr|₹|[:=]-?)$", re.IGNORECASE)  # "Rs.", "INR", "₹", ":", "=", ":-"
+_YEAR = re.compile(r"(?:19|20)\d{2}")
+
+
+def _amount(text: str) -> Optional[float]:
+    try:
+        value = float(text.replace(",", ""))
+    except ValueError:
+        return None
+    return value if value > 0 else None
+
+
+def _pick_amount(tail: str) -> Optional[float]:
+    """
+    The first amount after a label, skipping dates in the label text
+    ("Net Pay for March 2024: Rs. 45,000", "Gross Salary (Mar-2024) 80,000").
+    """
+    for match in _NUMBER.finditer(tail):
+        before, after = tail[:match.start()], tail[match.end():match.end() + 2]
+        # Part of a date: 03/2024, Mar-2024, 2024-03
+        if before.endswith("/") or re.search(r"\w-$", before) or re.match(r"[/-]\d", after):
+            continue
+        # A bare year, unless a currency marker or separator says it is the amount
+        if _YEAR.fullmatch(match.group()) and not _MARKER.search(before.rstrip()):
+            continue
+        value = _amount(match.group())
+        if value is not None:
+            return value
+    return None
+
+
+def extract_fields(text: str, found: Dict[str, float]) -> Dict[str, float]:
+    """
+    Adds any salary fields not already in `found` from one chunk of text.
+    """
+    for field, pattern in FIELD_PATTERNS.items():
+        if field in found:
+            continue
+        for match in pattern.finditer(text):
+            value = _pick_amount(match.group(1))
+            if value is not None:
+                found[field] = value
+                break
+    return found
+
+
+def parse_salary_slip(data: bytes, max_pages: int = SLIP_MAX_PAGES) -> dict:
+    """
+    Reads gross / net monthly salary from a slip.
+
+    PDFs are read one page at a time and reading stops as soon as both fields
+    are found, so a long statement costs no more than the page the figures
+    are on. Plain-text slips are scanned directly. Anything unreadable comes
+    back with None values and an error, never an exception.
+    """
+    found: Dict[str, float] = {}
+    result = {"gross_salary": None, "net_salary": None, "pages_read": 0, "page_count": 0, "error": None}
+
+    if not data.lstrip().startswith(b"%PDF"):
+        try:
+            extract_fields(data.decode("utf-8"), found)
+        except UnicodeDecodeError:
+            result["error"] = "Unsupported document type."
+        result.update(found)
+        return result
+
+    try:
+        from pypdf import PdfReader
+
+        reader = PdfReader(io.BytesIO(data))
+        result["page_count"] = len(reader.pages)
+        for page in reader.pages[:max_pages]:
+            result["pages_read"] += 1
+            extract_fields(page.extract_text() or "", found)
+            if len(found) == len(FIELD_PATTERNS):
+                break  # early exit: everything we need is in hand
+    except Exception as e:
+        result["error"] = f"Could not read PDF: {e}"
+
+    result.update(found)
+    return result
+
+
+class SalarySlipParser:
+    """
+    Runs parse_salary_slip on a process pool so pypdf's CPU work never sits
+    on the API's event loop. Results are cached by the file's SHA-256, and
+    concurrent requests for the same file share one parse.
+    """
+
+    def __init__(self, workers: int = SLIP_PARSER_WORKERS,
+                 max_entries: int = SLIP_CACHE_MAX_ENTRIES,
+                 timeout: float = SLIP_PARSE_TIMEOUT):
+        self.workers = workers
+        self.max_entries = max_entries
+        self.timeout = timeout
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._stats = {"parses": 0, "cache_hits": 0, "errors": 0, "pages_read": 0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def cached(self, sha256: str) -> Optional[dict]:
+        with self._lock:
+            result = self._cache.get(sha256)
+            if result is not None:
+                self._cache.move_to_end(sha256)
+                self._stats["cache_hits"] += 1
+            return dict(result) if result is not None else None
+
+    def _remember(self, sha256: str, future: Future):
+        with self._lock:
+            self._inflight.pop(sha256, None)
+            if future.cancelled() or future.exception() is not None:
+                self._stats["errors"] += 1
+                return
+            result = future.result()
+            self._stats["parses"] += 1
+            self._stats["pages_read"] += result["pages_read"]
+            self._cache[sha256] = result
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def submit(self, sha256: str, data: bytes) -> Future:
+        executor = self._get_executor()
+        with self._lock:
+            future = self._inflight.get(sha256)
+            if future is not None:
+                return future
+            future = executor.submit(parse_salary_slip, data)
+            self._inflight[sha256] = future
+        future.add_done_callback(lambda f: self._remember(sha256, f))
+        return future
+
+    async def parse(self, sha256: str, data: bytes) -> dict:
+        cached = self.cached(sha256)
+        if cached is not None:
+            return cached
+        try:
+            # shield: a timed-out waiter must not cancel a parse others share
+            future = asyncio.wrap_future(self.submit(sha256, data))
+            result = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            return {"gross_salary": None, "net_salary": None, "pages_read": 0, "page_count": 0,
+                    "error": "Timed out reading the document."}
+        return dict(result)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._cache)
+        return stats
+
+
+# --- DEFAULT PARSER ---
+_default_parser: Optional[SalarySlipParser] = None
+_default_lock = threading.Lock()
+
+
+def get_slip_parser() -> SalarySlipParser:
+    global _default_parser
+    if _default_parser is None:
+        with _default_lock:
+            if _default_parser is None:
+                _default_parser = SalarySlipParser()
+    return _default_parser
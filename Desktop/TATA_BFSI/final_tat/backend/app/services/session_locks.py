@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+from app.core.config import SESSION_LOCK_TIMEOUT
+from app.core.metrics import SESSION_LOCK_WAIT
+
+
+class SessionBusyError(Exception):
+    """
+    Raised when a request gave up waiting for its session's lock.
+    """
+
+
+class _Entry:
+    __slots__ = ("held", "waiters", "refs")
+
+    def __init__(self):
+        self.held = False
+        self.waiters: deque = deque()   # threading.Event | asyncio.Future, FIFO
+        self.refs = 0                   # holder + waiters; the entry goes away at 0
+
+
+def _wake(waiter):
+    if isinstance(waiter, threading.Event):
+        waiter.set()
+    else:
+        waiter.get_loop().call_soon_threadsafe(lambda: waiter.done() or waiter.set_result(True))
+
+
+class SessionLocks:
+    """
+    One FIFO lock per thread_id, usable from sync handlers (threads) and
+    async ones alike.
+
+    Requests on the same session run one at a time, in arrival order; the
+    lock is handed straight to the next waiter on release. Different
+    sessions never share a lock, and the registry's own mutex is only held
+    for a few dict operations. Entries are dropped when nobody holds or
+    waits on them, so memory tracks live sessions only.
+
+    This orders requests within one process; across uvicorn workers the
+    session store's versioned writes still catch conflicts (409).
+    """
+
+    def __init__(self, timeout: float = SESSION_LOCK_TIMEOUT):
+        self.timeout = timeout
+        self._mutex = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        self._stats = {"acquired": 0, "contended": 0, "timeouts": 0}
+
+    # --- CORE ---
+
+    def _enter(self, key: str, make_waiter):
+        """
+        Takes the lock if free (returns None) or queues a waiter (returns it).
+        """
+        with self._mutex:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+            entry.refs += 1
+            self._stats["acquired"] += 1
+            if not entry.held:
+                entry.held = True
+                return None
+            waiter = make_waiter()
+            entry.waiters.append(waiter)
+            self._stats["contended"] += 1
+            return waiter
+
+    def _abandon(self, key: str, waiter, timed_out: bool = True) -> bool:
+        """
+        Called on timeout / cancel. False if the lock was handed to us in the meantime.
+        """
+        with self._mutex:
+            entry = self._entries[key]
+            try:
+                entry.waiters.remove(waiter)
+            except ValueError:
+                return False
+            entry.refs -= 1
+            self._stats["acquired"] -= 1
+            self._stats["timeouts"] += timed_out
+            if entry.refs == 0:
+                del self._entries[key]
+            return True
+
+    def release(self, key: str):
+        with self._mutex:
+            entry = self._entries[key]
+            entry.refs -= 1
+            if entry.waiters:
+                _wake(entry.waiters.popleft())  # ownership passes directly, held stays True
+                return
+            entry.held = False
+            if entry.refs == 0:
+                del self._entries[key]
+
+    # --- SYNC ---
+
+    def acquire(self, key: str, timeout: Optional[float] = None):
+        waiter = self._enter(key, threading.Event)
+        if waiter is None:
+            return
+        started = time.perf_counter()
+        if not waiter.wait(self.timeout if timeout is None else timeout) and self._abandon(key, waiter):
+            raise SessionBusyError(key)
+        SESSION_LOCK_WAIT.observe(time.perf_counter() - started)
+
+    @contextmanager
+    def hold(self, key: str, timeout: Optional[float] = None):
+        self.acquire(key, timeout)
+        try:
+            yield
+        finally:
+            self.release(key)
+
+    # --- ASYNC ---
+
+    async def aacquire(self, key: str, timeout: Optional[float] = None):
+        loop = asyncio.get_running_loop()
+        waiter = self._enter(key, loop.create_future)
+        if waiter is None:
+            return
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout if timeout is None else timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if self._abandon(key, waiter, timed_out=isinstance(e, asyncio.TimeoutError)):
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                raise SessionBusyError(key)
+            if isinstance(e, asyncio.CancelledError):
+                self.release(key)  # handed to us just as we were cancelled: pass it on
+                raise
+        SESSION_LOCK_WAIT.observe(time.perf_counter() - started)
+
+    @asynccontextmanager
+    async def ahold(self, key: str, timeout: Optional[float] = None):
+        await self.aacquire(key, timeout)
+        try:
+            yield
+        finally:
+            self.release(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self._mutex:
+            stats = dict(self._stats)
+            stats["sessions"] = len(self._entries)
+            stats["waiting"] = sum(len(e.waiters) for e in self._entries.values())
+        return stats
+
+
+# --- DEFAULT LOCKS ---
+_default_locks: Optional[SessionLocks] = None
+_default_lock = threading.Lock()
+
+
+def get_session_locks() -> SessionLocks:
+    global _default_locks
+    if _default_locks is None:
+        with _default_lock:
+            if _default_locks is None:
+                _default_locks = SessionLocks()
+    return _default_locks
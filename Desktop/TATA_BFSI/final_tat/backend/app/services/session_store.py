@@ -0,0 +1,410 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+from app.core.config import (
+    SESSION_STORE_BACKEND,
+    SESSION_DB_PATH,
+    SESSION_MAX_COUNT,
+    SESSION_TTL_SECONDS,
+    SESSION_MAX_BYTES,
+)
+
+
+def new_session_state() -> dict:
+    """
+    Fresh conversation state for a thread the store has never seen.
+    """
+    return {
+        "messages": [],
+        "current_stage": "SALES",
+        "user_data": {},
+        "loan_amount": 0,
+        "sanction_letter": None,
+        "letter_job_id": None,
+        "upload": None,
+        "context": {},
+        "message_count": 0,
+        "version": 0
+    }
+
+
+def estimate_state_size(state: dict) -> int:
+    """
+    Rough byte size of a session's scalar fields (everything but the message log).
+    """
+    rest = {k: v for k, v in state.items() if k not in ("messages", "message_count")}
+    return len(json.dumps(rest, default=str))
+
+
+def estimate_messages_size(messages: Sequence) -> int:
+    return sum(len(str(m)) for m in messages)
+
+
+class SessionConflictError(Exception):
+    """
+    Raised when a session was written by someone else since it was read.
+    """
+
+
+class SessionStore(ABC):
+    """
+    Interface for conversation state storage.
+    get() returns a copy carrying a "version" key; callers must put() the state
+    back to persist changes. Passing expected_version makes the write
+    optimistic: it fails with SessionConflictError if the stored version moved
+    on (0 means "must not exist yet"). Returns the new version.
+
+    The message log is append-only: put() ignores state["messages"] and only
+    appends new_messages, so a turn costs the same however long the chat is.
+    The "messages" list returned by get() must be treated as read-only;
+    history_limit asks for only the last N messages, and "message_count" is
+    the length of the full log.
+    """
+
+    @abstractmethod
+    def get(self, thread_id: str, history_limit: Optional[int] = None) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def put(self, thread_id: str, state: dict, expected_version: Optional[int] = None,
+            new_messages: Sequence[str] = ()) -> int:
+        ...
+
+    @abstractmethod
+    def delete(self, thread_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        ...
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local store with LRU + idle-TTL eviction and a total size cap.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_MAX_COUNT,
+                 ttl_seconds: float = SESSION_TTL_SECONDS,
+                 max_bytes: int = SESSION_MAX_BYTES):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        # thread_id -> (state, size_bytes, last_access); oldest access first
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # --- EVICTION (call with lock held) ---
+
+    def _drop(self, thread_id: str):
+        _, size, _ = self._data.pop(thread_id)
+        self._bytes -= size
+
+    def _expire(self, now: float):
+        # Entries are ordered by last access, so expired ones sit at the front
+        while self._data:
+            thread_id, (_, _, last_access) = next(iter(self._data.items()))
+            if now - last_access < self.ttl_seconds:
+                break
+            self._drop(thread_id)
+            self.expirations += 1
+
+    def _enforce_limits(self):
+        while self._data and (len(self._data) > self.max_sessions or self._bytes > self.max_bytes):
+            thread_id = next(iter(self._data))
+            self._drop(thread_id)
+            self.evictions += 1
+
+    # --- API ---
+
+    def get(self, thread_id: str, history_limit: Optional[int] = None) -> Optional[dict]:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._data.get(thread_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            state, size, _ = entry
+            self._data[thread_id] = (state, size, now)
+            self._data.move_to_end(thread_id)
+            self.hits += 1
+            state = dict(state)
+            state["message_count"] = len(state["messages"])
+            if history_limit is not None:
+                state["messages"] = state["messages"][-history_limit:] if history_limit else []
+            return state
+
+    def put(self, thread_id: str, state: dict, expected_version: Optional[int] = None,
+            new_messages: Sequence[str] = ()) -> int:
+        now = time.monotonic()
+        size = estimate_state_size(state)
+        added = estimate_messages_size(new_messages)
+        with self._lock:
+            entry = self._data.get(thread_id)
+            current_version = entry[0]["version"] if entry else 0
+            if expected_version is not None and expected_version != current_version:
+                raise SessionConflictError(
+                    f"Session {thread_id} is at version {current_version}, expected {expected_version}."
+                )
+
+            # Keep the existing log and its accounted size, just extend it
+            log: List[str] = entry[0]["messages"] if entry else []
+            log_size = (entry[1] - estimate_state_size(entry[0])) if entry else 0
+            if entry is not None:
+                self._drop(thread_id)
+            log.extend(new_messages)
+            size += log_size + added
+
+            new_state = {k: v for k, v in state.items() if k != "message_count"}
+            new_state["messages"] = log
+            new_state["version"] = current_version + 1
+            self._data[thread_id] = (new_state, size, now)
+            self._bytes += size
+            self._expire(now)
+            self._enforce_limits()
+            return new_state["version"]
+
+    def delete(self, thread_id: str) -> bool:
+        with self._lock:
+            if thread_id in self._data:
+                self._drop(thread_id)
+                return True
+            return False
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "sessions": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Shared store on a local SQLite file in WAL mode.
+
+    Every uvicorn worker opens the same file, so any worker can serve any
+    thread. Each row carries a version number that put() bumps with a
+    compare-and-swap UPDATE, which is how concurrent writers are detected.
+    Messages live in their own table and each turn inserts only its new rows.
+    Idle sessions older than the TTL are purged periodically.
+    """
+
+    PURGE_INTERVAL_SECONDS = 60.0
+
+    def __init__(self, path: str = SESSION_DB_PATH,
+                 ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._last_purge = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.conflicts = 0
+        self.expirations = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS sessions (
+                thread_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]
+        if "message_count" not in columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN message_count INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated_at)")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS session_messages (
+                thread_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                PRIMARY KEY (thread_id, seq)
+            ) WITHOUT ROWID"""
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode: multi-statement writes open their own transaction
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _count(self, attr: str):
+        with self._stats_lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def _maybe_purge(self, now: float):
+        if now - self._last_purge < self.PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        cutoff = now - self.ttl_seconds
+        with self._transaction() as conn:
+            conn.execute(
+                """DELETE FROM session_messages WHERE thread_id IN
+                   (SELECT thread_id FROM sessions WHERE updated_at < ?)""",
+                (cutoff,)
+            )
+            cur = conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+        with self._stats_lock:
+            self.expirations += cur.rowcount
+
+    # --- API ---
+
+    def get(self, thread_id: str, history_limit: Optional[int] = None) -> Optional[dict]:
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT version, state, message_count, updated_at FROM sessions WHERE thread_id = ?",
+            (thread_id,)
+        ).fetchone()
+        if row is None or now - row[3] >= self.ttl_seconds:
+            self._count("misses")
+            return None
+        self._count("hits")
+
+        first_seq = 0 if history_limit is None else max(0, row[2] - history_limit)
+        state = json.loads(row[1])
+        state["messages"] = [
+            content for (content,) in conn.execute(
+                "SELECT content FROM session_messages WHERE thread_id = ? AND seq >= ? ORDER BY seq",
+                (thread_id, first_seq)
+            )
+        ]
+        state["message_count"] = row[2]
+        state["version"] = row[0]
+        return state
+
+    def put(self, thread_id: str, state: dict, expected_version: Optional[int] = None,
+            new_messages: Sequence[str] = ()) -> int:
+        now = time.time()
+        self._maybe_purge(now)
+        payload = json.dumps(
+            {k: v for k, v in state.items() if k not in ("version", "messages", "message_count")},
+            default=str
+        )
+        added = len(new_messages)
+
+        with self._transaction() as conn:
+            if expected_version is None:
+                row = conn.execute(
+                    """INSERT INTO sessions (thread_id, version, state, message_count, updated_at)
+                       VALUES (?, 1, ?, ?, ?)
+                       ON CONFLICT(thread_id) DO UPDATE SET
+                           version = version + 1, state = excluded.state,
+                           message_count = message_count + excluded.message_count,
+                           updated_at = excluded.updated_at
+                       RETURNING version, message_count""",
+                    (thread_id, payload, added, now)
+                ).fetchone()
+            elif expected_version == 0:
+                row = conn.execute(
+                    """INSERT INTO sessions (thread_id, version, state, message_count, updated_at)
+                       VALUES (?, 1, ?, ?, ?)
+                       ON CONFLICT(thread_id) DO NOTHING
+                       RETURNING version, message_count""",
+                    (thread_id, payload, added, now)
+                ).fetchone()
+                if row is None:
+                    # Either a racing worker created it, or an expired row is still around
+                    row = conn.execute(
+                        """UPDATE sessions SET version = version + 1, state = ?,
+                               message_count = ?, updated_at = ?
+                           WHERE thread_id = ? AND updated_at < ?
+                           RETURNING version, message_count""",
+                        (payload, added, now, thread_id, now - self.ttl_seconds)
+                    ).fetchone()
+                    if row is None:
+                        self._count("conflicts")
+                        raise SessionConflictError(f"Session {thread_id} was created concurrently.")
+                    conn.execute("DELETE FROM session_messages WHERE thread_id = ?", (thread_id,))
+            else:
+                row = conn.execute(
+                    """UPDATE sessions SET version = version + 1, state = ?,
+                           message_count = message_count + ?, updated_at = ?
+                       WHERE thread_id = ? AND version = ?
+                       RETURNING version, message_count""",
+                    (payload, added, now, thread_id, expected_version)
+                ).fetchone()
+                if row is None:
+                    self._count("conflicts")
+                    raise SessionConflictError(
+                        f"Session {thread_id} changed since version {expected_version}."
+                    )
+
+            version, message_count = row
+            if added:
+                first_seq = message_count - added
+                conn.executemany(
+                    "INSERT INTO session_messages (thread_id, seq, content) VALUES (?, ?, ?)",
+                    [(thread_id, first_seq + i, str(m)) for i, m in enumerate(new_messages)]
+                )
+        return version
+
+    def delete(self, thread_id: str) -> bool:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM session_messages WHERE thread_id = ?", (thread_id,))
+            cur = conn.execute("DELETE FROM sessions WHERE thread_id = ?", (thread_id,))
+        return cur.rowcount > 0
+
+    def stats(self) -> Dict[str, int]:
+        sessions = self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        with self._stats_lock:
+            return {
+                "sessions": sessions,
+                "hits": self.hits,
+                "misses": self.misses,
+                "conflicts": self.conflicts,
+                "expirations": self.expirations,
+            }
+
+
+def create_session_store(backend: str = SESSION_STORE_BACKEND) -> SessionStore:
+    """
+    Builds the store selected by SESSION_STORE_BACKEND.
+    """
+    if backend == "memory":
+        return InMemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    raise ValueError(f"Unknown session store backend: {backend}")
@@ -0,0 +1,105 @@
+import hashlib
+import json
+from typing import Iterable, Tuple
+
+from fastapi import UploadFile
+
+from app.core.config import UPLOAD_MAX_BYTES, UPLOAD_CHUNK_BYTES
+
+# Multipart framing (boundaries, part headers) on top of the file itself
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """
+    Raised once an upload is known to exceed UPLOAD_MAX_BYTES.
+    """
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Pure ASGI guard that rejects oversized request bodies on the given paths
+    with a 413 as early as possible: from Content-Length before anything is
+    read, otherwise as soon as the streamed body crosses the limit. The rest
+    of the body is never read, so nothing big is spooled to disk.
+    """
+
+    def __init__(self, app, paths: Iterable[str], max_bytes: int = UPLOAD_MAX_BYTES):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+        self.limit = max_bytes + MULTIPART_OVERHEAD
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.limit:
+            return await self._reject(send)
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    exceeded = True
+                    raise UploadTooLargeError()
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if exceeded:
+                # The framework turned our error into its own response (e.g. a
+                # 400 "error parsing the body"); answer 413 instead, once
+                if message["type"] == "http.response.start" and not response_started:
+                    response_started = True
+                    await self._reject(send)
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadTooLargeError:
+            if response_started:
+                return
+            await self._reject(send)
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": f"File too large. Max size is {self.max_bytes // (1024 * 1024)} MB."}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def hash_upload(upload: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES,
+                      chunk_size: int = UPLOAD_CHUNK_BYTES) -> Tuple[str, int]:
+    """
+    SHA-256 and size of an upload, read chunk by chunk from its spooled file.
+    UploadFile.read() moves to a worker thread once the spool has rolled over
+    to disk, so this never blocks the event loop on file I/O.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    await upload.seek(0)
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLargeError()
+        digest.update(chunk)
+    await upload.seek(0)
+    return digest.hexdigest(), size
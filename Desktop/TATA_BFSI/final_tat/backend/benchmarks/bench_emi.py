@@ -0,0 +1,47 @@
+"""
+Throughput of the vectorized EMI engine in app/core/logic.py.
+
+Run from backend/:  python -m benchmarks.bench_emi [n_loans]
+"""
+import sys
+import time
+
+import numpy as np
+
+from app.core.logic import calculate_emi, calculate_emi_array, price_loans
+
+
+def main(n: int = 2_000_000):
+    rng = np.random.default_rng(42)
+    principal = rng.uniform(10_000, 5_000_000, n)
+    rate = rng.uniform(8, 20, n)
+    tenure = rng.choice([12, 24, 36, 48, 60], n)
+
+    # Scalar path (old style), on a small sample
+    sample = 50_000
+    started = time.perf_counter()
+    for p, r, t in zip(principal[:sample], rate[:sample], tenure[:sample]):
+        calculate_emi(p, r, t)
+    scalar_rate = sample / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    calculate_emi_array(principal, rate, tenure)
+    emi_rate = n / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    price_loans(principal, rate, tenure)
+    price_rate = n / (time.perf_counter() - started)
+
+    k = 10_000
+    started = time.perf_counter()
+    price_loans(principal[:k], rate[:k], tenure[:k], schedule=True)
+    schedule_rate = k / (time.perf_counter() - started)
+
+    print(f"scalar calculate_emi : {scalar_rate:>14,.0f} loans/s")
+    print(f"calculate_emi_array  : {emi_rate:>14,.0f} loans/s")
+    print(f"price_loans          : {price_rate:>14,.0f} loans/s")
+    print(f"price_loans+schedule : {schedule_rate:>14,.0f} loans/s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000)
@@ -0,0 +1,58 @@
+"""
+Sanction letters per second on one core: full layout (file and in-memory)
+vs. the pre-rendered template in app/services/pdf_generator.py.
+
+Run from backend/:  python -m benchmarks.bench_letters [n_letters]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from app.services.pdf_generator import (
+    layout_sanction_letter,
+    letter_fields,
+    render_sanction_letter,
+    get_letter_template,
+)
+
+CUSTOMERS = [
+    ("Rahul Sharma", "9999999901", 300000, 36, 9964.29),
+    ("Priya Iyer", "9999999902", 750000, 48, 19750.12),
+    ("Amit Verma", "9999999903", 1500000, 60, 33366.67),
+]
+
+
+def _rate(fn, n: int) -> float:
+    started = time.perf_counter()
+    for i in range(n):
+        fn(*CUSTOMERS[i % len(CUSTOMERS)])
+    return n / (time.perf_counter() - started)
+
+
+def main(n: int = 2_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "letter.pdf")
+
+        def legacy(*args):
+            # The original path: full layout, written to a file
+            layout_sanction_letter(letter_fields(*args)).output(path)
+
+        legacy_rate = _rate(legacy, n)
+
+    memory_rate = _rate(render_sanction_letter, n)
+
+    template = get_letter_template()
+    started = time.perf_counter()
+    template.warm()
+    warm_ms = (time.perf_counter() - started) * 1000
+    template_rate = _rate(template.render, n)
+
+    print(f"full layout -> file   : {legacy_rate:>10,.0f} letters/s/core")
+    print(f"full layout -> memory : {memory_rate:>10,.0f} letters/s/core")
+    print(f"template    -> memory : {template_rate:>10,.0f} letters/s/core"
+          f"  ({template_rate / legacy_rate:.0f}x, one-off layout {warm_ms:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000)
@@ -0,0 +1,318 @@
+"""
+End-to-end load test: simulated customers walk the full funnel against the
+FastAPI app in-process (httpx + ASGITransport), with ChatGroq swapped for a
+local stub LLM, so no GROQ_API_KEY or network is needed.
+
+  SALES -> VERIFICATION (phones from customers.json) -> UNDERWRITING
+        -> UPLOAD (synthetic salary slip) or END
+
+Reports throughput, p50 / p95 / p99 per endpoint and per stage, and peak RSS.
+Every run is saved as JSON; --compare flags regressions against an older run.
+
+Run from backend/:
+  python -m benchmarks.loadtest --users 2000 --concurrency 200 --llm-latency 0.3
+  python -m benchmarks.loadtest --compare benchmarks/results/<older run>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+OPENERS = ["hi", "I need a loan", "tell me about personal loans", "what are your rates?",
+           "is there any processing fee?", "how fast is the approval?", "hello"]
+AGREE = ["yes", "sure", "ok let's do it", "yes please", "I want to apply"]
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.by_endpoint: Dict[str, List[float]] = defaultdict(list)
+        self.by_stage: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Counter = Counter()
+        self.outcomes: Counter = Counter()
+
+    def add(self, endpoint: str, stage: str, seconds: float, status: int):
+        self.by_endpoint[endpoint].append(seconds)
+        self.by_stage[stage].append(seconds)
+        self.statuses[f"{endpoint} {status}"] += 1
+
+
+def _summary(samples: List[float]) -> dict:
+    ms = np.array(samples) * 1000
+    return {
+        "count": len(samples),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+
+
+class Funnel:
+    """
+    One simulated customer. Chooses an amount relative to the customer's
+    pre-approved limit so the run mixes instant approvals, slip uploads and
+    rejections.
+    """
+
+    def __init__(self, client, recorder: Recorder, customers: List[dict], slips: Dict[str, bytes],
+                 rng: random.Random, stream: bool, user_id: int):
+        self.client = client
+        self.rec = recorder
+        self.customers = customers
+        self.slips = slips
+        self.rng = rng
+        self.stream = stream
+        self.thread_id = f"load-{user_id}"
+        self.stage = "SALES"
+
+    async def _chat(self, message: str) -> dict:
+        payload = {"thread_id": self.thread_id, "message": message}
+        endpoint = "POST /chat/stream" if self.stream else "POST /chat"
+        started = time.perf_counter()
+        if self.stream:
+            data, status = None, 0
+            async with self.client.stream("POST", "/chat/stream", json=payload) as response:
+                status = response.status_code
+                event = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        event = line[7:]
+                    elif line.startswith("data: ") and event in ("done", "error"):
+                        data = json.loads(line[6:])
+                        if event == "error":
+                            status = data.get("status", 500)
+        else:
+            response = await self.client.post("/chat", json=payload)
+            status = response.status_code
+            data = response.json() if status == 200 else None
+        self.rec.add(endpoint, self.stage, time.perf_counter() - started, status)
+        if data is None or status != 200:
+            raise RuntimeError(f"{endpoint} -> {status}")
+        self.stage = data["next_stage"]
+        return data
+
+    async def run(self):
+        rng = self.rng
+        for _ in range(rng.randint(1, 3)):
+            await self._chat(rng.choice(OPENERS))
+        await self._chat(rng.choice(AGREE))
+        if self.stage != "VERIFICATION":
+            self.rec.outcomes["stuck_in_sales"] += 1
+            return
+
+        customer = rng.choice(self.customers)
+        await self._chat(customer["phone"])
+        if self.stage != "UNDERWRITING":
+            self.rec.outcomes["not_verified"] += 1
+            return
+
+        limit = customer["pre_approved_limit"]
+        kind = rng.choices(["instant", "upload", "reject"], weights=[6, 3, 1])[0]
+        amount = {"instant": limit * rng.uniform(0.3, 1.0),
+                  "upload": limit * rng.uniform(1.05, 2.0),
+                  "reject": limit * rng.uniform(2.1, 3.0)}[kind]
+        await self._chat(str(int(amount)))
+        data = await self._chat(rng.choice(["12", "24", "36", "48", "60"]))
+
+        if self.stage == "UPLOAD":
+            slip_kind = rng.choice(list(self.slips))
+            started = time.perf_counter()
+            response = await self.client.post(
+                f"/upload?thread_id={self.thread_id}",
+                files={"file": (f"{slip_kind}.pdf", self.slips[slip_kind], "application/pdf")}
+            )
+            self.rec.add("POST /upload", "UPLOAD", time.perf_counter() - started, response.status_code)
+            if response.status_code != 200:
+                raise RuntimeError(f"POST /upload -> {response.status_code}")
+            data = response.json()
+            self.stage = "END"
+
+        job_id = data.get("letter_job_id")
+        if job_id:
+            started = time.perf_counter()
+            response = await self.client.get(f"/letters/jobs/{job_id}")
+            self.rec.add("GET /letters/jobs", "END", time.perf_counter() - started, response.status_code)
+            self.rec.outcomes["approved"] += 1
+        else:
+            self.rec.outcomes["declined"] += 1
+
+
+def build_app(args):
+    """
+    Imports the app with the stub LLM in place of ChatGroq.
+    """
+    os.environ.setdefault("GROQ_API_KEY", "stub")
+    # Gateway limits (0 = unlimited); must be set before app.core.config is imported
+    os.environ["LLM_RPM"] = str(args.llm_rpm)
+    os.environ["LLM_TPM"] = str(args.llm_tpm)
+    if args.no_llm_cache:
+        os.environ["LLM_CACHE_ENABLED"] = "0"
+
+    from benchmarks.stub_llm import StubChatModel
+    import app.agents.master as master
+
+    stub = StubChatModel(latency=args.llm_latency, jitter=args.llm_jitter, rpm=args.provider_rpm)
+    master.get_llm().llm.llm = stub  # cache -> gateway -> provider
+    if args.no_llm_cache:
+        master.get_llm().enabled = False
+
+    from app.main import app
+    return app
+
+
+def make_slips() -> Dict[str, bytes]:
+    from benchmarks.bench_slip_parser import make_slip
+    return {
+        "slip_high": make_slip(250_000, 210_000, pages=2, figures_page=0),
+        "slip_mid": make_slip(120_000, 100_000, pages=3, figures_page=1),
+        "slip_low": make_slip(30_000, 26_000, pages=1, figures_page=0),
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+
+    app = build_app(args)
+    from app.services.customer_store import get_customer_store
+    customers = list(get_customer_store())
+    slips = make_slips()
+
+    rec = Recorder()
+    rng = random.Random(args.seed)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    errors: Counter = Counter()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+        async def one(user_id: int):
+            async with semaphore:
+                funnel = Funnel(client, rec, customers, slips, random.Random(rng.random()), args.stream, user_id)
+                try:
+                    await funnel.run()
+                except Exception as e:
+                    errors[str(e)[:80]] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[one(i) for i in range(args.users)])
+        elapsed = time.perf_counter() - started
+
+    requests = sum(len(v) for v in rec.by_endpoint.values())
+    return {
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+        "elapsed_s": round(elapsed, 3),
+        "throughput": {
+            "requests_per_s": round(requests / elapsed, 2),
+            "funnels_per_s": round(args.users / elapsed, 2),
+            # funnels that finished without an error status (shed / failed ones excluded)
+            "goodput_funnels_per_s": round((args.users - sum(errors.values())) / elapsed, 2),
+        },
+        "endpoints": {k: _summary(v) for k, v in sorted(rec.by_endpoint.items())},
+        "stages": {k: _summary(v) for k, v in sorted(rec.by_stage.items())},
+        "statuses": dict(rec.statuses),
+        "outcomes": dict(rec.outcomes),
+        "errors": dict(errors),
+        "peak_rss_mb": {k: round(v, 1) for k, v in peak_rss_mb().items()},
+    }
+
+
+def print_report(result: dict):
+    t = result["throughput"]
+    print(f"\n{result['config']['users']} users in {result['elapsed_s']}s: "
+          f"{t['requests_per_s']} req/s, {t['funnels_per_s']} funnels/s, "
+          f"goodput {t['goodput_funnels_per_s']} funnels/s")
+    for title, table in (("endpoint", result["endpoints"]), ("stage", result["stages"])):
+        print(f"\n{title:<22} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for name, s in table.items():
+            print(f"{name:<22} {s['count']:>7} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f}")
+    print(f"\noutcomes: {result['outcomes']}")
+    if result["errors"]:
+        print(f"errors:   {result['errors']}")
+    print(f"peak RSS: {result['peak_rss_mb']} MB")
+
+
+def compare(result: dict, baseline_path: str, threshold: float) -> List[str]:
+    """
+    Regressions vs. an older run: throughput down, or p95 / p99 up, by more than threshold.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+
+    changed = {k: (baseline["config"].get(k), v) for k, v in result["config"].items()
+               if baseline["config"].get(k) != v}
+    if changed:
+        print(f"note: configs differ from the baseline run: {changed}")
+
+    old, new = baseline["throughput"]["requests_per_s"], result["throughput"]["requests_per_s"]
+    if new < old * (1 - threshold):
+        regressions.append(f"throughput {old} -> {new} req/s")
+
+    for section in ("endpoints", "stages"):
+        for name, s in result[section].items():
+            before = baseline.get(section, {}).get(name)
+            if not before:
+                continue
+            for key in ("p95_ms", "p99_ms"):
+                if s[key] > before[key] * (1 + threshold):
+                    regressions.append(f"{section}/{name} {key} {before[key]} -> {s[key]}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="stub LLM latency, seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--llm-rpm", type=float, default=0, help="gateway LLM_RPM (0 = unlimited)")
+    parser.add_argument("--llm-tpm", type=float, default=0, help="gateway LLM_TPM (0 = unlimited)")
+    parser.add_argument("--provider-rpm", type=float, default=0,
+                        help="stub answers 429 past this many calls a minute (0 = never)")
+    parser.add_argument("--stream", action="store_true", help="drive /chat/stream instead of /chat")
+    parser.add_argument("--no-llm-cache", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None, help="result file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="older result file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown, fraction")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"saved {out}")
+
+    if args.compare:
+        regressions = compare(result, args.compare, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
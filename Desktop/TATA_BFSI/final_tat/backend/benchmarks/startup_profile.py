@@ -0,0 +1,167 @@
+"""
+Cold-start profile for the API, with budgets so CI can catch regressions.
+
+  1. Import time of app.main in a fresh interpreter (best of --repeats), split
+     by top-level package (self time from `python -X importtime`) and by
+     module inside app/.
+  2. Time from spawning uvicorn to the first 200 from GET / (healthy) and
+     from GET /ready (warm-up finished).
+
+Exits 1 when a measurement is over its budget. Every run is saved as JSON.
+
+Run from backend/:
+  python -m benchmarks.startup_profile
+  python -m benchmarks.startup_profile --import-budget-ms 800 --healthy-budget-ms 2000
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+TIMED_IMPORT = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("GROQ_API_KEY", "stub")  # the client is only built, never called
+    env["PYTHONDONTWRITEBYTECODE"] = "0"
+    return env
+
+
+def import_profile(module: str, repeats: int) -> dict:
+    """
+    Best-of-N wall time plus a self-time breakdown from the fastest run.
+    """
+    best, best_log = None, ""
+    for _ in range(repeats):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", TIMED_IMPORT.format(module=module)],
+                              cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True)
+        seconds = float(proc.stdout.strip().splitlines()[-1])
+        if best is None or seconds < best:
+            best, best_log = seconds, proc.stderr
+
+    by_package: Dict[str, int] = defaultdict(int)
+    by_app_module: Dict[str, int] = {}
+    for line in best_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, _, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        by_package[name.split(".")[0]] += int(self_us)
+        if name.startswith("app."):
+            by_app_module[name] = int(self_us)
+
+    top = lambda d, n: {k: round(v / 1000, 1) for k, v in sorted(d.items(), key=lambda kv: -kv[1])[:n]}
+    return {"module": module, "wall_ms": round(best * 1000, 1),
+            "packages_ms": top(by_package, 15), "app_modules_ms": top(by_app_module, 15)}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(client: httpx.Client, url: str, deadline: float) -> Optional[float]:
+    while time.monotonic() < deadline:
+        try:
+            if client.get(url).status_code == 200:
+                return time.monotonic()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def serve_profile(warmup: str, timeout: float) -> dict:
+    """
+    Spawns uvicorn and times the first healthy and first ready responses.
+    """
+    port = _free_port()
+    env = _env()
+    env["STARTUP_WARMUP"] = warmup
+    started = time.monotonic()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                             "--log-level", "warning"],
+                            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        with httpx.Client(timeout=2.0) as client:
+            healthy = _wait_for(client, f"{base}/", started + timeout)
+            ready = _wait_for(client, f"{base}/ready", started + timeout) if healthy else None
+            startup = client.get(f"{base}/stats").json().get("startup") if ready else None
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    ms = lambda t: round((t - started) * 1000, 1) if t else None
+    return {"warmup": warmup, "healthy_ms": ms(healthy), "ready_ms": ms(ready),
+            "warmup_steps_s": {k: v["seconds"] for k, v in (startup or {}).get("steps", {}).items()}}
+
+
+def check_budgets(result: dict, args) -> List[str]:
+    over = []
+    checks = [("import", result["import"]["wall_ms"], args.import_budget_ms),
+              ("healthy", result["serve"]["healthy_ms"], args.healthy_budget_ms),
+              ("ready", result["serve"]["ready_ms"], args.ready_budget_ms)]
+    for name, value, budget in checks:
+        if budget and (value is None or value > budget):
+            over.append(f"{name} {value} ms > budget {budget} ms")
+    return over
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--warmup", default="background", choices=["background", "blocking", "off"])
+    parser.add_argument("--timeout", type=float, default=60.0, help="give up on the server after this, seconds")
+    parser.add_argument("--import-budget-ms", type=float, default=1000)
+    parser.add_argument("--healthy-budget-ms", type=float, default=3000)
+    parser.add_argument("--ready-budget-ms", type=float, default=0, help="0 = not enforced")
+    parser.add_argument("--out", default=None, help="result file (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    result = {
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "import": import_profile(args.module, args.repeats),
+        "serve": serve_profile(args.warmup, args.timeout),
+    }
+    result["budgets"] = {"import_ms": args.import_budget_ms, "healthy_ms": args.healthy_budget_ms,
+                         "ready_ms": args.ready_budget_ms}
+
+    imp, serve = result["import"], result["serve"]
+    print(f"\nimport {imp['module']}: {imp['wall_ms']} ms")
+    for title, table in (("package", imp["packages_ms"]), ("app module", imp["app_modules_ms"])):
+        print(f"\n{title:<40} {'self ms':>9}")
+        for name, value in table.items():
+            print(f"{name:<40} {value:>9.1f}")
+    print(f"\nuvicorn (warm-up {serve['warmup']}): first healthy {serve['healthy_ms']} ms, "
+          f"ready {serve['ready_ms']} ms")
+    for step, seconds in serve["warmup_steps_s"].items():
+        print(f"  warm-up {step:<20} {seconds * 1000:>9.1f} ms")
+
+    out = args.out or os.path.join(RESULTS_DIR, f"startup-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"saved {out}")
+
+    over = check_budgets(result, args)
+    for line in over:
+        print(f"OVER BUDGET {line}")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Offline stand-in for ChatGroq with configurable latency, for load tests.
+
+Answers like the sales prompt expects (the hand-off token when the customer
+agrees, a pitch otherwise), supports token streaming for /chat/stream and
+reports usage_metadata so the token metrics move. With rpm set it enforces a
+provider-style rate limit and answers 429 past it, to exercise the gateway.
+"""
+import asyncio
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Iterator, List
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+AGREE = re.compile(r"\b(yes|yeah|sure|ok(ay)?|apply|go ahead|let'?s do it|interested)\b", re.IGNORECASE)
+
+PITCHES = [
+    "Tata Capital personal loans come with instant approval and flexible tenures. Shall we get started?",
+    "We can offer competitive rates starting at 12% p.a. with zero processing fee. Would you like to apply?",
+    "Many customers use our loans for weddings, travel or home upgrades. Want me to check your eligibility?",
+    "Approval takes minutes and the money reaches your account quickly. Shall I begin your application?",
+]
+
+
+class StubRateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self):
+        super().__init__("stub provider: rate limit exceeded")
+
+
+def _tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Sleeps latency +/- jitter (seconds) per call; streams the reply word by word.
+    """
+
+    latency: float = 0.3
+    jitter: float = 0.1
+    model_name: str = "stub-llm"
+    rpm: float = 0  # provider-side limit, 0 = none
+
+    _calls: deque = PrivateAttr(default_factory=deque)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _check_rate(self):
+        # Sliding one-minute window, like the provider's RPM limit
+        if not self.rpm:
+            return
+        now = time.monotonic()
+        with self._lock:
+            while self._calls and self._calls[0] <= now - 60:
+                self._calls.popleft()
+            if len(self._calls) >= self.rpm:
+                raise StubRateLimitError()
+            self._calls.append(now)
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        system = messages[0].content if messages else ""
+        if "running summary" in system:
+            return "Customer is exploring a personal loan; no commitments yet."
+        last = messages[-1].content if messages else ""
+        if AGREE.search(last):
+            return "MOVE_TO_VERIFICATION"
+        return PITCHES[sum(map(ord, last)) % len(PITCHES)]
+
+    def _message(self, messages: List[BaseMessage], content: str) -> AIMessage:
+        prompt = sum(_tokens(str(m.content)) for m in messages)
+        completion = _tokens(content)
+        return AIMessage(content=content, usage_metadata={
+            "input_tokens": prompt, "output_tokens": completion, "total_tokens": prompt + completion
+        })
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self._check_rate()
+        time.sleep(self._delay())
+        content = self._reply(messages)
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, content))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self._check_rate()
+        await asyncio.sleep(self._delay())
+        content = self._reply(messages)
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, content))])
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        result = self._generate(messages)
+        for word in re.findall(r"\S+\s*", result.generations[0].message.content):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word))
+            if run_manager:
+                run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        self._check_rate()
+        # Most of the latency goes before the first token, the rest is spread over the words
+        delay = self._delay()
+        await asyncio.sleep(delay * 0.7)
+        words = re.findall(r"\S+\s*", self._reply(messages))
+        for word in words:
+            await asyncio.sleep(delay * 0.3 / max(1, len(words)))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word))
+            if run_manager:
+                await run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
@@ -0,0 +1,26 @@
+import pytest
+
+from app.services.letter_store import parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=5-5", (5, 5)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [None, "", "items=0-1", "bytes=0-1,5-6"])
+def test_parse_range_whole_file(header):
+    assert parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=10-5", "bytes=-0", "bytes=a-b", "bytes=-"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from app.core.logic import calculate_emi, calculate_emi_array
+
+
+def test_calculate_emi_known_value():
+    # 5 lakh at 12% p.a. over 36 months
+    assert calculate_emi(500000, 12.0, 36) == 16607.15
+
+
+def test_calculate_emi_tenure_is_months():
+    assert calculate_emi(120000, 12.0, 12) == pytest.approx(10661.85, abs=0.01)
+    assert calculate_emi(120000, 12.0, 12) > calculate_emi(120000, 12.0, 24)
+
+
+def test_calculate_emi_zero_rate_is_straight_line():
+    assert calculate_emi(120000, 0.0, 12) == 10000.0
+
+
+@pytest.mark.parametrize("principal, tenure", [(0, 36), (-5000, 36), (100000, 0)])
+def test_calculate_emi_invalid_loans_are_zero(principal, tenure):
+    assert calculate_emi(principal, 12.0, tenure) == 0.0
+
+
+def test_calculate_emi_array_matches_scalar():
+    principal = np.array([10000, 250000.5, 500000, 4990000, 0])
+    tenures = np.array([12, 24, 36, 48, 60])
+    emis = calculate_emi_array(principal[:, None], 12.0, tenures[None, :])
+    assert emis.shape == (5, 5)
+    for i, p in enumerate(principal):
+        for j, t in enumerate(tenures):
+            assert round(float(emis[i, j]), 2) == calculate_emi(float(p), 12.0, int(t))
+
+
+def test_calculate_emi_array_broadcasts_rate():
+    emis = calculate_emi_array(100000, np.array([0.0, 12.0]), 10)
+    assert emis[0] == pytest.approx(10000.0)
+    assert emis[1] > emis[0]
@@ -0,0 +1,85 @@
+import copy
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.core.config import CREDIT_POLICY
+from app.core.rules import CompiledPolicy, CreditPolicyEngine, PolicyError, Stage
+
+PARAMS = {"min_credit_score": 700, "max_limit_multiple": 2}
+STAGE = {
+    "reject": [
+        {"name": "low_score", "when": "credit_score < min_credit_score", "reason": "score"},
+        {"name": "over_limit", "when": "requested_amount > max_limit_multiple * pre_approved_limit",
+         "reason": "limit"},
+    ],
+    "tiers": [{"name": "instant", "when": "requested_amount <= pre_approved_limit",
+               "status": "APPROVED_INSTANT", "reason": "instant"}],
+    "default": {"status": "REQUIRES_SALARY_SLIP", "reason": "slip"},
+}
+
+
+def _stage():
+    stage = Stage("initial", STAGE, PARAMS)
+    # Mostly over-limit traffic ranks over_limit ahead of low_score
+    for _ in range(50):
+        stage.decide({"credit_score": 800, "requested_amount": 10 ** 7, "pre_approved_limit": 1000})
+    stage._reorder()
+    assert [r.name for r in stage._order] == ["over_limit", "low_score"]
+    return stage
+
+
+def test_stage_precedence_after_reorder():
+    stage = _stage()
+    both = {"credit_score": 600, "requested_amount": 10 ** 7, "pre_approved_limit": 1000}
+    assert stage.decide(both).name == "low_score"
+    assert stage.outcome(stage.decide(both), both)["reason"] == "score"
+
+
+def test_stage_batch_precedence_matches_scalar():
+    stage = _stage()
+    rng = np.random.default_rng(1)
+    values = {
+        "credit_score": rng.integers(550, 900, 2000),
+        "requested_amount": rng.integers(1, 300, 2000) * 10000.0,
+        "pre_approved_limit": rng.choice([100000.0, 500000.0], 2000),
+    }
+    decided = stage.decide_batch(values, count=False)
+    for i in range(2000):
+        row = {k: v[i] for k, v in values.items()}
+        assert stage.rules[decided[i]].name == stage.decide(row, count=False).name
+
+
+@pytest.mark.parametrize("path, value", [
+    (("initial", "reject", 0, "when"), "credit_scor < min_credit_score"),
+    (("initial", "reject", 0, "reason"), "Below {min_credit_scor}."),
+    (("salary_slip", "tiers", 0, "when"), "emi <= max_emi_to_salary * salery"),
+    (("initial", "tiers", 0, "when"), "requested_amount <="),
+])
+def test_compile_rejects_bad_policy(path, value):
+    policy = copy.deepcopy(CREDIT_POLICY)
+    stage, section, index, key = path
+    policy["stages"][stage][section][index][key] = value
+    with pytest.raises(PolicyError):
+        CompiledPolicy(policy)
+
+
+def test_reload_keeps_last_good_policy(tmp_path):
+    path = os.path.join(tmp_path, "policy.json")
+    policy = copy.deepcopy(CREDIT_POLICY)
+    with open(path, "w") as f:
+        json.dump(policy, f)
+    engine = CreditPolicyEngine(path=path, recheck_seconds=0)
+    assert engine.refresh(force=True)
+    version = engine.version
+
+    policy["stages"]["initial"]["reject"][0]["when"] = "credit_scor < 700"
+    with open(path, "w") as f:
+        json.dump(policy, f)
+    assert not engine.refresh(force=True)
+    assert engine.version == version
+    assert engine.stats()["errors"] == 1
+    decision = engine.evaluate("initial", requested_amount=1000, pre_approved_limit=5000, credit_score=750)
+    assert decision["status"] == "APPROVED_INSTANT"
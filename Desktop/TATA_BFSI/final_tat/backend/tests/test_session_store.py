@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from app.services.session_store import SessionConflictError, SQLiteSessionStore, new_session_state
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteSessionStore(path=os.path.join(tmp_path, "sessions.db"))
+
+
+def test_create_then_update(store):
+    assert store.put("t1", new_session_state(), expected_version=0, new_messages=["hi"]) == 1
+    state = store.get("t1")
+    assert state["version"] == 1 and state["messages"] == ["hi"]
+    assert store.put("t1", state, expected_version=1, new_messages=["again"]) == 2
+    assert store.get("t1")["messages"] == ["hi", "again"]
+
+
+def test_create_conflict(store):
+    store.put("t1", new_session_state(), expected_version=0)
+    with pytest.raises(SessionConflictError):
+        store.put("t1", new_session_state(), expected_version=0)
+
+
+def test_stale_write_conflicts(store):
+    store.put("t1", new_session_state(), expected_version=0)
+    first, second = store.get("t1"), store.get("t1")
+    store.put("t1", first, expected_version=first["version"], new_messages=["winner"])
+    with pytest.raises(SessionConflictError):
+        store.put("t1", second, expected_version=second["version"], new_messages=["loser"])
+    assert store.get("t1")["messages"] == ["winner"]
+    assert store.stats()["conflicts"] == 1
+
+
+def test_unconditional_put_bumps_version(store):
+    assert store.put("t1", new_session_state()) == 1
+    assert store.put("t1", new_session_state()) == 2